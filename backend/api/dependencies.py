@@ -0,0 +1,15 @@
+"""Dependencies shared by the API routes."""
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from database.session import get_db
+from services.snapshot import OutletSnapshot, get_outlet_snapshot
+
+def get_snapshot(db: Session = Depends(get_db)) -> OutletSnapshot:
+    """
+    The outlet snapshot a request reads from.
+
+    FastAPI resolves this once per request, so the ETag and the endpoint
+    always see the same snapshot.
+    """
+    return get_outlet_snapshot(db)
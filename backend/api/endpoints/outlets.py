@@ -1,196 +1,488 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from datetime import datetime
+from typing import List, Literal, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from geopy.distance import geodesic
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from sqlalchemy.exc import OperationalError
+
+from api.dependencies import get_snapshot
+from core import config
+from database.session import get_async_db, get_db
+from database.models import Outlet as OutletModel, OutletHours
+from schemas.outlet import Outlet, OutletCluster, OutletDistance, OutletScore, IntersectingOutlet, NearbyBatchRequest
+from services.distance_table import lookup_distances, stored_distances
+from services.export import MEDIA_TYPES, NDJSON, iter_distances, iter_outlets
+from services.hours import weekday_minute
+from services.pagination import decode_cursor, encode_cursor
+from services.pairs import grid_pairs
+from services.search import DEFAULT_FTS_LIMIT, fts_search
+from services.semantic import semantic_indexes
+from services.snapshot import ID, LAT, LONG, OUTLET_FIELDS, OutletSnapshot
+from services.tiles import MAX_ZOOM, tile_cache
 
-from database.session import get_db
-from database.models import Outlet as OutletModel
-from schemas.outlet import Outlet, OutletDistance, IntersectingOutlet
+log = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Largest k accepted by the nearest outlets endpoint
+MAX_NEAREST_K = 1000
+
+# Largest k accepted by the semantic search endpoint
+MAX_SEMANTIC_K = 100
+
+# Bounds on the size of a clusters response
+MAX_CLUSTERS = 2000
+MAX_CLUSTER_IDS = 100
+
+OPEN_AT_DESCRIPTION = (
+    "Only outlets open at this date and time, e.g. 2025-03-07T23:00; "
+    "Malaysian time unless it has a UTC offset"
+)
+
+def outlet_dict(row: tuple) -> dict:
+    """Outlet JSON object for a snapshot row."""
+    return dict(zip(OUTLET_FIELDS, row))
+
+def outlet_dicts(snapshot: OutletSnapshot, outlet_ids: List[int], field: str, values) -> List[dict]:
+    """Outlet JSON objects with one extra field, keeping the order of outlet_ids."""
+    result = []
+    for outlet_id, value in zip(outlet_ids, values):
+        row = snapshot.get(outlet_id)
+        if row is not None:
+            outlet = outlet_dict(row)
+            outlet[field] = value
+            result.append(outlet)
+    return result
+
+def json_response(content, response: Response) -> ORJSONResponse:
+    """
+    Encode content with orjson, bypassing response_model validation.
+
+    Headers already set on the injected response, such as the ETag, are kept.
+    """
+    return ORJSONResponse(content, headers=dict(response.headers))
+
+def outlets_with_distances(snapshot: OutletSnapshot, response: Response, outlet_ids, distances) -> ORJSONResponse:
+    """Respond with OutletDistance objects for arrays of outlet IDs and distances."""
+    content = outlet_dicts(snapshot, outlet_ids.tolist(), "distance", distances.tolist())
+    return json_response(content, response)
+
+def export_response(chunks, format: str, name: str, response: Response) -> StreamingResponse:
+    """Stream an export as a file download, keeping headers set on the injected response."""
+    headers = dict(response.headers)
+    headers["Content-Disposition"] = f'attachment; filename="{name}.{format}"'
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
+
+def open_at_weekday_minute(open_at: Optional[datetime]) -> Optional[Tuple[int, int]]:
+    """The (weekday, minute) of an open_at filter, or None without one."""
+    return None if open_at is None else weekday_minute(open_at)
+
+def reference_outlet(snapshot: OutletSnapshot, outlet_id: int) -> tuple:
+    """Get the row of a reference outlet, which must exist and have coordinates."""
+    row = snapshot.get(outlet_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Reference outlet not found")
+    if row[LAT] is None or row[LONG] is None:
+        raise HTTPException(status_code=400, detail="Reference outlet has no coordinates")
+    return row
+
+def intersecting_outlet_ids(engine, radius: float) -> dict:
+    """Map each outlet ID to the sorted IDs of outlets whose catchment intersects it."""
+    # Two catchment areas intersect if the outlets are at most twice the
+    # catchment radius apart; each pair is found once and applies both ways
+    firsts, seconds, _ = grid_pairs(engine, 2 * radius, mode=config.DISTANCE_MODE)
+    outlet_ids = engine.ids[np.concatenate([firsts, seconds])]
+    other_ids = engine.ids[np.concatenate([seconds, firsts])]
+    
+    order = np.lexsort((other_ids, outlet_ids))
+    outlet_ids, other_ids = outlet_ids[order], other_ids[order]
+    unique_ids, starts = np.unique(outlet_ids, return_index=True)
+    return dict(zip(
+        unique_ids.tolist(),
+        (ids.tolist() for ids in np.split(other_ids, starts[1:]))
+    ))
+
 @router.get("/", response_model=List[Outlet])
 def read_outlets(
-    skip: int = 0, 
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    open_at: Optional[datetime] = Query(None, description=OPEN_AT_DESCRIPTION),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
 ):
     """
     Get all outlets with pagination.
+    
+    Pages are keyed on outlet ID: when there are more outlets, the response
+    carries an X-Next-Cursor header to pass back as cursor for the next page.
+    skip is still honoured for older clients. With open_at, only outlets
+    whose parsed operating hours cover that time are listed.
     """
-    outlets = db.query(OutletModel).offset(skip).limit(limit).all()
-    return outlets
+    after_id = None
+    if cursor is not None:
+        try:
+            after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    when = open_at_weekday_minute(open_at)
+    ids = None if when is None else snapshot.hours.open_ids(*when)
+    
+    # Take one extra row to know whether there is a next page
+    rows = snapshot.page(after_id, skip, limit + 1, ids)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        # An empty page, with limit=0, has no last outlet to continue after
+        if rows:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][ID])
+    return json_response([outlet_dict(row) for row in rows], response)
 
 @router.get("/search/", response_model=List[Outlet])
 def search_outlets(
+    response: Response,
     query: str = Query(..., description="Search term for outlet name or address"),
-    db: Session = Depends(get_db)
+    mode: Literal["fts", "substring"] = Query(
+        "fts",
+        description="fts: ranked full-text prefix search; substring: unranked match anywhere in the text"
+    ),
+    limit: Optional[int] = Query(
+        None, ge=1,
+        description=f"Maximum number of outlets to return (default: {DEFAULT_FTS_LIMIT} for fts, every match for substring)"
+    ),
+    open_at: Optional[datetime] = Query(None, description=OPEN_AT_DESCRIPTION),
+    db: Session = Depends(get_db),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
 ):
     """
     Search outlets by name or address.
+    
+    Substring mode returns every match unless limit is set, as it always
+    has. With open_at, only outlets open at that time are matched, using the
+    weekday index of the outlet_hours table.
     """
-    search_term = f"%{query}%"
-    outlets = db.query(OutletModel).filter(
-        or_(
-            OutletModel.name.ilike(search_term),
-            OutletModel.address.ilike(search_term)
+    when = open_at_weekday_minute(open_at)
+    outlet_ids = None
+    if mode == "fts":
+        try:
+            outlet_ids = fts_search(db, query, limit or DEFAULT_FTS_LIMIT, open_at=when)
+        except OperationalError as e:
+            # The full-text index is missing, e.g. on a database that was
+            # never initialized by this version of the app
+            log.warning(f"Full-text search unavailable, using substring search: {e}")
+            db.rollback()
+    
+    if outlet_ids is None:
+        search_term = f"%{query}%"
+        matches = db.query(OutletModel.id).filter(
+            or_(
+                OutletModel.name.ilike(search_term),
+                OutletModel.address.ilike(search_term)
+            )
         )
-    ).all()
-    return outlets
+        if when is not None:
+            weekday, minute = when
+            matches = matches.filter(OutletModel.id.in_(
+                select(OutletHours.outlet_id).where(
+                    OutletHours.weekday == weekday,
+                    OutletHours.opens <= minute,
+                    OutletHours.closes > minute
+                )
+            ))
+        outlet_ids = [row[0] for row in matches.limit(limit)]
+    
+    rows = (snapshot.get(outlet_id) for outlet_id in outlet_ids)
+    return json_response([outlet_dict(row) for row in rows if row is not None], response)
+
+@router.get("/semantic/", response_model=List[OutletScore])
+def semantic_search_outlets(
+    response: Response,
+    query: str = Query(..., min_length=1, description="Free-text question or description of the outlet"),
+    k: int = Query(10, ge=1, le=MAX_SEMANTIC_K, description="Maximum number of outlets to return"),
+    min_score: float = Query(0.1, ge=0, le=1, description="Only outlets scoring above this"),
+    open_at: Optional[datetime] = Query(None, description=OPEN_AT_DESCRIPTION),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+):
+    """
+    Find the outlets most similar to a free-text query, best first.
+
+    Outlets are scored by the cosine similarity of TF-IDF vectors of the
+    character trigrams of their name, address and operating hours, so
+    misspelt or partial words still match. The index is built in memory
+    once per data version and nothing is sent outside the app.
+    """
+    when = open_at_weekday_minute(open_at)
+    ids = None if when is None else snapshot.hours.open_ids(*when)
+    outlet_ids, scores = semantic_indexes.get(snapshot).search(query, k, min_score, ids)
+    content = outlet_dicts(snapshot, outlet_ids.tolist(), "score", np.round(scores, 4).tolist())
+    return json_response(content, response)
+
+@router.get("/export/")
+def export_outlets(
+    response: Response,
+    format: Literal["ndjson", "csv"] = Query(NDJSON, description="ndjson: one JSON object per line; csv: with a header row"),
+    db: Session = Depends(get_db)
+):
+    """
+    Export every outlet in ID order.
+    
+    Rows are read from the database in chunks and streamed as they are
+    encoded, so memory use does not grow with the number of outlets.
+    """
+    return export_response(iter_outlets(db.get_bind(), format), format, "outlets", response)
+
+@router.get("/distances/export/")
+def export_distances(
+    response: Response,
+    format: Literal["ndjson", "csv"] = Query(NDJSON, description="ndjson: one JSON object per line; csv: with a header row"),
+    outlet_id: Optional[int] = Query(None, description="Only export distances from this outlet"),
+    db: Session = Depends(get_db),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+):
+    """
+    Export outlet-to-outlet distances in kilometers, nearest first per outlet.
+    
+    Without outlet_id every ordered pair of outlets with coordinates is
+    exported, grouped by outlet in ID order.
+    """
+    if outlet_id is not None:
+        reference_outlet(snapshot, outlet_id)
+    chunks = iter_distances(
+        db.get_bind(), snapshot.index.engine, format, outlet_id=outlet_id, mode=config.DISTANCE_MODE
+    )
+    return export_response(chunks, format, "distances", response)
+
+@router.get("/tiles/{z}/{x}/{y}.geojson")
+def read_outlet_tile(
+    response: Response,
+    z: int = Path(..., ge=0, le=MAX_ZOOM, description="Zoom level"),
+    x: int = Path(..., ge=0, description="Tile column"),
+    y: int = Path(..., ge=0, description="Tile row"),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+):
+    """
+    Get the outlets inside a Web Mercator z/x/y map tile as GeoJSON.
+    
+    Coordinates are rounded to what the zoom level can show. Tiles are
+    cached until the outlets data changes.
+    """
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    return Response(
+        tile_cache.get(snapshot, z, x, y),
+        media_type="application/geo+json",
+        headers=dict(response.headers)
+    )
+
+@router.get("/clusters/", response_model=List[OutletCluster])
+def read_outlet_clusters(
+    response: Response,
+    west: float = Query(..., ge=-180, le=180, description="Western longitude of the viewport"),
+    south: float = Query(..., ge=-90, le=90, description="Southern latitude of the viewport"),
+    east: float = Query(..., ge=-180, le=180, description="Eastern longitude of the viewport"),
+    north: float = Query(..., ge=-90, le=90, description="Northern latitude of the viewport"),
+    zoom: int = Query(..., ge=0, description="Map zoom level"),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+):
+    """
+    Get the outlet clusters in a map viewport at a zoom level.
+    
+    Outlets in the same 64 pixel cell at that zoom form one cluster; a
+    cluster of one is a single outlet. Clusters are precomputed for every
+    zoom level whenever the outlets data changes.
+    """
+    clusters = snapshot.clusters
+    level = clusters.level(zoom)
+    selected = clusters.in_viewport(zoom, west, south, east, north)
+    if len(selected) > MAX_CLUSTERS:
+        raise HTTPException(status_code=400, detail="Viewport too large for this zoom level")
+    
+    counts, wests, souths, easts, norths = (values.tolist() for values in clusters.bounds(zoom, selected))
+    starts = level.starts[selected].tolist()
+    content = [
+        {
+            "count": count,
+            "lat": lat,
+            "long": long,
+            "bbox": [bbox_west, bbox_south, bbox_east, bbox_north],
+            "ids": clusters.ids[start:start + min(count, MAX_CLUSTER_IDS)].tolist(),
+        }
+        for count, lat, long, bbox_west, bbox_south, bbox_east, bbox_north, start in zip(
+            counts,
+            level.lat[selected].tolist(),
+            level.long[selected].tolist(),
+            wests, souths, easts, norths,
+            starts,
+        )
+    ]
+    return json_response(content, response)
 
 @router.get("/{outlet_id}", response_model=Outlet)
 def read_outlet(
+    response: Response,
     outlet_id: int, 
-    db: Session = Depends(get_db)
+    snapshot: OutletSnapshot = Depends(get_snapshot)
 ):
     """
     Get a specific outlet by ID.
     """
-    outlet = db.query(OutletModel).filter(OutletModel.id == outlet_id).first()
-    if outlet is None:
+    row = snapshot.get(outlet_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Outlet not found")
-    return outlet
+    return json_response(outlet_dict(row), response)
 
 @router.get("/nearby/", response_model=List[OutletDistance])
 async def get_nearby_outlets(
-    lat: float = Query(..., description="Latitude of the reference point"),
-    long: float = Query(..., description="Longitude of the reference point"),
-    radius: float = Query(5.0, description="Search radius in kilometers"),
-    db: Session = Depends(get_db)
-) -> List[OutletDistance]:
-    """Get outlets within a specified radius of a reference point."""
-    outlets = db.query(OutletModel).all()
-    nearby_outlets = []
-    
-    # Convert reference point to tuple
-    reference_point = (lat, long)
-    
-    # Calculate distances and filter outlets
-    for outlet in outlets:
-        if outlet.lat is not None and outlet.long is not None:
-            outlet_point = (outlet.lat, outlet.long)
-            distance = geodesic(reference_point, outlet_point).kilometers
-            
-            if distance <= radius:
-                outlet_dict = jsonable_encoder(outlet)
-                outlet_dict["distance"] = distance
-                nearby_outlets.append(OutletDistance(**outlet_dict))
-    
-    # Sort by distance
-    nearby_outlets.sort(key=lambda x: x.distance)
-    return nearby_outlets
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90, allow_inf_nan=False, description="Latitude of the reference point"),
+    long: float = Query(..., ge=-180, le=180, allow_inf_nan=False, description="Longitude of the reference point"),
+    radius: float = Query(5.0, ge=0, allow_inf_nan=False, description="Search radius in kilometers"),
+    open_at: Optional[datetime] = Query(None, description=OPEN_AT_DESCRIPTION),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+) -> Response:
+    """Get outlets within a specified radius of a reference point, optionally only those open at a time."""
+    index = snapshot.index
+    when = open_at_weekday_minute(open_at)
+    
+    def search():
+        # Only outlets in grid cells overlapping the search circle are measured
+        candidates = index.candidates(lat, long, radius)
+        if when is not None:
+            open_ids = snapshot.hours.open_ids(*when)
+            candidates = candidates[np.isin(index.engine.ids[candidates], open_ids, assume_unique=True)]
+        return index.engine.within(lat, long, radius, positions=candidates, mode=config.DISTANCE_MODE)
+    
+    positions, distances = await run_in_threadpool(search)
+    return outlets_with_distances(snapshot, response, index.engine.ids[positions], distances)
+
+@router.get("/nearest/", response_model=List[OutletDistance])
+async def get_nearest_outlets(
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90, allow_inf_nan=False, description="Latitude of the reference point"),
+    long: float = Query(..., ge=-180, le=180, allow_inf_nan=False, description="Longitude of the reference point"),
+    k: int = Query(5, ge=1, le=MAX_NEAREST_K, description="Number of outlets to return"),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+) -> Response:
+    """Get the k outlets nearest to a reference point, nearest first."""
+    index = snapshot.index
+    positions, distances = await run_in_threadpool(index.nearest, lat, long, k, mode=config.DISTANCE_MODE)
+    return outlets_with_distances(snapshot, response, index.engine.ids[positions], distances)
+
+@router.post("/nearby/batch", response_model=List[List[OutletDistance]])
+async def get_nearby_outlets_batch(
+    batch: NearbyBatchRequest,
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+) -> Response:
+    """
+    Get outlets near many reference points at once.
+    
+    Returns one list of outlets per query, nearest first, in the order of
+    the queries.
+    """
+    engine = snapshot.index.engine
+    
+    def search():
+        queries, positions, distances = engine.many_within(
+            [query.lat for query in batch.queries],
+            [query.long for query in batch.queries],
+            [query.radius for query in batch.queries],
+            mode=config.DISTANCE_MODE
+        )
+        # Split the flat results, already ordered by query, into one list per query
+        bounds = np.searchsorted(queries, np.arange(len(batch.queries) + 1)).tolist()
+        outlet_ids, distances = engine.ids[positions].tolist(), distances.tolist()
+        return ORJSONResponse([
+            outlet_dicts(snapshot, outlet_ids[start:end], "distance", distances[start:end])
+            for start, end in zip(bounds, bounds[1:])
+        ])
+    
+    return await run_in_threadpool(search)
 
 @router.get("/intersecting/", response_model=List[IntersectingOutlet])
 async def get_intersecting_outlets(
-    db: Session = Depends(get_db)
-) -> List[IntersectingOutlet]:
+    response: Response,
+    radius: float = Query(5.0, ge=0, allow_inf_nan=False, description="Catchment radius in kilometers"),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+) -> Response:
     """Get outlets with intersecting catchment areas."""
-    outlets = db.query(OutletModel).all()
-    intersecting_outlets = []
-    
-    # Calculate intersections for each outlet
-    for outlet in outlets:
-        # Skip outlets without coordinates
-        if outlet.lat is None or outlet.long is None:
-            continue
-            
-        outlet_point = (outlet.lat, outlet.long)
-        intersecting_ids = []
-        
-        # Check intersection with other outlets
-        for other_outlet in outlets:
-            # Skip self and outlets without coordinates
-            if other_outlet.id == outlet.id or other_outlet.lat is None or other_outlet.long is None:
-                continue
-                
-            other_point = (other_outlet.lat, other_outlet.long)
-            distance = geodesic(outlet_point, other_point).kilometers
-            
-            # If distance is less than twice the catchment radius, they intersect
-            if distance <= 2 * 5.0:
-                intersecting_ids.append(other_outlet.id)
-        
-        if intersecting_ids:
-            outlet_dict = jsonable_encoder(outlet)
-            outlet_dict["intersects_with"] = intersecting_ids
-            intersecting_outlets.append(IntersectingOutlet(**outlet_dict))
-    
-    return intersecting_outlets
+    # The pair search is CPU-bound, keep it off the event loop
+    intersecting_ids = await run_in_threadpool(intersecting_outlet_ids, snapshot.index.engine, radius)
+    
+    content = outlet_dicts(snapshot, list(intersecting_ids), "intersects_with", intersecting_ids.values())
+    return await run_in_threadpool(json_response, content, response)
 
 @router.get("/catchment/", response_model=List[OutletDistance])
 def read_catchment_outlets(
+    response: Response,
     outlet_id: int = Query(..., description="ID of the reference outlet"),
-    radius: float = Query(1.0, description="Catchment radius in kilometers"),
-    db: Session = Depends(get_db)
+    radius: float = Query(1.0, ge=0, allow_inf_nan=False, description="Catchment radius in kilometers"),
+    db: Session = Depends(get_db),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
 ):
     """
     Get outlets that have catchment areas intersecting with a specific outlet's catchment area.
     """
-    # Get the reference outlet
-    reference_outlet = db.query(OutletModel).filter(OutletModel.id == outlet_id).first()
-    if reference_outlet is None:
-        raise HTTPException(status_code=404, detail="Reference outlet not found")
+    reference = reference_outlet(snapshot, outlet_id)
     
-    if reference_outlet.lat is None or reference_outlet.long is None:
-        raise HTTPException(status_code=400, detail="Reference outlet has no coordinates")
+    # If distance is less than 2 * radius, catchment areas intersect
+    precomputed = lookup_distances(db, outlet_id, 2 * radius, mode=config.DISTANCE_MODE)
+    if precomputed is not None:
+        return outlets_with_distances(snapshot, response, *precomputed)
     
-    # Get all other outlets
-    outlets = db.query(OutletModel).filter(OutletModel.id != outlet_id).all()
+    index = snapshot.index
+    candidates = index.candidates(reference[LAT], reference[LONG], 2 * radius)
+    candidates = candidates[index.engine.ids[candidates] != outlet_id]
+    positions, distances = index.engine.within(
+        reference[LAT], reference[LONG], 2 * radius,
+        positions=candidates, mode=config.DISTANCE_MODE
+    )
     
-    result = []
-    reference_point = (reference_outlet.lat, reference_outlet.long)
-    
-    for outlet in outlets:
-        if outlet.lat is not None and outlet.long is not None:
-            outlet_point = (outlet.lat, outlet.long)
-            distance = geodesic(reference_point, outlet_point).kilometers
-            
-            # If distance is less than 2 * radius, catchment areas intersect
-            if distance <= (2 * radius):
-                # Convert to Pydantic model and add distance
-                outlet_dict = {**outlet.__dict__}
-                outlet_dict["distance"] = distance
-                result.append(outlet_dict)
-    
-    # Sort by distance
-    result.sort(key=lambda x: x["distance"])
-    
-    return result
+    return outlets_with_distances(snapshot, response, index.engine.ids[positions], distances)
 
 @router.get("/distance/{outlet_id}", response_model=List[OutletDistance])
 async def get_outlet_distances(
+    response: Response,
     outlet_id: int,
-    db: Session = Depends(get_db)
-) -> List[OutletDistance]:
-    """Get distances from a reference outlet to all other outlets."""
-    # Get the reference outlet
-    reference_outlet = db.query(OutletModel).filter(OutletModel.id == outlet_id).first()
-    if not reference_outlet:
-        raise HTTPException(status_code=404, detail="Reference outlet not found")
+    db: AsyncSession = Depends(get_async_db),
+    snapshot: OutletSnapshot = Depends(get_snapshot)
+) -> Response:
+    """
+    Get distances from a reference outlet to all other outlets.
+
+    Pairs the precomputed distance table holds are read from it; the rest,
+    all of them without a current table, are calculated.
+    """
+    reference = reference_outlet(snapshot, outlet_id)
     
-    # Skip if reference outlet has no coordinates
-    if reference_outlet.lat is None or reference_outlet.long is not None:
-        raise HTTPException(status_code=400, detail="Reference outlet has no coordinates")
+    stored = await db.run_sync(stored_distances, outlet_id, mode=config.DISTANCE_MODE)
+    engine = snapshot.index.engine
+    
+    def measure():
+        positions = np.flatnonzero(engine.ids != outlet_id)
+        if stored is None:
+            stored_ids, stored_distances = np.array([], dtype=np.int64), np.array([])
+        else:
+            stored_ids, stored_distances = stored
+            positions = positions[~np.isin(engine.ids[positions], stored_ids)]
+            if len(positions) == 0:
+                return stored
+        # Calculate distances to every other outlet in one pass
+        distances = engine.one_to_many(
+            reference[LAT], reference[LONG], positions=positions, mode=config.DISTANCE_MODE
+        )
+        outlet_ids = np.concatenate((stored_ids, engine.ids[positions]))
+        distances = np.concatenate((stored_distances, distances))
+        # Sort by distance
+        order = np.argsort(distances, kind="stable")
+        return outlet_ids[order], distances[order]
     
-    # Get all other outlets
-    outlets = db.query(OutletModel).filter(OutletModel.id != outlet_id).all()
-    outlet_distances = []
-    
-    # Convert reference point to tuple
-    reference_point = (reference_outlet.lat, reference_outlet.long)
-    
-    # Calculate distances
-    for outlet in outlets:
-        if outlet.lat is not None and outlet.long is not None:
-            outlet_point = (outlet.lat, outlet.long)
-            distance = geodesic(reference_point, outlet_point).kilometers
-            
-            outlet_dict = jsonable_encoder(outlet)
-            outlet_dict["distance"] = distance
-            outlet_distances.append(OutletDistance(**outlet_dict))
-    
-    # Sort by distance
-    outlet_distances.sort(key=lambda x: x.distance)
-    return outlet_distances 
\ No newline at end of file
+    outlet_ids, distances = await run_in_threadpool(measure)
+    return outlets_with_distances(snapshot, response, outlet_ids, distances)
@@ -0,0 +1,52 @@
+"""Data-version ETags and conditional GETs for the outlet endpoints."""
+import hashlib
+
+from fastapi import Depends, Request, Response
+
+from api.dependencies import get_snapshot
+from core import config
+from services.snapshot import OutletSnapshot
+
+class NotModified(Exception):
+    """Raised when the client's cached copy matches the current ETag."""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+def compute_etag(version: tuple, request: Request) -> str:
+    """Strong ETag for a request against a data version (without its database key)."""
+    query = sorted(request.query_params.multi_items())
+    key = repr((version[1:], config.DISTANCE_MODE, request.method, request.url.path, query))
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, RFC 9110)."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def conditional_get(
+    request: Request,
+    response: Response,
+    snapshot: OutletSnapshot = Depends(get_snapshot),
+) -> None:
+    """
+    Dependency that tags GET responses with the data-version ETag.
+
+    The ETag is that of the outlet snapshot the endpoint reads from. A
+    matching If-None-Match raises NotModified before the endpoint runs. While
+    the data version is cached this does not touch the database.
+    """
+    if request.method != "GET":
+        return
+    etag = compute_etag(snapshot.version, request)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(etag, if_none_match):
+        raise NotModified(etag)
+    response.headers["ETag"] = etag
+
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    """Answer a NotModified with an empty 304."""
+    return Response(status_code=304, headers={"ETag": exc.etag})
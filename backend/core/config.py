@@ -0,0 +1,32 @@
+"""
+Application settings read from the environment.
+
+Importing this module reads the process environment only; init() loads .env
+first and reads the settings again. The app factory in main calls it.
+"""
+import os
+
+def read_settings():
+    """Read the settings from the environment into this module."""
+    global DISTANCE_MODE, PROFILING_ENABLED, PROFILING_TOKEN, PROFILE_DIR, PROFILE_MAX_COUNT, PROFILE_INTERVAL_MS
+    # "geodesic" (exact WGS84 ellipsoid) or "haversine" (spherical, faster)
+    DISTANCE_MODE = os.getenv("DISTANCE_MODE", "geodesic")
+
+    # Opt-in request profiling: requests carrying PROFILING_TOKEN in an
+    # X-Profile-Token header or a profile_token query parameter are profiled
+    # and their profiles written to PROFILE_DIR, keeping the newest
+    # PROFILE_MAX_COUNT. Nothing is installed unless enabled with a token.
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", "50"))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+
+read_settings()
+
+def init():
+    """Load environment variables from .env and read the settings again."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    read_settings()
@@ -0,0 +1,261 @@
+"""
+Request and SQL metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware records the latency and in-flight count of every request
+by route. instrument_engine hooks an SQLAlchemy engine to time queries and
+to attribute query counts, durations and rows fetched to the request that
+ran them. Everything is kept in memory and rendered by REGISTRY.render().
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.cursor import CursorFetchStrategy
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+ROW_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric with one value per combination of label values."""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"]
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+class Histogram(Metric):
+    """Counts of observations at or below each bucket bound, with their sum."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        # Per-bucket counts, made cumulative when rendered; the last slot is +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self, labels: Tuple[str, ...], value) -> List[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            bucket = 'le="' + le + '"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, bucket)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    """The metrics rendered at /metrics."""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to respond to a request, body included.",
+    ("method", "route", "status"),
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests being handled.", ("method", "route"),
+))
+REQUEST_QUERIES = REGISTRY.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per request.",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+))
+REQUEST_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent executing SQL per request.",
+    ("method", "route"),
+))
+REQUEST_ROWS = REGISTRY.register(Histogram(
+    "http_request_db_rows_fetched", "Rows fetched from SQL results per request.",
+    ("method", "route"), ROW_COUNT_BUCKETS,
+))
+QUERY_SECONDS = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Time to execute an SQL statement, by its first keyword.",
+    ("operation",),
+))
+
+class RequestStats:
+    """SQL work done on behalf of one request."""
+
+    __slots__ = ("queries", "seconds", "rows")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+# Set by MetricsMiddleware for the duration of each request; copied into
+# the threadpool for sync endpoints and into SQLAlchemy's async greenlets
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class CountingFetchStrategy(CursorFetchStrategy):
+    """SQLAlchemy's default fetch strategy, counting the rows fetched for a request."""
+
+    __slots__ = ("stats",)
+
+    def __init__(self, stats: RequestStats):
+        self.stats = stats
+
+    def fetchone(self, result, dbapi_cursor, hard_close=False):
+        row = super().fetchone(result, dbapi_cursor, hard_close)
+        if row is not None:
+            self.stats.rows += 1
+        return row
+
+    def fetchmany(self, result, dbapi_cursor, size=None):
+        rows = super().fetchmany(result, dbapi_cursor, size)
+        self.stats.rows += len(rows)
+        return rows
+
+    def fetchall(self, result, dbapi_cursor):
+        rows = super().fetchall(result, dbapi_cursor)
+        self.stats.rows += len(rows)
+        return rows
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+    operation = statement.lstrip()[:16].split(None, 1)[0].upper() if statement.strip() else ""
+    QUERY_SECONDS.observe((operation,), elapsed)
+
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.seconds += elapsed
+    # Count rows as the result is consumed. Results streamed with yield_per
+    # switch to a buffered strategy and are not counted.
+    if cursor.description is not None and type(context.cursor_fetch_strategy) is CursorFetchStrategy:
+        context.cursor_fetch_strategy = CountingFetchStrategy(stats)
+
+def instrument_engine(engine: Engine) -> None:
+    """Time the SQL statements of an engine and attribute them to requests."""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def route_template(scope) -> str:
+    """
+    The path template of the route handling a request.
+
+    Matches the routes' compiled path patterns directly, which is much
+    cheaper than Route.matches building a child scope for each.
+    """
+    path, method = scope["path"], scope["method"]
+    partial = None
+    for route in scope["app"].router.routes:
+        path_regex = getattr(route, "path_regex", None)
+        if path_regex is None or not path_regex.match(path):
+            continue
+        methods = getattr(route, "methods", None)
+        if methods is None or method in methods:
+            return route.path
+        partial = partial or route.path
+    return partial or "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request latency, in-flight counts and SQL work."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = (scope["method"], route_template(scope))
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        REQUESTS_IN_FLIGHT.inc(labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(labels + (status,), time.perf_counter() - start)
+            REQUESTS_IN_FLIGHT.dec(labels)
+            REQUEST_QUERIES.observe(labels, stats.queries)
+            REQUEST_QUERY_SECONDS.observe(labels, stats.seconds)
+            REQUEST_ROWS.observe(labels, stats.rows)
+            current_request.reset(token)
@@ -0,0 +1,193 @@
+"""
+Opt-in profiling of individual requests.
+
+ProfilingMiddleware is only installed when profiling is enabled, so normal
+requests pay nothing. A request carrying the profiling token is sampled
+while it runs, and two files are written for it:
+    <key>.prof       pstats data, for pstats.Stats, snakeviz and the like
+    <key>.collapsed  folded stacks, for flamegraph.pl and speedscope
+
+The sampler takes the stacks of every busy thread, because endpoints do
+their work in the threadpool as well as on the event loop; cProfile only
+sees the thread it runs in. Work for concurrent requests can therefore
+show up in a profile, under its own thread.
+"""
+import hmac
+import logging
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from core.metrics import route_template
+
+log = logging.getLogger(__name__)
+
+TOKEN_HEADER = b"x-profile-token"
+TOKEN_PARAMETER = "profile_token"
+PROFILE_HEADER = b"x-profile"
+
+# Leaf frames of threads waiting for work rather than doing it
+IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select")}
+
+# pstats identifies a function by (filename, first line, name)
+Function = Tuple[str, int, str]
+
+class Sampler(threading.Thread):
+    """
+    Samples the Python stacks of all other threads until stopped.
+
+    samples counts each (thread, stack) and seconds weighs it by the time
+    since the previous sample, which exceeds the interval whenever a busy
+    thread holds the GIL.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.seconds: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+                key = (names.get(ident, str(ident)), tuple(stack))
+                self.samples[key] += 1
+                self.seconds[key] += elapsed
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+def collapsed_stacks(samples: Counter) -> str:
+    """Folded stacks, one 'thread;outer;...;inner count' line per distinct stack."""
+    lines = []
+    for (thread, stack), count in sorted(samples.items()):
+        frames = [f"{name} ({os.path.basename(filename)}:{line})" for filename, line, name in stack]
+        lines.append(";".join([thread] + frames) + f" {count}")
+    return "\n".join(lines) + "\n"
+
+def pstats_data(samples: Counter, seconds_sampled: Counter) -> Dict[Function, tuple]:
+    """
+    The samples as the stats dictionary pstats loads.
+
+    Times are the sampled seconds; call counts are the number of samples a
+    function was on the stack in.
+    """
+    stats: Dict[Function, list] = {}
+    for key, count in samples.items():
+        stack = key[1]
+        seconds = seconds_sampled[key]
+        seen = set()
+        for depth, function in enumerate(stack):
+            entry = stats.setdefault(function, [0, 0, 0.0, 0.0, {}])
+            leaf = depth == len(stack) - 1
+            if leaf:
+                entry[2] += seconds
+            if function not in seen:
+                seen.add(function)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+            if depth:
+                caller = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                caller[0] += count
+                caller[1] += count
+                caller[2] += seconds if leaf else 0.0
+                caller[3] += seconds
+    return {
+        function: (cc, nc, tt, ct, {caller: tuple(values) for caller, values in callers.items()})
+        for function, (cc, nc, tt, ct, callers) in stats.items()
+    }
+
+def profile_key(method: str, route: str, started: datetime) -> str:
+    """File name stem of a profile: UTC timestamp, method and route."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    return f"{started.strftime('%Y%m%dT%H%M%S.%fZ')}_{method}_{slug}"
+
+def prune_profiles(directory: str, max_count: int) -> None:
+    """Delete the oldest profiles beyond max_count."""
+    stems = sorted({os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith((".prof", ".collapsed"))})
+    for stem in stems[:max(len(stems) - max_count, 0)]:
+        for extension in (".prof", ".collapsed"):
+            path = os.path.join(directory, stem + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that carry the profiling token."""
+
+    def __init__(self, app, token: str, directory: str, max_count: int = 50, interval: float = 0.001):
+        self.app = app
+        self.token = token.encode()
+        self.directory = directory
+        self.max_count = max_count
+        self.interval = interval
+
+    def requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == TOKEN_HEADER:
+                return hmac.compare_digest(value, self.token)
+        if TOKEN_PARAMETER.encode() in scope["query_string"]:
+            values = parse_qs(scope["query_string"].decode()).get(TOKEN_PARAMETER, [""])
+            return hmac.compare_digest(values[0].encode(), self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        started = datetime.now(timezone.utc)
+        key: Optional[str] = None
+
+        async def send_with_key(message):
+            # The route is known once routing has set scope["app"]
+            nonlocal key
+            if message["type"] == "http.response.start":
+                key = profile_key(scope["method"], route_template(scope), started)
+                message = {**message, "headers": list(message.get("headers", [])) + [(PROFILE_HEADER, key.encode())]}
+            await send(message)
+
+        sampler = Sampler(self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_key)
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - start
+            key = key or profile_key(scope["method"], route_template(scope), started)
+            self.write(key, sampler)
+            log.info(f"Profiled {scope['method']} {scope['path']} in {elapsed:.3f} s as {key}")
+
+    def write(self, key: str, sampler: Sampler) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{key}.prof"), "wb") as f:
+            marshal.dump(pstats_data(sampler.samples, sampler.seconds), f)
+        with open(os.path.join(self.directory, f"{key}.collapsed"), "w") as f:
+            f.write(collapsed_stacks(sampler.samples))
+        prune_profiles(self.directory, self.max_count)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Text, ForeignKey, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -7,6 +7,9 @@ Base = declarative_base()
 class Outlet(Base):
     """Model for Subway outlet data."""
     __tablename__ = "outlets"
+    # IDs of deleted outlets are never handed out again, so a cached link to
+    # an outlet can not silently point at another one
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
@@ -20,4 +23,200 @@ class Outlet(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     def __repr__(self):
-        return f"<Outlet(name='{self.name}', address='{self.address}')>" 
\ No newline at end of file
+        return f"<Outlet(name='{self.name}', address='{self.address}')>"
+
+@event.listens_for(Base.metadata, "after_create")
+def upgrade_outlet_ids(target, connection, **kw):
+    """
+    Rebuild an outlets table created before its IDs were AUTOINCREMENT.
+
+    The rows keep their IDs. Runs before the hooks below, which recreate the
+    triggers dropped with the old table.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    schema = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'outlets'"
+    ).scalar()
+    if schema is None or "AUTOINCREMENT" in schema.upper():
+        return
+    columns = ", ".join(column.name for column in Outlet.__table__.columns)
+    # Leave the foreign keys of other tables pointing at "outlets"
+    connection.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    try:
+        connection.exec_driver_sql("ALTER TABLE outlets RENAME TO outlets_before_autoincrement")
+    finally:
+        connection.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+    for index in Outlet.__table__.indexes:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+    Outlet.__table__.create(connection)
+    connection.exec_driver_sql(
+        f"INSERT INTO outlets ({columns}) SELECT {columns} FROM outlets_before_autoincrement"
+    )
+    connection.exec_driver_sql("DROP TABLE outlets_before_autoincrement")
+
+# Full-text index over outlet names and addresses (SQLite FTS5). It stores no
+# text of its own and is kept in sync with the outlets table by triggers.
+OUTLETS_FTS_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS outlets_fts USING fts5(
+        name, address, content='outlets', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS outlets_fts_insert AFTER INSERT ON outlets BEGIN
+        INSERT INTO outlets_fts(rowid, name, address) VALUES (new.id, new.name, new.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS outlets_fts_delete AFTER DELETE ON outlets BEGIN
+        INSERT INTO outlets_fts(outlets_fts, rowid, name, address)
+        VALUES ('delete', old.id, old.name, old.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS outlets_fts_update AFTER UPDATE ON outlets BEGIN
+        INSERT INTO outlets_fts(outlets_fts, rowid, name, address)
+        VALUES ('delete', old.id, old.name, old.address);
+        INSERT INTO outlets_fts(rowid, name, address) VALUES (new.id, new.name, new.address);
+    END""",
+)
+
+@event.listens_for(Base.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    """Create the outlets full-text index if missing, filling it from existing outlets."""
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'outlets_fts'"
+    ).first()
+    for statement in OUTLETS_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if exists is None:
+        connection.exec_driver_sql("INSERT INTO outlets_fts(outlets_fts) VALUES ('rebuild')")
+
+@event.listens_for(Base.metadata, "before_drop")
+def drop_search_index(target, connection, **kw):
+    """Drop the outlets full-text index along with the outlets table."""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS outlets_fts")
+
+class OutletHours(Base):
+    """Model for an interval of a weekday when an outlet is open, parsed from its operating hours."""
+    __tablename__ = "outlet_hours"
+    __table_args__ = (
+        Index("ix_outlet_hours_weekday_opens_closes", "weekday", "opens", "closes"),
+    )
+
+    outlet_id = Column(Integer, ForeignKey("outlets.id", ondelete="CASCADE"), primary_key=True)
+    # 0 is Monday
+    weekday = Column(Integer, primary_key=True)
+    # Minutes after midnight; open from opens until just before closes
+    opens = Column(Integer, primary_key=True)
+    closes = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<OutletHours(outlet_id={self.outlet_id}, weekday={self.weekday}, opens={self.opens}, closes={self.closes})>"
+
+class PendingOutletHours(Base):
+    """Model for an outlet whose operating hours changed and are not parsed into outlet_hours yet."""
+    __tablename__ = "outlet_hours_pending"
+
+    outlet_id = Column(Integer, primary_key=True)
+
+    def __repr__(self):
+        return f"<PendingOutletHours(outlet_id={self.outlet_id})>"
+
+# Triggers that queue outlets for parsing on every write to outlets, however
+# it is made. Changed or deleted hours are removed at once, so outlet_hours
+# never holds outdated intervals; the queue is parsed when the writing
+# session commits.
+OUTLET_HOURS_DDL = (
+    """CREATE TRIGGER IF NOT EXISTS outlet_hours_insert AFTER INSERT ON outlets BEGIN
+        INSERT OR IGNORE INTO outlet_hours_pending (outlet_id) VALUES (new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS outlet_hours_update AFTER UPDATE OF operating_hours ON outlets BEGIN
+        DELETE FROM outlet_hours WHERE outlet_id = old.id;
+        INSERT OR IGNORE INTO outlet_hours_pending (outlet_id) VALUES (new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS outlet_hours_delete AFTER DELETE ON outlets BEGIN
+        DELETE FROM outlet_hours WHERE outlet_id = old.id;
+        DELETE FROM outlet_hours_pending WHERE outlet_id = old.id;
+    END""",
+)
+
+@event.listens_for(Base.metadata, "after_create")
+def create_hours_triggers(target, connection, **kw):
+    """Create the triggers that queue outlets whose operating hours changed."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in OUTLET_HOURS_DDL:
+        connection.exec_driver_sql(statement)
+
+class OutletsVersion(Base):
+    """Model for the generation of the outlets data, which every change to it bumps."""
+    __tablename__ = "outlets_version"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<OutletsVersion(generation={self.generation})>"
+
+# Triggers that bump the generation in the same transaction as every write to
+# outlets, from whichever process or tool it is made
+OUTLETS_VERSION_DDL = (
+    "INSERT OR IGNORE INTO outlets_version (id, generation) VALUES (1, 0)",
+    """CREATE TRIGGER IF NOT EXISTS outlets_version_insert AFTER INSERT ON outlets BEGIN
+        UPDATE outlets_version SET generation = generation + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS outlets_version_update AFTER UPDATE ON outlets BEGIN
+        UPDATE outlets_version SET generation = generation + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS outlets_version_delete AFTER DELETE ON outlets BEGIN
+        UPDATE outlets_version SET generation = generation + 1 WHERE id = 1;
+    END""",
+)
+
+@event.listens_for(Base.metadata, "after_create")
+def create_version_triggers(target, connection, **kw):
+    """Create the outlets generation row and the triggers that bump it."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in OUTLETS_VERSION_DDL:
+        connection.exec_driver_sql(statement)
+
+class OutletPairDistance(Base):
+    """Model for a precomputed distance between two outlets."""
+    __tablename__ = "outlet_distances"
+    __table_args__ = (
+        Index("ix_outlet_distances_outlet_id_distance", "outlet_id", "distance"),
+    )
+
+    outlet_id = Column(Integer, ForeignKey("outlets.id", ondelete="CASCADE"), primary_key=True)
+    other_outlet_id = Column(Integer, ForeignKey("outlets.id", ondelete="CASCADE"), primary_key=True)
+    distance = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<OutletPairDistance(outlet_id={self.outlet_id}, other_outlet_id={self.other_outlet_id}, distance={self.distance})>"
+
+class DistanceTableInfo(Base):
+    """Model describing how and for which outlets data the distance table was built."""
+    __tablename__ = "outlet_distance_info"
+
+    id = Column(Integer, primary_key=True)
+    outlet_count = Column(Integer, nullable=False)
+    # The data version of the outlets the table was built for
+    data_version = Column(String(64), nullable=True)
+    k = Column(Integer, nullable=True)
+    max_radius_km = Column(Float, nullable=True)
+    mode = Column(String(16), nullable=False)
+    built_at = Column(DateTime(timezone=True), server_default=func.now())
+
+@event.listens_for(Base.metadata, "after_create")
+def upgrade_distance_table_info(target, connection, **kw):
+    """
+    Recreate outlet_distance_info if it predates its data_version column.
+
+    The distance table is then not current and is rebuilt at the next ingest.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(outlet_distance_info)")}
+    if "data_version" not in columns:
+        DistanceTableInfo.__table__.drop(connection)
+        DistanceTableInfo.__table__.create(connection)
@@ -1,33 +1,31 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-# Create FastAPI app
-app = FastAPI(
-    title="Subway Outlets API",
-    description="API for Subway outlets in Kuala Lumpur",
-    version="1.0.0"
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # For development; restrict in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Import API routers
-from api.endpoints import outlets
-
-# Include API routers
-app.include_router(
-    outlets.router,
-    prefix="/api/outlets",
-    tags=["outlets"]
-)
-
-@app.get("/")
+from core import config
+from core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, instrument_engine
+from database.models import Base
+from database.session import SessionLocal, async_engine, engine
+from services.hours import fill_missing_outlet_hours
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create any tables added since the database file was created.
+
+    Outlets ingested before outlet_hours existed, or written outside the app,
+    get their hours parsed here.
+    """
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        fill_missing_outlet_hours(db)
+    yield
+
+# Record the SQL each request runs
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 def read_root():
     """Root endpoint to check if API is running."""
     return {
@@ -36,7 +34,76 @@ def read_root():
         "outlets": "/api/outlets"
     }
 
+def read_metrics():
+    """Request and SQL metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+def build_app() -> FastAPI:
+    """Build the app from the settings currently in core.config."""
+    # Create FastAPI app
+    app = FastAPI(
+        title="Subway Outlets API",
+        description="API for Subway outlets in Kuala Lumpur",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # For development; restrict in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "X-Next-Cursor"],
+    )
+
+    # Profile requests carrying the profiling token; not installed at all unless enabled
+    if config.PROFILING_ENABLED and config.PROFILING_TOKEN:
+        from core.profiling import ProfilingMiddleware
+        app.add_middleware(
+            ProfilingMiddleware,
+            token=config.PROFILING_TOKEN,
+            directory=config.PROFILE_DIR,
+            max_count=config.PROFILE_MAX_COUNT,
+            interval=config.PROFILE_INTERVAL_MS / 1000,
+        )
+
+    # Record per-route latency and in-flight requests
+    app.add_middleware(MetricsMiddleware)
+
+    # Import API routers
+    from api.endpoints import outlets
+    from api.etag import NotModified, conditional_get, not_modified_handler
+
+    # Answer conditional GETs for unchanged outlet data with 304 Not Modified
+    app.add_exception_handler(NotModified, not_modified_handler)
+
+    # Include API routers
+    app.include_router(
+        outlets.router,
+        prefix="/api/outlets",
+        tags=["outlets"],
+        dependencies=[Depends(conditional_get)]
+    )
+    app.get("/")(read_root)
+    app.get("/metrics", include_in_schema=False)(read_metrics)
+    return app
+
+def create_app() -> FastAPI:
+    """
+    Load .env into the environment, then build the app.
+
+    The entry point for `uvicorn main:create_app --factory`.
+    """
+    config.init()
+    return build_app()
+
+# Built from the process environment alone: importing this module reads no
+# .env file
+app = build_app()
+
 # Run the application
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(create_app(), host="0.0.0.0", port=8000)
\ No newline at end of file
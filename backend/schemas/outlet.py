@@ -39,6 +39,31 @@ class OutletDistance(Outlet):
     """Schema for an outlet with distance."""
     distance: float = Field(..., description="Distance in kilometers")
 
+class OutletScore(Outlet):
+    """Schema for an outlet with a search score."""
+    score: float = Field(..., description="Cosine similarity to the query, from 0 to 1")
+
 class IntersectingOutlet(Outlet):
     """Schema for an outlet with intersecting catchment area."""
-    intersects_with: list[int] = Field(..., description="IDs of outlets with intersecting catchment areas") 
\ No newline at end of file
+    intersects_with: list[int] = Field(..., description="IDs of outlets with intersecting catchment areas")
+
+# Upper bound on the number of points in one batch nearby search
+MAX_NEARBY_BATCH_SIZE = 10000
+
+class NearbyQuery(BaseModel):
+    """One point of a batch nearby search."""
+    lat: float = Field(..., description="Latitude of the reference point")
+    long: float = Field(..., description="Longitude of the reference point")
+    radius: float = Field(5.0, description="Search radius in kilometers")
+
+class NearbyBatchRequest(BaseModel):
+    """Schema for a batch nearby search."""
+    queries: list[NearbyQuery] = Field(..., max_length=MAX_NEARBY_BATCH_SIZE)
+
+class OutletCluster(BaseModel):
+    """Schema for a cluster of outlets on the map."""
+    count: int = Field(..., description="Number of outlets in the cluster")
+    lat: float = Field(..., description="Latitude of the cluster centroid")
+    long: float = Field(..., description="Longitude of the cluster centroid")
+    bbox: list[float] = Field(..., description="west, south, east, north of the cluster's outlets")
+    ids: list[int] = Field(..., description="IDs of the outlets in the cluster, at most the first 100")
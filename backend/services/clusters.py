@@ -0,0 +1,131 @@
+"""Zoom-aware marker clustering over a quadtree of outlet coordinates."""
+import math
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+# Clusters group the outlets within one CLUSTER_SIZE x CLUSTER_SIZE pixel
+# cell of a 256 pixel Web Mercator tile, i.e. cells at quadtree level
+# zoom + CELL_LEVEL_OFFSET.
+CLUSTER_SIZE = 64
+CELL_LEVEL_OFFSET = int(math.log2(256 // CLUSTER_SIZE))
+
+# Above this zoom outlets are no longer clustered any finer
+MAX_CLUSTER_ZOOM = 20
+MAX_LEVEL = MAX_CLUSTER_ZOOM + CELL_LEVEL_OFFSET
+
+# Web Mercator stops short of the poles
+MAX_LATITUDE = math.degrees(math.atan(math.sinh(math.pi)))
+
+class ClusterLevel(NamedTuple):
+    """The clusters at one zoom level, in quadtree order."""
+    starts: np.ndarray
+    lat: np.ndarray
+    long: np.ndarray
+
+def quadkeys(lat: np.ndarray, long: np.ndarray, level: int = MAX_LEVEL) -> np.ndarray:
+    """Morton codes of the Web Mercator quadtree cells at level holding each point."""
+    cells = 2 ** level
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = np.clip(((long + 180.0) / 360.0 * cells).astype(np.int64), 0, cells - 1)
+    y = np.clip(((1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * cells).astype(np.int64), 0, cells - 1)
+    keys = np.zeros(len(x), dtype=np.int64)
+    for bit in range(level):
+        keys |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return keys
+
+class ClusterIndex:
+    """
+    Hierarchical clusters of outlets for every zoom level, built at once.
+
+    Outlets are sorted along the quadtree's Z-order curve, so the members of
+    every cluster at every zoom level are one contiguous run of that order
+    and a cluster at zoom z is the union of at most four clusters at z + 1.
+    Each level keeps only where its runs start and their centroids; counts
+    and bounding boxes are reduced from the sorted outlets on demand. Levels
+    that split no cluster further share the arrays of the level below.
+    """
+
+    def __init__(self, ids: np.ndarray, lat: np.ndarray, long: np.ndarray):
+        keys = quadkeys(lat, long)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.ids = ids[order]
+        self.lat, self.long = lat[order], long[order]
+
+        self.levels: List[ClusterLevel] = []
+        for zoom in range(MAX_CLUSTER_ZOOM + 1):
+            cell_keys = keys >> (2 * (MAX_CLUSTER_ZOOM - zoom))
+            starts = np.flatnonzero(np.r_[True, cell_keys[1:] != cell_keys[:-1]]) if len(keys) else []
+            starts = np.asarray(starts, dtype=np.int32)
+            if self.levels and len(self.levels[-1].starts) == len(starts):
+                # Each level's runs split those of the level above, so equal
+                # numbers of runs are the same runs
+                self.levels.append(self.levels[-1])
+                continue
+            counts = self._counts(starts)
+            self.levels.append(ClusterLevel(
+                starts=starts,
+                lat=self._reduce(np.add, self.lat, starts) / counts,
+                long=self._reduce(np.add, self.long, starts) / counts,
+            ))
+
+    def _counts(self, starts: np.ndarray) -> np.ndarray:
+        return np.diff(np.r_[starts, len(self.ids)])
+
+    @staticmethod
+    def _reduce(ufunc, values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        if not len(starts):
+            return np.array([], dtype=np.float64)
+        return ufunc.reduceat(values, starts)
+
+    def level(self, zoom: int) -> ClusterLevel:
+        """The clusters at a zoom level; zooms beyond MAX_CLUSTER_ZOOM use the finest."""
+        return self.levels[min(max(zoom, 0), MAX_CLUSTER_ZOOM)]
+
+    def counts(self, zoom: int) -> np.ndarray:
+        """Number of outlets in each cluster of level(zoom)."""
+        return self._counts(self.level(zoom).starts)
+
+    def in_viewport(
+        self, zoom: int, west: float, south: float, east: float, north: float
+    ) -> np.ndarray:
+        """
+        Indices into level(zoom) of the clusters with their centroid in the viewport.
+
+        A viewport with west > east crosses the antimeridian.
+        """
+        level = self.level(zoom)
+        in_lat = (level.lat >= south) & (level.lat <= north)
+        if west <= east:
+            in_long = (level.long >= west) & (level.long <= east)
+        else:
+            in_long = (level.long >= west) | (level.long <= east)
+        return np.flatnonzero(in_lat & in_long)
+
+    def bounds(
+        self, zoom: int, clusters: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(counts, west, south, east, north) of some clusters of level(zoom)."""
+        starts = self.level(zoom).starts[clusters]
+        ends = starts + self.counts(zoom)[clusters]
+        if not len(starts):
+            empty = np.array([], dtype=np.float64)
+            return ends - starts, empty, empty, empty, empty
+        # Reduce over [start, end) runs: the even slices of the interleaved
+        # boundaries, with a sentinel so an end may be one past the last outlet
+        boundaries = np.column_stack([starts, ends]).ravel()
+        lat, long = np.r_[self.lat, 0.0], np.r_[self.long, 0.0]
+        return (
+            ends - starts,
+            np.minimum.reduceat(long, boundaries)[::2],
+            np.minimum.reduceat(lat, boundaries)[::2],
+            np.maximum.reduceat(long, boundaries)[::2],
+            np.maximum.reduceat(lat, boundaries)[::2],
+        )
+
+    def members(self, zoom: int, cluster: int) -> np.ndarray:
+        """IDs of the outlets in a cluster of level(zoom)."""
+        level = self.level(zoom)
+        start = level.starts[cluster]
+        return self.ids[start:start + self.counts(zoom)[cluster]]
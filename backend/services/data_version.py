@@ -0,0 +1,117 @@
+"""Change detection for the outlets table."""
+import os
+import re
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+VERSION_QUERY = text("SELECT generation FROM outlets_version WHERE id = 1")
+BUMP_VERSION = text("UPDATE outlets_version SET generation = generation + 1 WHERE id = 1")
+# For a database the app has not created its tables in yet
+AGGREGATE_VERSION_QUERY = text(
+    "SELECT COUNT(*), MAX(id), MAX(updated_at) FROM outlets"
+)
+
+# How long a data version read from the database is reused. Writes made
+# through this process invalidate it immediately; writes from other
+# processes, such as the scraper, are picked up within this time.
+VERSION_CACHE_SECONDS = 1.0
+
+# The parsed hours in outlet_hours are part of the outlets data
+WRITES_TO_OUTLETS = re.compile(
+    r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b[^;]*?\b(outlets|outlet_hours)\b", re.IGNORECASE
+)
+
+_lock = threading.Lock()
+_cached_versions = {}
+_invalidation_listeners = []
+
+def database_key(bind: Engine):
+    """
+    Identify the database behind an engine.
+
+    Sync and async engines on the same database file get the same key, so
+    they share cached data; in-memory databases are private to their engine.
+    """
+    database = bind.url.database
+    if not database or database == ":memory:":
+        return bind
+    return os.path.abspath(database)
+
+def get_data_version(db: Session) -> tuple:
+    """
+    Get a token that changes whenever the outlets table changes.
+
+    The token is (database key, generation). Triggers on outlets bump the
+    generation in the transaction of every insert, update and delete, so
+    even a delete and an insert within the same second change it. The
+    database key is part of the token so caches keyed on it never mix data
+    from two databases.
+    """
+    try:
+        generation = db.execute(VERSION_QUERY).scalar()
+    except OperationalError:
+        # No outlets_version table before the app has created its tables;
+        # fall back to aggregates, which miss changes that keep them equal
+        count, max_id, max_updated_at = db.execute(AGGREGATE_VERSION_QUERY).one()
+        generation = (count, max_id, str(max_updated_at))
+    return (database_key(db.get_bind()), generation)
+
+def bump_data_version(db: Session) -> None:
+    """Change the data version for writes the outlets triggers do not see, without committing."""
+    db.execute(BUMP_VERSION)
+
+def current_data_version(db: Session) -> tuple:
+    """
+    Get the data version, reusing one read less than VERSION_CACHE_SECONDS ago.
+
+    While the cached version is fresh this does not touch the database.
+    """
+    key = database_key(db.get_bind())
+    now = time.monotonic()
+    with _lock:
+        cached = _cached_versions.get(key)
+    if cached is not None and now - cached[1] < VERSION_CACHE_SECONDS:
+        return cached[0]
+
+    version = get_data_version(db)
+    with _lock:
+        _cached_versions[key] = (version, now)
+    return version
+
+def invalidate_data_version() -> None:
+    """Forget every cached data version and notify invalidation listeners."""
+    with _lock:
+        _cached_versions.clear()
+    for listener in _invalidation_listeners:
+        listener()
+
+def has_outlet_writes(conn: Connection) -> bool:
+    """Whether the connection's current transaction has written to the outlets data."""
+    return conn.info.get("outlets_changed", False)
+
+def add_invalidation_listener(listener: Callable[[], None]) -> None:
+    """Call listener whenever this process changes the outlets table."""
+    _invalidation_listeners.append(listener)
+
+# The flag is cleared when a transaction begins rather than popped on commit,
+# so every copy of this module (imported as services.* and backend.services.*)
+# sees it and invalidates its own cache.
+@event.listens_for(Engine, "begin")
+def _reset_outlet_writes(conn):
+    conn.info.pop("outlets_changed", None)
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _track_outlet_writes(conn, cursor, statement, parameters, context, executemany):
+    if WRITES_TO_OUTLETS.match(statement):
+        conn.info["outlets_changed"] = True
+
+@event.listens_for(Engine, "commit")
+def _invalidate_on_commit(conn):
+    if has_outlet_writes(conn):
+        invalidate_data_version()
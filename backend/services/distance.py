@@ -0,0 +1,275 @@
+"""Vectorized distance calculations over outlet coordinates."""
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+HAVERSINE = "haversine"
+GEODESIC = "geodesic"
+MODES = (HAVERSINE, GEODESIC)
+
+# Mean earth radius (IUGG). Against the WGS84 ellipsoid the spherical
+# haversine distance is off by at most ~0.56%, so exact mode refines every
+# pair whose haversine distance is within this margin of the radius.
+EARTH_RADIUS_KM = 6371.0088
+HAVERSINE_MAX_RELATIVE_ERROR = 0.006
+
+# WGS84 ellipsoid, as used by geopy.distance.geodesic
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1 - WGS84_F)
+
+VINCENTY_TOLERANCE = 1e-12
+VINCENTY_MAX_ITERATIONS = 200
+
+# Rows per block when computing many-to-many distances, bounding the size of
+# the temporary matrices to BLOCK_SIZE x n.
+BLOCK_SIZE = 1024
+
+def haversine(lat1, long1, lat2, long2) -> np.ndarray:
+    """Great-circle distance in kilometers; arguments broadcast like NumPy arrays."""
+    lat1, long1, lat2, long2 = (np.radians(a) for a in (lat1, long1, lat2, long2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((long2 - long1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def vincenty(lat1, long1, lat2, long2) -> np.ndarray:
+    """
+    Distance on the WGS84 ellipsoid in kilometers (Vincenty's inverse formula).
+
+    Arguments broadcast like NumPy arrays. The few nearly antipodal pairs where
+    the iteration does not converge are handed to geopy's geodesic.
+    """
+    lat1, long1, lat2, long2 = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (lat1, long1, lat2, long2))
+    )
+    shape = lat1.shape
+    lat1, long1, lat2, long2 = (a.ravel() for a in (lat1, long1, lat2, long2))
+
+    L = np.radians(long2 - long1)
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    active = np.ones(L.shape, dtype=bool)
+    sin_sigma = np.zeros_like(L)
+    cos_sigma = np.ones_like(L)
+    sigma = np.zeros_like(L)
+    cos_sq_alpha = np.ones_like(L)
+    cos_2sigma_m = np.zeros_like(L)
+
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        if not active.any():
+            break
+        i = np.flatnonzero(active)
+        sin_lam, cos_lam = np.sin(lam[i]), np.cos(lam[i])
+        s_sigma = np.hypot(
+            cos_u2[i] * sin_lam,
+            cos_u1[i] * sin_u2[i] - sin_u1[i] * cos_u2[i] * cos_lam,
+        )
+        c_sigma = sin_u1[i] * sin_u2[i] + cos_u1[i] * cos_u2[i] * cos_lam
+        sig = np.arctan2(s_sigma, c_sigma)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sin_alpha = np.where(
+                s_sigma == 0, 0.0, cos_u1[i] * cos_u2[i] * sin_lam / s_sigma
+            )
+            c_sq_alpha = 1 - sin_alpha ** 2
+            c_2sigma_m = np.where(
+                c_sq_alpha == 0, 0.0,
+                c_sigma - 2 * sin_u1[i] * sin_u2[i] / c_sq_alpha,
+            )
+        C = WGS84_F / 16 * c_sq_alpha * (4 + WGS84_F * (4 - 3 * c_sq_alpha))
+        new_lam = L[i] + (1 - C) * WGS84_F * sin_alpha * (
+            sig + C * s_sigma * (
+                c_2sigma_m + C * c_sigma * (-1 + 2 * c_2sigma_m ** 2)
+            )
+        )
+
+        sin_sigma[i], cos_sigma[i], sigma[i] = s_sigma, c_sigma, sig
+        cos_sq_alpha[i], cos_2sigma_m[i] = c_sq_alpha, c_2sigma_m
+        converged = np.abs(new_lam - lam[i]) <= VINCENTY_TOLERANCE
+        lam[i] = new_lam
+        active[i[converged]] = False
+
+    u_sq = cos_sq_alpha * (WGS84_A_KM ** 2 - WGS84_B_KM ** 2) / WGS84_B_KM ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (
+        cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        )
+    )
+    distances = WGS84_B_KM * A * (sigma - delta_sigma)
+
+    if active.any():
+        from geopy.distance import geodesic
+
+        for k in np.flatnonzero(active):
+            distances[k] = geodesic((lat1[k], long1[k]), (lat2[k], long2[k])).kilometers
+
+    return distances.reshape(shape)
+
+def check_mode(mode: str) -> None:
+    """Raise ValueError for an unknown distance mode."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown distance mode: {mode}")
+
+def distance(lat1, long1, lat2, long2, mode: str = GEODESIC) -> np.ndarray:
+    """Distance in kilometers using the given mode."""
+    check_mode(mode)
+    if mode == HAVERSINE:
+        return haversine(lat1, long1, lat2, long2)
+    return vincenty(lat1, long1, lat2, long2)
+
+class DistanceEngine:
+    """Outlet coordinates held as contiguous float64 arrays."""
+
+    def __init__(self, ids, lat, long):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.long = np.ascontiguousarray(long, dtype=np.float64)
+
+    @classmethod
+    def from_points(cls, points: Iterable[Tuple[int, float, float]]) -> "DistanceEngine":
+        """Build an engine from (id, lat, long) tuples."""
+        points = list(points)
+        if not points:
+            return cls([], [], [])
+        ids, lat, long = zip(*points)
+        return cls(ids, lat, long)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions(self, positions: Optional[np.ndarray]) -> np.ndarray:
+        if positions is None:
+            return np.arange(len(self.ids))
+        return np.asarray(positions, dtype=np.intp)
+
+    def one_to_many(
+        self,
+        lat: float,
+        long: float,
+        positions: Optional[np.ndarray] = None,
+        mode: str = GEODESIC,
+    ) -> np.ndarray:
+        """Distances from one point to the outlets at the given positions (default all)."""
+        positions = self._positions(positions)
+        return distance(lat, long, self.lat[positions], self.long[positions], mode)
+
+    def many_to_many(self, lats, longs, mode: str = GEODESIC) -> np.ndarray:
+        """Matrix of distances from each query point (rows) to every outlet (columns)."""
+        lats = np.asarray(lats, dtype=np.float64)[:, np.newaxis]
+        longs = np.asarray(longs, dtype=np.float64)[:, np.newaxis]
+        return distance(lats, longs, self.lat[np.newaxis, :], self.long[np.newaxis, :], mode)
+
+    def within(
+        self,
+        lat: float,
+        long: float,
+        radius_km: float,
+        positions: Optional[np.ndarray] = None,
+        mode: str = GEODESIC,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Outlets within radius_km of a point, nearest first.
+
+        Returns (positions, distances). In geodesic mode haversine first discards
+        outlets that are clearly out of range and the exact ellipsoidal distance
+        is computed only for the rest, which decides the pairs near the boundary.
+        """
+        check_mode(mode)
+        positions = self._positions(positions)
+        distances = haversine(lat, long, self.lat[positions], self.long[positions])
+        if mode == GEODESIC:
+            keep = distances <= radius_km * (1 + HAVERSINE_MAX_RELATIVE_ERROR)
+            positions = positions[keep]
+            distances = vincenty(lat, long, self.lat[positions], self.long[positions])
+
+        keep = distances <= radius_km
+        positions, distances = positions[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return positions[order], distances[order]
+
+    def many_within(
+        self, lats, longs, radii_km, mode: str = GEODESIC
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Outlets within each query point's radius, for many points at once.
+
+        Returns (query indices, positions, distances) ordered by query and then
+        distance. Like within, geodesic mode prefilters with haversine; the
+        haversine matrix is computed in blocks of queries that keep it at
+        about BLOCK_SIZE x BLOCK_SIZE entries.
+        """
+        check_mode(mode)
+        lats = np.asarray(lats, dtype=np.float64)
+        longs = np.asarray(longs, dtype=np.float64)
+        radii_km = np.broadcast_to(np.asarray(radii_km, dtype=np.float64), lats.shape)
+        limits = radii_km
+        if mode == GEODESIC:
+            limits = radii_km * (1 + HAVERSINE_MAX_RELATIVE_ERROR)
+
+        block_rows = max(1, BLOCK_SIZE * BLOCK_SIZE // max(len(self.ids), 1))
+        queries, positions, distances = [], [], []
+        for start in range(0, len(lats), block_rows):
+            rows = slice(start, start + block_rows)
+            block = self.many_to_many(lats[rows], longs[rows], HAVERSINE)
+            i, j = np.nonzero(block <= limits[rows, np.newaxis])
+            d = block[i, j]
+            i += start
+            if mode == GEODESIC:
+                d = vincenty(lats[i], longs[i], self.lat[j], self.long[j])
+                keep = d <= radii_km[i]
+                i, j, d = i[keep], j[keep], d[keep]
+            queries.append(i)
+            positions.append(j)
+            distances.append(d)
+
+        if not queries:
+            empty = np.array([], dtype=np.intp)
+            return empty, empty, np.array([], dtype=np.float64)
+        queries, positions, distances = (
+            np.concatenate(queries), np.concatenate(positions), np.concatenate(distances)
+        )
+        order = np.lexsort((distances, queries))
+        return queries[order], positions[order], distances[order]
+
+    def pairs_within(
+        self, radius_km: float, mode: str = GEODESIC
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Every ordered pair of distinct outlets at most radius_km apart.
+
+        Returns (first positions, second positions, distances), computed in
+        blocks of rows so the temporary matrices stay bounded.
+        """
+        check_mode(mode)
+        limit = radius_km
+        if mode == GEODESIC:
+            limit = radius_km * (1 + HAVERSINE_MAX_RELATIVE_ERROR)
+
+        firsts, seconds, pair_distances = [], [], []
+        for start in range(0, len(self.ids), BLOCK_SIZE):
+            rows = np.arange(start, min(start + BLOCK_SIZE, len(self.ids)))
+            block = self.many_to_many(self.lat[rows], self.long[rows], HAVERSINE)
+            block[rows - start, rows] = np.inf
+            i, j = np.nonzero(block <= limit)
+            i = rows[i]
+            d = block[i - start, j]
+            if mode == GEODESIC:
+                d = vincenty(self.lat[i], self.long[i], self.lat[j], self.long[j])
+                keep = d <= radius_km
+                i, j, d = i[keep], j[keep], d[keep]
+            firsts.append(i)
+            seconds.append(j)
+            pair_distances.append(d)
+
+        if not firsts:
+            empty = np.array([], dtype=np.intp)
+            return empty, empty, np.array([], dtype=np.float64)
+        return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(pair_distances)
@@ -0,0 +1,215 @@
+"""Precomputed outlet-to-outlet distance table."""
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .data_version import current_data_version, get_data_version
+from .distance import BLOCK_SIZE, GEODESIC, DistanceEngine, check_mode
+from .pairs import grid_pairs
+from .spatial_index import COORDINATES_QUERY
+
+log = logging.getLogger(__name__)
+
+# Rows per executemany batch
+INSERT_BATCH_SIZE = 10000
+
+# Nearest outlets kept per outlet unless the caller says otherwise: a
+# complete table grows with the square of the number of outlets
+DEFAULT_K = 50
+
+INSERT_DISTANCE = text(
+    "INSERT INTO outlet_distances (outlet_id, other_outlet_id, distance) "
+    "VALUES (:outlet_id, :other_outlet_id, :distance)"
+)
+INSERT_INFO = text(
+    "INSERT INTO outlet_distance_info "
+    "(id, outlet_count, data_version, k, max_radius_km, mode) "
+    "VALUES (1, :outlet_count, :data_version, :k, :max_radius_km, :mode)"
+)
+SELECT_INFO = text(
+    "SELECT data_version, k, max_radius_km, mode "
+    "FROM outlet_distance_info WHERE id = 1"
+)
+SELECT_DISTANCES = text(
+    "SELECT other_outlet_id, distance FROM outlet_distances "
+    "WHERE outlet_id = :outlet_id ORDER BY distance"
+)
+SELECT_DISTANCES_WITHIN = text(
+    "SELECT other_outlet_id, distance FROM outlet_distances "
+    "WHERE outlet_id = :outlet_id AND distance <= :max_distance ORDER BY distance"
+)
+SELECT_FARTHEST = text(
+    "SELECT COUNT(*), MAX(distance) FROM outlet_distances WHERE outlet_id = :outlet_id"
+)
+
+def _nearest_per_outlet(
+    firsts: np.ndarray, seconds: np.ndarray, distances: np.ndarray, k: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Keep the k nearest rows for every outlet (all rows if k is None)."""
+    order = np.lexsort((distances, firsts))
+    firsts, seconds, distances = firsts[order], seconds[order], distances[order]
+    if k is not None and len(firsts):
+        group_starts = np.flatnonzero(np.r_[True, firsts[1:] != firsts[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(firsts)])
+        rank = np.arange(len(firsts)) - np.repeat(group_starts, group_sizes)
+        keep = rank < k
+        firsts, seconds, distances = firsts[keep], seconds[keep], distances[keep]
+    return firsts, seconds, distances
+
+def compute_distance_rows(
+    engine: DistanceEngine,
+    k: Optional[int] = None,
+    max_radius_km: Optional[float] = None,
+    mode: str = GEODESIC,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute (outlet positions, other outlet positions, distances) for the table.
+
+    With max_radius_km only pairs within the radius are kept, found with the
+    grid pair search; with k only the k nearest other outlets of each outlet.
+    """
+    check_mode(mode)
+    if max_radius_km is not None:
+        firsts, seconds, distances = grid_pairs(engine, max_radius_km, mode)
+        return _nearest_per_outlet(
+            np.concatenate([firsts, seconds]),
+            np.concatenate([seconds, firsts]),
+            np.concatenate([distances, distances]),
+            k,
+        )
+
+    firsts, seconds, pair_distances = [], [], []
+    for start in range(0, len(engine), BLOCK_SIZE):
+        rows = np.arange(start, min(start + BLOCK_SIZE, len(engine)))
+        block = engine.many_to_many(engine.lat[rows], engine.long[rows], mode)
+        block[rows - start, rows] = np.inf
+        columns = np.argsort(block, axis=1, kind="stable")[:, :len(engine) - 1]
+        if k is not None:
+            columns = columns[:, :k]
+        firsts.append(np.repeat(rows, columns.shape[1]))
+        seconds.append(columns.ravel())
+        pair_distances.append(np.take_along_axis(block, columns, axis=1).ravel())
+
+    if not firsts:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty, np.array([], dtype=np.float64)
+    return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(pair_distances)
+
+def build_distance_table(
+    db: Session,
+    k: Optional[int] = DEFAULT_K,
+    max_radius_km: Optional[float] = None,
+    mode: str = GEODESIC,
+) -> int:
+    """
+    Rebuild the outlet_distances table from the current outlets and commit.
+
+    Only the k nearest outlets of each outlet, within max_radius_km, are
+    kept; with neither, every pair is. Returns the number of rows written.
+    """
+    version = get_data_version(db)
+    engine = DistanceEngine.from_points(tuple(row) for row in db.execute(COORDINATES_QUERY))
+    firsts, seconds, distances = compute_distance_rows(engine, k, max_radius_km, mode)
+
+    outlet_ids = engine.ids[firsts].tolist()
+    other_ids = engine.ids[seconds].tolist()
+    distances = distances.tolist()
+
+    db.execute(text("DELETE FROM outlet_distances"))
+    db.execute(text("DELETE FROM outlet_distance_info"))
+    for start in range(0, len(outlet_ids), INSERT_BATCH_SIZE):
+        end = start + INSERT_BATCH_SIZE
+        db.execute(INSERT_DISTANCE, [
+            {"outlet_id": outlet_id, "other_outlet_id": other_id, "distance": distance}
+            for outlet_id, other_id, distance in zip(
+                outlet_ids[start:end], other_ids[start:end], distances[start:end]
+            )
+        ])
+    db.execute(INSERT_INFO, {
+        "outlet_count": len(engine),
+        "data_version": repr(version[1]),
+        "k": k,
+        "max_radius_km": max_radius_km,
+        "mode": mode,
+    })
+    db.commit()
+
+    log.info(f"Built distance table with {len(outlet_ids)} rows for {len(engine)} outlets")
+    return len(outlet_ids)
+
+def current_table_info(db: Session, mode: str = GEODESIC) -> Optional[Tuple[Optional[int], Optional[float]]]:
+    """
+    Get the (k, max_radius_km) the table was built with, if it is usable.
+
+    Returns None when the table is missing or was built for other outlets
+    data or another distance mode.
+    """
+    info = db.execute(SELECT_INFO).first()
+    if info is None:
+        return None
+    data_version, k, max_radius_km, built_mode = info
+    if built_mode != mode or repr(current_data_version(db)[1]) != data_version:
+        return None
+    return k, max_radius_km
+
+def is_complete(db: Session, mode: str = GEODESIC) -> bool:
+    """Whether the table is usable and holds every pair of outlets."""
+    return current_table_info(db, mode) == (None, None)
+
+def stored_distances(
+    db: Session, outlet_id: int, mode: str = GEODESIC
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Read every (other outlet IDs, distances) row the table holds for an outlet, nearest first.
+
+    A truncated table holds only the nearest outlets. Returns None when the
+    table is missing or was built for other outlets data or another mode.
+    """
+    if current_table_info(db, mode) is None:
+        return None
+    rows = db.execute(SELECT_DISTANCES, {"outlet_id": outlet_id}).all()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    distances = np.array([row[1] for row in rows], dtype=np.float64)
+    return ids, distances
+
+def lookup_distances(
+    db: Session,
+    outlet_id: int,
+    max_distance_km: Optional[float] = None,
+    mode: str = GEODESIC,
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Read (other outlet IDs, distances) for an outlet from the table, nearest first.
+
+    Returns None when the table cannot answer the query: it is missing, was
+    built for other outlets data or another distance mode, or was truncated
+    below max_distance_km (or at all, when max_distance_km is None).
+    """
+    info = current_table_info(db, mode)
+    if info is None:
+        return None
+    k, max_radius_km = info
+
+    if max_distance_km is None:
+        if k is not None or max_radius_km is not None:
+            return None
+        rows = db.execute(SELECT_DISTANCES, {"outlet_id": outlet_id}).all()
+    else:
+        if max_radius_km is not None and max_radius_km < max_distance_km:
+            return None
+        if k is not None:
+            # Complete only if the outlet has fewer than k rows or its k-th
+            # nearest outlet is already beyond the requested distance.
+            count, farthest = db.execute(SELECT_FARTHEST, {"outlet_id": outlet_id}).one()
+            if count >= k and farthest <= max_distance_km:
+                return None
+        rows = db.execute(
+            SELECT_DISTANCES_WITHIN, {"outlet_id": outlet_id, "max_distance": max_distance_km}
+        ).all()
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    distances = np.array([row[1] for row in rows], dtype=np.float64)
+    return ids, distances
@@ -0,0 +1,122 @@
+"""Streaming NDJSON and CSV exports of outlets and outlet distances."""
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+import orjson
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .distance import BLOCK_SIZE, GEODESIC, DistanceEngine
+from .distance_table import is_complete
+from .snapshot import OUTLET_FIELDS, SNAPSHOT_QUERY
+
+NDJSON = "ndjson"
+CSV = "csv"
+MEDIA_TYPES = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+
+# Rows fetched from SQLite and encoded per chunk of the response
+EXPORT_CHUNK_SIZE = 1000
+
+DISTANCE_FIELDS = ("outlet_id", "other_outlet_id", "distance")
+
+SELECT_ALL_DISTANCES = text(
+    "SELECT outlet_id, other_outlet_id, distance FROM outlet_distances "
+    "ORDER BY outlet_id, distance"
+)
+SELECT_OUTLET_DISTANCES = text(
+    "SELECT outlet_id, other_outlet_id, distance FROM outlet_distances "
+    "WHERE outlet_id = :outlet_id ORDER BY distance"
+)
+
+def encode_rows(fields: Sequence[str], rows: Iterable[Sequence], format: str) -> bytes:
+    """Encode rows of field values as NDJSON lines or CSV records."""
+    if format == NDJSON:
+        return b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+def header(fields: Sequence[str], format: str) -> Iterator[bytes]:
+    """The CSV header line; NDJSON has none."""
+    if format == CSV:
+        yield (",".join(fields) + "\n").encode()
+
+def iter_query(bind: Engine, statement, params: Optional[dict] = None) -> Iterator[Sequence]:
+    """Yield lists of up to EXPORT_CHUNK_SIZE rows read through a streaming cursor."""
+    with Session(bind) as db:
+        result = db.execute(
+            statement.execution_options(yield_per=EXPORT_CHUNK_SIZE), params or {}
+        )
+        yield from result.partitions()
+
+def iter_outlets(bind: Engine, format: str) -> Iterator[bytes]:
+    """
+    Stream every outlet in ID order.
+
+    The session is opened here rather than taken from the request, as the
+    response body is produced after the endpoint and its dependencies return.
+    """
+    yield from header(OUTLET_FIELDS, format)
+    for rows in iter_query(bind, SNAPSHOT_QUERY):
+        yield encode_rows(OUTLET_FIELDS, rows, format)
+
+def iter_computed_distances(
+    engine: DistanceEngine, positions: np.ndarray, format: str, mode: str = GEODESIC
+) -> Iterator[bytes]:
+    """Compute and stream the distances from the outlets at positions to every other outlet."""
+    block_rows = max(1, BLOCK_SIZE * BLOCK_SIZE // max(len(engine), 1))
+    for start in range(0, len(positions), block_rows):
+        rows = positions[start:start + block_rows]
+        block = engine.many_to_many(engine.lat[rows], engine.long[rows], mode)
+        block[np.arange(len(rows)), rows] = np.inf
+        order = np.argsort(block, axis=1, kind="stable")[:, :len(engine) - 1]
+        for row, position in enumerate(rows.tolist()):
+            outlet_id = int(engine.ids[position])
+            other_ids = engine.ids[order[row]].tolist()
+            distances = block[row, order[row]].tolist()
+            for chunk in range(0, len(other_ids), EXPORT_CHUNK_SIZE):
+                end = chunk + EXPORT_CHUNK_SIZE
+                yield encode_rows(
+                    DISTANCE_FIELDS,
+                    ((outlet_id, other_id, distance) for other_id, distance in zip(other_ids[chunk:end], distances[chunk:end])),
+                    format,
+                )
+
+def iter_distances(
+    bind: Engine,
+    engine: DistanceEngine,
+    format: str,
+    outlet_id: Optional[int] = None,
+    mode: str = GEODESIC,
+) -> Iterator[bytes]:
+    """
+    Stream outlet-to-outlet distances, for one outlet or for all, nearest first.
+
+    Rows come from the precomputed distance table when it is current and
+    complete, and are computed block by block from engine otherwise.
+    """
+    yield from header(DISTANCE_FIELDS, format)
+    with Session(bind) as db:
+        from_table = is_complete(db, mode)
+    if from_table:
+        if outlet_id is None:
+            chunks = iter_query(bind, SELECT_ALL_DISTANCES)
+        else:
+            chunks = iter_query(bind, SELECT_OUTLET_DISTANCES, {"outlet_id": outlet_id})
+        for rows in chunks:
+            yield encode_rows(DISTANCE_FIELDS, rows, format)
+        return
+
+    if outlet_id is None:
+        positions = np.arange(len(engine))
+    else:
+        positions = np.flatnonzero(engine.ids == outlet_id)
+    yield from iter_computed_distances(engine, positions, format, mode)
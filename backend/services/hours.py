@@ -0,0 +1,268 @@
+"""Operating hours parsed into per-weekday open intervals."""
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .data_version import bump_data_version, has_outlet_writes
+
+# Outlets keep Malaysian time, which has no daylight saving
+OUTLET_TIMEZONE = timezone(timedelta(hours=8))
+
+MINUTES_PER_DAY = 24 * 60
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+EVERY_DAY = tuple(range(7))
+
+# An interval an outlet is open: (weekday, opens, closes) with Monday as
+# weekday 0 and opens <= minute < closes in minutes after midnight. Hours
+# past midnight are split into the next day.
+Interval = Tuple[int, int, int]
+
+_SEPARATOR = r"\s*(?:-|–|—|~|\bto\b|\buntil\b)\s*"
+_DAY = r"\b(?:mon(?:day)?|tue(?:s|sday)?|wed(?:nesday)?|thu(?:r|rs|rsday)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)\b\.?"
+_TIME = r"\d{1,2}(?:[:.]?\d{2})?(?:\s*[ap]\.?\s?m\b\.?)?"
+
+TOKEN_PATTERN = re.compile(
+    rf"(?P<always>\b(?:open\s+)?24\s*(?:hours|hrs|h)\b)"
+    rf"|(?P<opens>{_TIME}){_SEPARATOR}(?P<closes>{_TIME})"
+    rf"|(?P<first>{_DAY})(?:{_SEPARATOR}(?P<last>{_DAY}))?"
+    rf"|(?P<daily>\b(?:daily|every\s?day)\b)"
+    rf"|(?P<closed>\bclosed?\b)"
+)
+TIME_PATTERN = re.compile(r"(\d{1,2})(?:[:.]?(\d{2}))?(?:\s*([ap])\.?\s?m\.?)?")
+
+SELECT_HOURS = text("SELECT outlet_id, weekday, opens, closes FROM outlet_hours")
+SELECT_OUTLETS_WITHOUT_HOURS = text(
+    "SELECT id, operating_hours FROM outlets WHERE operating_hours IS NOT NULL "
+    "AND id NOT IN (SELECT outlet_id FROM outlet_hours)"
+)
+# Outlets queued by the outlets triggers, with their current hours
+SELECT_PENDING_HOURS = text(
+    "SELECT outlets.id, outlets.operating_hours FROM outlet_hours_pending "
+    "JOIN outlets ON outlets.id = outlet_hours_pending.outlet_id"
+)
+CLEAR_PENDING_HOURS = text("DELETE FROM outlet_hours_pending")
+DELETE_HOURS = text("DELETE FROM outlet_hours WHERE outlet_id = :outlet_id")
+INSERT_HOURS = text(
+    "INSERT OR IGNORE INTO outlet_hours (outlet_id, weekday, opens, closes) "
+    "VALUES (:outlet_id, :weekday, :opens, :closes)"
+)
+# Outlets open at a weekday and minute, answered from the weekday index
+OPEN_OUTLET_IDS = (
+    "SELECT outlet_id FROM outlet_hours "
+    "WHERE weekday = :weekday AND opens <= :minute AND closes > :minute"
+)
+
+def _weekday(name: str) -> int:
+    return WEEKDAYS.index(name.rstrip(".")[:3])
+
+def _days(first: str, last: Optional[str]) -> Tuple[int, ...]:
+    """The weekdays from first to last, wrapping past Sunday."""
+    start = _weekday(first)
+    if last is None:
+        return (start,)
+    return tuple((start + offset) % 7 for offset in range((_weekday(last) - start) % 7 + 1))
+
+def _minute(value: str) -> Optional[int]:
+    """Minutes after midnight of a time like 9:30 AM, 9am, 21:30 or 2130."""
+    match = TIME_PATTERN.fullmatch(value.strip())
+    if match is None:
+        return None
+    hour, minute, meridiem = int(match[1]), int(match[2] or 0), match[3]
+    if meridiem is None and match[2] is None:
+        # A bare number is more likely part of an address than a time
+        return None
+    if meridiem is not None:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 24 or minute > 59 or hour * 60 + minute > MINUTES_PER_DAY:
+        return None
+    return hour * 60 + minute
+
+def _intervals(days: Iterable[int], opens: int, closes: int) -> List[Interval]:
+    """The intervals of opening hours on each of days, split at midnight."""
+    if closes == 0:
+        closes = MINUTES_PER_DAY
+    intervals = []
+    for day in days:
+        if opens < closes:
+            intervals.append((day, opens, closes))
+        elif opens == closes:
+            intervals.append((day, 0, MINUTES_PER_DAY))
+        else:
+            # Open past midnight, into the next day
+            intervals.append((day, opens, MINUTES_PER_DAY))
+            intervals.append(((day + 1) % 7, 0, closes))
+    return intervals
+
+def parse_operating_hours(hours: Optional[str]) -> List[Interval]:
+    """
+    Parse free-text operating hours into sorted, merged open intervals.
+
+    Understands the forms the store locator uses, such as "Monday - Sunday,
+    8:00 AM - 10:00 PM", "Mon - Sun : 10am-6pm", "0800 - 2200 (Sun - Thur)",
+    several day ranges with their own hours, "Tuesday : Close" and "Open 24
+    hours". Hours given without days apply to every day. Text with no
+    recognizable hours, such as "Not specified", gives no intervals.
+    """
+    if not hours:
+        return []
+    normalized = hours.replace("\xa0", " ").casefold()
+
+    by_day: Dict[int, List[Tuple[int, int]]] = {}
+    pending_days: List[int] = []
+    last_days: Tuple[int, ...] = ()
+    pending_hours: List[Tuple[int, int]] = []
+
+    def assign(days, opens, closes):
+        for day, start, end in _intervals(days, opens, closes):
+            by_day.setdefault(day, []).append((start, end))
+
+    for match in TOKEN_PATTERN.finditer(normalized):
+        if match["always"] or match["opens"]:
+            if match["always"]:
+                opens, closes = 0, MINUTES_PER_DAY
+            else:
+                opens, closes = _minute(match["opens"]), _minute(match["closes"])
+                if opens is None or closes is None:
+                    continue
+            if pending_days:
+                last_days, pending_days = tuple(pending_days), []
+                assign(last_days, opens, closes)
+            else:
+                # Hours before their days, as in "0800 - 2200 (Sun - Thur)"
+                pending_hours.append((opens, closes))
+        elif match["first"] or match["daily"]:
+            days = EVERY_DAY if match["daily"] else _days(match["first"], match["last"])
+            if pending_hours and not pending_days:
+                last_days = days
+                for opens, closes in pending_hours:
+                    assign(days, opens, closes)
+                pending_hours = []
+            else:
+                pending_days.extend(days)
+        elif match["closed"]:
+            # Only days named just before count as closed, as in "Tuesday : Close"
+            for day in pending_days:
+                by_day.pop(day, None)
+            pending_days = []
+
+    for opens, closes in pending_hours:
+        assign(last_days or EVERY_DAY, opens, closes)
+
+    intervals = []
+    for day in sorted(by_day):
+        merged: List[List[int]] = []
+        for start, end in sorted(by_day[day]):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        intervals.extend((day, start, end) for start, end in merged)
+    return intervals
+
+def weekday_minute(when: datetime) -> Tuple[int, int]:
+    """
+    The (weekday, minute after midnight) of a time at the outlets.
+
+    Times with a UTC offset are converted to OUTLET_TIMEZONE; naive times
+    are taken to be outlet local time already.
+    """
+    if when.tzinfo is not None:
+        when = when.astimezone(OUTLET_TIMEZONE)
+    return when.weekday(), when.hour * 60 + when.minute
+
+def write_outlet_hours(db: Session, outlets: Iterable[Tuple[int, Optional[str]]]) -> None:
+    """
+    Replace the outlet_hours rows of (outlet ID, operating hours) pairs.
+
+    Hours of None remove an outlet's rows, as for a deleted outlet. Does not
+    commit, so the rows change in the same transaction as their outlets.
+    """
+    deletes, inserts = [], []
+    for outlet_id, hours in outlets:
+        deletes.append({"outlet_id": outlet_id})
+        inserts.extend(
+            {"outlet_id": outlet_id, "weekday": weekday, "opens": opens, "closes": closes}
+            for weekday, opens, closes in parse_operating_hours(hours)
+        )
+    if deletes:
+        db.execute(DELETE_HOURS, deletes)
+    if inserts:
+        db.execute(INSERT_HOURS, inserts)
+    if deletes or inserts:
+        # Parsed hours change open_at results but not the outlets table
+        bump_data_version(db)
+
+def write_pending_outlet_hours(db: Session) -> int:
+    """
+    Parse the hours of the outlets queued by the outlets triggers and empty the queue.
+
+    Does not commit. Returns the number of outlets parsed.
+    """
+    rows = db.execute(SELECT_PENDING_HOURS).all()
+    if rows:
+        write_outlet_hours(db, [tuple(row) for row in rows])
+        db.execute(CLEAR_PENDING_HOURS)
+    return len(rows)
+
+def fill_missing_outlet_hours(db: Session) -> int:
+    """
+    Parse the hours of outlets that have no outlet_hours rows yet and commit.
+
+    Fills the table for outlets ingested before it existed, and for outlets
+    queued by writes that were not committed through a session of this app,
+    such as from the sqlite3 shell. Returns the number of outlets that got
+    hours.
+    """
+    rows = db.execute(SELECT_OUTLETS_WITHOUT_HOURS).all()
+    parsed = [(outlet_id, hours) for outlet_id, hours in rows if parse_operating_hours(hours)]
+    if parsed:
+        write_outlet_hours(db, parsed)
+    # Every queued outlet has no hours rows, so it was parsed above
+    db.execute(CLEAR_PENDING_HOURS)
+    db.commit()
+    return len(parsed)
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_hours_on_commit(session):
+    """Parse the hours of outlets written in the session, in the same transaction."""
+    # Flush first so ORM writes have fired the outlets triggers
+    session.flush()
+    if has_outlet_writes(session.connection()):
+        write_pending_outlet_hours(session)
+
+class HoursIndex:
+    """
+    Open intervals of every outlet grouped by weekday, for "open at" queries.
+
+    Intervals are sorted by weekday and opening minute, so the intervals of
+    a day that have opened by a given minute are one contiguous run.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, int, int, int]]):
+        rows = np.array(list(rows), dtype=np.int64).reshape(-1, 4)
+        order = np.lexsort((rows[:, 2], rows[:, 1]))
+        rows = rows[order]
+        # Copied, so the index does not keep the whole rows array alive
+        self.ids = rows[:, 0].copy()
+        self.opens = rows[:, 2].astype(np.int16)
+        self.closes = rows[:, 3].astype(np.int16)
+        self.day_starts = np.searchsorted(rows[:, 1], np.arange(8))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def open_ids(self, weekday: int, minute: int) -> np.ndarray:
+        """Sorted IDs of the outlets open at a minute after midnight on a weekday."""
+        start, end = self.day_starts[weekday], self.day_starts[weekday + 1]
+        end = start + int(np.searchsorted(self.opens[start:end], minute, side="right"))
+        return np.unique(self.ids[start:end][self.closes[start:end] > minute])
+
+def load_hours_index(db: Session) -> HoursIndex:
+    """Read the outlet_hours table into a new index."""
+    return HoursIndex(tuple(row) for row in db.execute(SELECT_HOURS))
@@ -0,0 +1,126 @@
+"""Grid-based search for pairs of outlets within a distance of each other."""
+import math
+from typing import Tuple
+
+import numpy as np
+
+from .distance import (
+    GEODESIC,
+    HAVERSINE_MAX_RELATIVE_ERROR,
+    DistanceEngine,
+    check_mode,
+    haversine,
+    vincenty,
+)
+from .spatial_index import BBOX_SAFETY_FACTOR, KM_PER_DEGREE_LAT, KM_PER_DEGREE_LONG_AT_EQUATOR
+
+# Neighbouring cells visited from each cell. Together with the cell itself
+# (handled separately) this half of the 3x3 neighbourhood reaches every
+# adjacent cell exactly once per unordered pair of cells.
+HALF_NEIGHBOURHOOD = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+# With fewer columns around the globe, column +1 and column -1 would be the
+# same cell and pairs would be visited twice, so the brute-force block search
+# is used instead.
+MIN_GRID_COLUMNS = 3
+
+# Source outlets handled per step, bounding the candidate pair arrays
+CHUNK_SIZE = 8192
+
+def _expand(sources: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair each source with every position in its [start, end) range."""
+    lengths = np.maximum(ends - starts, 0)
+    total = int(lengths.sum())
+    if total == 0:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty
+    group_starts = np.cumsum(lengths) - lengths
+    offsets = np.arange(total) - np.repeat(group_starts, lengths)
+    return np.repeat(sources, lengths), np.repeat(starts, lengths) + offsets
+
+def grid_pairs(
+    engine: DistanceEngine, distance_km: float, mode: str = GEODESIC
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every unordered pair of distinct outlets at most distance_km apart.
+
+    Outlets are bucketed into cells at least distance_km wide, so only
+    outlets in the same or adjacent cells are compared. Returns
+    (first positions, second positions, distances) with each pair once.
+    """
+    check_mode(mode)
+    empty = np.array([], dtype=np.intp)
+    if len(engine) < 2 or distance_km < 0:
+        return empty, empty, np.array([], dtype=np.float64)
+
+    cell_lat = max(distance_km, 1e-9) / KM_PER_DEGREE_LAT * BBOX_SAFETY_FACTOR
+    max_abs_lat = min(float(np.abs(engine.lat).max()) + cell_lat, 90.0)
+    cos_lat = math.cos(math.radians(max_abs_lat))
+    columns = 0
+    if cos_lat > 0:
+        cell_long = max(distance_km, 1e-9) / (KM_PER_DEGREE_LONG_AT_EQUATOR * cos_lat) * BBOX_SAFETY_FACTOR
+        columns = math.floor(360.0 / cell_long)
+    if columns < MIN_GRID_COLUMNS:
+        firsts, seconds, distances = engine.pairs_within(distance_km, mode)
+        keep = firsts < seconds
+        return firsts[keep], seconds[keep], distances[keep]
+
+    # Columns are floored so every cell is at least cell_long wide, which
+    # keeps neighbours within distance_km in adjacent columns across the
+    # antimeridian as well.
+    cell_long = 360.0 / columns
+    rows = np.floor((engine.lat + 90.0) / cell_lat).astype(np.int64)
+    cols = np.floor((engine.long + 180.0) / cell_long).astype(np.int64) % columns
+
+    # Leave a spare row on both sides so row offsets never alias into the
+    # neighbouring column's key range.
+    row_stride = int(rows.max()) + 3
+    keys = cols * row_stride + rows + 1
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_positions = np.arange(len(order))
+
+    # Pairs inside a cell are each point with the points after it in the
+    # same cell; pairs across cells come from the half neighbourhood.
+    cell_ends = np.searchsorted(sorted_keys, sorted_keys, side="right")
+    sorted_rows = rows[order] + 1
+    sorted_cols = cols[order]
+    neighbour_ranges = []
+    for d_col, d_row in HALF_NEIGHBOURHOOD:
+        target_keys = ((sorted_cols + d_col) % columns) * row_stride + sorted_rows + d_row
+        neighbour_ranges.append((
+            np.searchsorted(sorted_keys, target_keys, side="left"),
+            np.searchsorted(sorted_keys, target_keys, side="right"),
+        ))
+
+    limit = distance_km
+    if mode == GEODESIC:
+        limit = distance_km * (1 + HAVERSINE_MAX_RELATIVE_ERROR)
+
+    firsts, seconds, pair_distances = [], [], []
+    for start in range(0, len(order), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        sources = sorted_positions[chunk]
+        i, j = [], []
+        for starts, ends in [(sources + 1, cell_ends[chunk])] + [
+            (starts[chunk], ends[chunk]) for starts, ends in neighbour_ranges
+        ]:
+            chunk_i, chunk_j = _expand(sources, starts, ends)
+            i.append(chunk_i)
+            j.append(chunk_j)
+        i = order[np.concatenate(i)]
+        j = order[np.concatenate(j)]
+
+        d = haversine(engine.lat[i], engine.long[i], engine.lat[j], engine.long[j])
+        keep = d <= limit
+        i, j, d = i[keep], j[keep], d[keep]
+        if mode == GEODESIC:
+            d = vincenty(engine.lat[i], engine.long[i], engine.lat[j], engine.long[j])
+            keep = d <= distance_km
+            i, j, d = i[keep], j[keep], d[keep]
+
+        firsts.append(i)
+        seconds.append(j)
+        pair_distances.append(d)
+
+    return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(pair_distances)
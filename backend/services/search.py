@@ -0,0 +1,55 @@
+"""Full-text outlet search over the outlets_fts index."""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .hours import OPEN_OUTLET_IDS
+
+# Ranked results returned when the caller sets no limit
+DEFAULT_FTS_LIMIT = 100
+
+# Matches in the outlet name count ten times as much as matches in the address
+FTS_SEARCH = text(
+    "SELECT rowid FROM outlets_fts WHERE outlets_fts MATCH :match "
+    "ORDER BY bm25(outlets_fts, 10.0, 1.0) LIMIT :limit"
+)
+FTS_SEARCH_OPEN = text(
+    "SELECT rowid FROM outlets_fts WHERE outlets_fts MATCH :match "
+    f"AND rowid IN ({OPEN_OUTLET_IDS}) "
+    "ORDER BY bm25(outlets_fts, 10.0, 1.0) LIMIT :limit"
+)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query where every word must match as a prefix.
+
+    Words are quoted so FTS5 operators in user input are taken literally.
+    Returns None if the query has no words.
+    """
+    tokens = TOKEN_PATTERN.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def fts_search(
+    db: Session, query: str, limit: int, open_at: Optional[Tuple[int, int]] = None
+) -> Optional[List[int]]:
+    """
+    Get the IDs of outlets matching query, best bm25 match first.
+
+    With open_at, a (weekday, minute) from hours.weekday_minute, only
+    outlets open then are matched. Returns None if the query has no words to
+    search for.
+    """
+    match = build_match_query(query)
+    if match is None:
+        return None
+    if open_at is None:
+        return [row[0] for row in db.execute(FTS_SEARCH, {"match": match, "limit": limit})]
+    weekday, minute = open_at
+    params = {"match": match, "limit": limit, "weekday": weekday, "minute": minute}
+    return [row[0] for row in db.execute(FTS_SEARCH_OPEN, params)]
@@ -0,0 +1,154 @@
+"""Local semantic search over outlets with TF-IDF vectors of character n-grams."""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .snapshot import OUTLET_FIELDS, OutletSnapshot
+
+# Character n-grams of this length within words padded with a space, so
+# misspellings, abbreviations and partial words still share most n-grams
+NGRAM_SIZE = 3
+
+# Fields vectorized per outlet and how much their n-grams count
+FIELD_WEIGHTS = (("name", 2.0), ("address", 1.0), ("operating_hours", 1.0))
+FIELD_POSITIONS = tuple((OUTLET_FIELDS.index(field), weight) for field, weight in FIELD_WEIGHTS)
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def ngrams(text: str) -> List[str]:
+    """Character n-grams of the words of text, casefolded."""
+    grams = []
+    for word in WORD_PATTERN.findall(text.casefold()):
+        padded = f" {word} "
+        grams.extend(padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1)))
+    return grams
+
+def weighted_counts(fields: Iterable[Tuple[Optional[str], float]]) -> Counter:
+    """Weighted n-gram counts of (text, weight) fields."""
+    counts = Counter()
+    for text, weight in fields:
+        for gram in ngrams(text or ""):
+            counts[gram] += weight
+    return counts
+
+class SemanticIndex:
+    """
+    TF-IDF vectors of outlets' names, addresses and hours, scored by cosine similarity.
+
+    Term frequencies are sublinear and vectors are L2 normalized. The vectors
+    are kept as an inverted index: the postings of each n-gram are one run of
+    positions and weights, so a query only touches the postings of its own
+    n-grams. Built once per data version; nothing leaves the process.
+    """
+
+    def __init__(self, version: tuple, ids: np.ndarray, documents: Iterable[Counter]):
+        self.version = version
+        self.ids = ids
+        vocabulary: Dict[str, int] = {}
+        positions, terms, weights = [], [], []
+        for position, counts in enumerate(documents):
+            for gram, count in counts.items():
+                positions.append(position)
+                terms.append(vocabulary.setdefault(gram, len(vocabulary)))
+                weights.append(1.0 + math.log(count))
+        self.vocabulary = vocabulary
+
+        positions = np.array(positions, dtype=np.int32)
+        terms = np.array(terms, dtype=np.int32)
+        weights = np.array(weights, dtype=np.float32)
+
+        # Smoothed inverse document frequency, as if one more outlet had every n-gram
+        document_frequency = np.bincount(terms, minlength=len(vocabulary))
+        self.size = len(ids)
+        self.idf = (np.log((1 + self.size) / (1 + document_frequency)) + 1).astype(np.float32)
+        weights *= self.idf[terms]
+        norms = np.sqrt(np.bincount(positions, weights=weights.astype(np.float64) ** 2, minlength=self.size))
+        weights /= np.maximum(norms, 1e-12)[positions].astype(np.float32)
+
+        order = np.argsort(terms, kind="stable")
+        self.positions = positions[order]
+        self.weights = weights[order]
+        self.term_starts = np.searchsorted(terms[order], np.arange(len(vocabulary) + 1))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _query_vector(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(term IDs, weights) of a query's known n-grams, normalized over all of its n-grams."""
+        counts = weighted_counts([(query, 1.0)])
+        # An n-gram no outlet has gets the largest idf and only counts in the norm
+        unseen_idf = math.log(1 + self.size) + 1
+        terms, weights, norm = [], [], 0.0
+        for gram, count in counts.items():
+            term = self.vocabulary.get(gram)
+            weight = (1.0 + math.log(count)) * (unseen_idf if term is None else float(self.idf[term]))
+            norm += weight * weight
+            if term is not None:
+                terms.append(term)
+                weights.append(weight)
+        norm = math.sqrt(norm) or 1.0
+        return np.array(terms, dtype=np.intp), np.array(weights, dtype=np.float64) / norm
+
+    def search(
+        self, query: str, k: int, min_score: float = 0.0, ids: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (outlet IDs, scores) of the k outlets most similar to query, best first.
+
+        Only scores above min_score are kept; with ids, a sorted array of
+        outlet IDs, only those outlets are considered.
+        """
+        terms, query_weights = self._query_vector(query)
+        starts, ends = self.term_starts[terms], self.term_starts[terms + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        postings = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths) + np.arange(lengths.sum())
+        scores = np.bincount(
+            self.positions[postings],
+            weights=self.weights[postings] * np.repeat(query_weights, lengths),
+            minlength=self.size,
+        )
+        if ids is not None:
+            scores[~np.isin(self.ids, ids)] = 0.0
+
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = np.lexsort((self.ids[candidates], -scores[candidates]))
+        best = candidates[order]
+        return self.ids[best], scores[best]
+
+def build_semantic_index(snapshot: OutletSnapshot) -> SemanticIndex:
+    """Vectorize every outlet of a snapshot."""
+    documents = (
+        weighted_counts((row[field], weight) for field, weight in FIELD_POSITIONS)
+        for row in snapshot.rows
+    )
+    return SemanticIndex(snapshot.version, snapshot.ids, documents)
+
+class SemanticIndexCache:
+    """The semantic index of each database's current data version, built on first use."""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, snapshot: OutletSnapshot) -> SemanticIndex:
+        """Get the index for the snapshot, building it if its data version is new."""
+        key = snapshot.version[0]
+        index = self._indexes.get(key)
+        if index is not None and index.version == snapshot.version:
+            return index
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None or index.version != snapshot.version:
+                index = build_semantic_index(snapshot)
+                self._indexes[key] = index
+            return index
+
+semantic_indexes = SemanticIndexCache()
@@ -0,0 +1,181 @@
+"""Immutable in-memory snapshots of the outlets table."""
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import DateTime, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Imported relative to backend/, as the API modules are
+from schemas.outlet import Outlet as OutletSchema
+
+from .clusters import ClusterIndex
+from .data_version import add_invalidation_listener, current_data_version, get_data_version
+from .hours import HoursIndex, SELECT_HOURS
+from .spatial_index import SpatialIndex
+
+log = logging.getLogger(__name__)
+
+# Columns kept per outlet, in the order the Outlet schema serializes them
+OUTLET_FIELDS = tuple(OutletSchema.model_fields)
+ID, LAT, LONG, HOURS = (OUTLET_FIELDS.index(field) for field in ("id", "lat", "long", "operating_hours"))
+
+SNAPSHOT_QUERY = text(
+    f"SELECT {', '.join(OUTLET_FIELDS)} FROM outlets ORDER BY id"
+).columns(created_at=DateTime, updated_at=DateTime)
+
+class OutletSnapshot:
+    """
+    Read-only copy of every outlet as a tuple of OUTLET_FIELDS values.
+
+    Rows are kept in ID order next to a sorted ID array for keyset pages, a
+    spatial index and the map clusters of the outlets that have coordinates,
+    and an index of their parsed opening hours. A snapshot is never modified
+    after it is built; a new one replaces it instead.
+    """
+
+    __slots__ = ("version", "ids", "rows", "index", "clusters", "hours", "_positions")
+
+    def __init__(self, version: tuple, rows: Tuple[tuple, ...], hours: Iterable[tuple] = ()):
+        self.version = version
+        self.rows = rows
+        self.ids = np.fromiter((row[ID] for row in rows), dtype=np.int64, count=len(rows))
+        self._positions = {row[ID]: position for position, row in enumerate(rows)}
+        self.index = SpatialIndex(
+            (row[ID], row[LAT], row[LONG])
+            for row in rows if row[LAT] is not None and row[LONG] is not None
+        )
+        engine = self.index.engine
+        self.clusters = ClusterIndex(engine.ids, engine.lat, engine.long)
+        self.hours = HoursIndex(hours)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, outlet_id: int) -> Optional[tuple]:
+        """Get the row of an outlet, or None if there is no such outlet."""
+        position = self._positions.get(outlet_id)
+        return None if position is None else self.rows[position]
+
+    def page(
+        self, after_id: Optional[int], skip: int, limit: int, ids: Optional[np.ndarray] = None
+    ) -> Tuple[tuple, ...]:
+        """
+        Get up to limit rows in ID order, after after_id or else after skip rows.
+
+        With ids, a sorted array of outlet IDs, only those outlets are paged.
+        """
+        # A negative start would slice from the end
+        skip = max(skip, 0)
+        if ids is None:
+            start = skip if after_id is None else int(np.searchsorted(self.ids, after_id, side="right"))
+            return self.rows[start:start + limit]
+        start = skip if after_id is None else int(np.searchsorted(ids, after_id, side="right"))
+        rows = (self.get(outlet_id) for outlet_id in ids[start:start + limit].tolist())
+        return tuple(row for row in rows if row is not None)
+
+def load_snapshot(db: Session) -> OutletSnapshot:
+    """Read the outlets table into a new snapshot."""
+    # Read the version first: if the table changes in between, the snapshot
+    # is newer than its version says and is only reloaded once more.
+    version = get_data_version(db)
+    # Most outlets share their operating hours text; keep one copy of each
+    shared_hours = {}
+    rows = tuple(
+        row[:HOURS] + (shared_hours.setdefault(row[HOURS], row[HOURS]),) + row[HOURS + 1:]
+        for row in map(tuple, db.execute(SNAPSHOT_QUERY))
+    )
+    try:
+        hours = tuple(tuple(row) for row in db.execute(SELECT_HOURS))
+    except OperationalError:
+        # The app has not created outlet_hours in this database yet
+        hours = ()
+    return OutletSnapshot(version, rows, hours)
+
+class SnapshotStore:
+    """
+    Process-wide outlet snapshots, one per database.
+
+    When the data version changes, readers keep getting the current snapshot
+    while a new one is built in a background thread and swapped in. Writes
+    made through this process drop the snapshots instead, so the next reader
+    rebuilds and sees its own writes; only a database that has no snapshot
+    yet is loaded in a reader's thread, by one reader while the others wait.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[object, OutletSnapshot] = {}
+        self._reloading = set()
+        self._building: Dict[object, threading.Lock] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> OutletSnapshot:
+        """Get the snapshot for db's database, starting a reload if it is stale."""
+        version = current_data_version(db)
+        key = version[0]
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = self._build(key, db)
+        elif snapshot.version != version:
+            self._reload_in_background(key, db.get_bind())
+        return snapshot
+
+    def clear(self) -> None:
+        """Drop every snapshot, including any being reloaded."""
+        with self._lock:
+            self._generation += 1
+            self._snapshots.clear()
+
+    def _build(self, key, db: Session) -> OutletSnapshot:
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            # Built by another reader while this one waited
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                return snapshot
+            generation = self._generation
+            snapshot = load_snapshot(db)
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshots[key] = snapshot
+            return snapshot
+
+    def _reload_in_background(self, key, bind: Engine) -> None:
+        with self._lock:
+            if key in self._reloading:
+                return
+            self._reloading.add(key)
+            generation = self._generation
+        threading.Thread(
+            target=self._reload, args=(key, bind, generation),
+            name="outlet-snapshot-reload", daemon=True
+        ).start()
+
+    def _reload(self, key, bind: Engine, generation: int) -> None:
+        try:
+            with Session(bind) as db:
+                snapshot = load_snapshot(db)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                # Replacing the dict entry is atomic; readers see the old or
+                # the new snapshot, never a partial one.
+                self._snapshots[key] = snapshot
+            log.info(f"Reloaded outlet snapshot with {len(snapshot)} outlets")
+        except Exception:
+            log.exception("Failed to reload the outlet snapshot")
+        finally:
+            with self._lock:
+                self._reloading.discard(key)
+
+snapshots = SnapshotStore()
+add_invalidation_listener(snapshots.clear)
+
+def get_outlet_snapshot(db: Session) -> OutletSnapshot:
+    """Get the current outlet snapshot for db's database."""
+    return snapshots.get(db)
@@ -0,0 +1,125 @@
+"""In-process spatial index over outlet coordinates."""
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from .distance import EARTH_RADIUS_KM, GEODESIC, DistanceEngine
+
+# Lower bounds for the length of one degree on the WGS84 ellipsoid, so the
+# bounding box of a query circle never cuts off a true match.
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LONG_AT_EQUATOR = 111.319
+BBOX_SAFETY_FACTOR = 1.01
+
+# 0.05 degrees is roughly 5.5 km, about the default nearby search radius.
+DEFAULT_CELL_SIZE = 0.05
+
+# No two points on Earth are further apart than half its circumference
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM * BBOX_SAFETY_FACTOR
+
+COORDINATES_QUERY = text(
+    "SELECT id, lat, long FROM outlets WHERE lat IS NOT NULL AND long IS NOT NULL"
+)
+
+Point = Tuple[int, float, float]
+
+class SpatialIndex:
+    """
+    Uniform lat/long grid that returns candidate outlets for a radius query.
+
+    Candidates are positions into the index's DistanceEngine arrays.
+    """
+
+    def __init__(self, points: Iterable[Point], cell_size: float = DEFAULT_CELL_SIZE):
+        self.engine = DistanceEngine.from_points(points)
+        self.cell_size = cell_size
+        self.columns = math.ceil(360.0 / cell_size)
+
+        cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for position, (lat, long) in enumerate(zip(self.engine.lat, self.engine.long)):
+            cells[self._cell(lat, long)].append(position)
+        self.cells = {
+            cell: np.array(positions, dtype=np.intp) for cell, positions in cells.items()
+        }
+        self.size = len(self.engine)
+
+    def _cell(self, lat: float, long: float) -> Tuple[int, int]:
+        row = math.floor((lat + 90.0) / self.cell_size)
+        column = math.floor((long + 180.0) / self.cell_size) % self.columns
+        return row, column
+
+    def candidates(self, lat: float, long: float, radius_km: float) -> np.ndarray:
+        """
+        Get the positions of every outlet that may lie within radius_km of (lat, long).
+
+        The result is a superset of the true matches; callers still compute the
+        exact distance for each candidate.
+        """
+        if self.size == 0 or radius_km < 0:
+            return np.array([], dtype=np.intp)
+
+        lat_span = radius_km / KM_PER_DEGREE_LAT * BBOX_SAFETY_FACTOR
+        min_lat = max(lat - lat_span, -90.0)
+        max_lat = min(lat + lat_span, 90.0)
+
+        # Longitude degrees shrink towards the poles, so size the box for the
+        # most poleward latitude it covers.
+        cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+        if cos_lat * KM_PER_DEGREE_LONG_AT_EQUATOR * 180.0 <= radius_km * BBOX_SAFETY_FACTOR:
+            long_span = 180.0
+        else:
+            long_span = radius_km / (KM_PER_DEGREE_LONG_AT_EQUATOR * cos_lat) * BBOX_SAFETY_FACTOR
+
+        min_row, first_column = self._cell(min_lat, long - long_span)
+        max_row, _ = self._cell(max_lat, long + long_span)
+        column_count = min(
+            math.floor(2 * long_span / self.cell_size) + 2, self.columns
+        )
+
+        if (max_row - min_row + 1) * column_count <= len(self.cells):
+            result = []
+            for row in range(min_row, max_row + 1):
+                for offset in range(column_count):
+                    cell = self.cells.get((row, (first_column + offset) % self.columns))
+                    if cell is not None:
+                        result.append(cell)
+        else:
+            # The box covers more cells than are occupied, e.g. for very
+            # large radii: test the occupied cells instead
+            result = [
+                positions for (row, column), positions in self.cells.items()
+                if min_row <= row <= max_row
+                and (column - first_column) % self.columns < column_count
+            ]
+        if not result:
+            return np.array([], dtype=np.intp)
+        return np.concatenate(result)
+
+    def nearest(
+        self, lat: float, long: float, k: int, mode: str = GEODESIC
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k outlets nearest to (lat, long), nearest first.
+
+        Returns (positions, distances). The search radius starts at one cell
+        and doubles until it holds at least k outlets: every outlet outside
+        the radius is further away than those inside, so the k nearest of
+        these are the k nearest overall. The cost follows k and the local
+        density rather than the number of outlets.
+        """
+        if k <= 0 or self.size == 0:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.float64)
+
+        radius_km = self.cell_size * KM_PER_DEGREE_LAT
+        while True:
+            candidates = self.candidates(lat, long, radius_km)
+            if len(candidates) >= k or radius_km >= MAX_DISTANCE_KM:
+                positions, distances = self.engine.within(
+                    lat, long, radius_km, positions=candidates, mode=mode
+                )
+                if len(positions) >= k or radius_km >= MAX_DISTANCE_KM:
+                    return positions[:k], distances[:k]
+            radius_km = min(radius_km * 2, MAX_DISTANCE_KM)
@@ -0,0 +1,92 @@
+"""GeoJSON map tiles of outlets, cached per data version."""
+import math
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+import orjson
+
+from .snapshot import OUTLET_FIELDS, OutletSnapshot
+
+MAX_ZOOM = 22
+
+# Web Mercator tiles stop short of the poles
+MAX_LATITUDE = math.degrees(math.atan(math.sinh(math.pi)))
+
+# Properties carried by each outlet feature, enough for a marker and popup
+TILE_PROPERTIES = ("id", "name", "address", "operating_hours")
+
+# Encoded tiles kept in memory; older tiles are evicted first
+TILE_CACHE_SIZE = 4096
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of a Web Mercator tile in degrees."""
+    tiles = 2 ** z
+
+    def latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return x / tiles * 360.0 - 180.0, latitude(y + 1), (x + 1) / tiles * 360.0 - 180.0, latitude(y)
+
+def coordinate_precision(z: int) -> int:
+    """Decimal places that resolve a pixel of a 256 pixel tile at zoom z."""
+    degrees_per_pixel = 360.0 / (256 * 2 ** z)
+    return max(0, math.ceil(-math.log10(degrees_per_pixel)))
+
+def build_tile(snapshot: OutletSnapshot, z: int, x: int, y: int) -> bytes:
+    """
+    Encode the outlets inside a tile as a GeoJSON FeatureCollection.
+
+    Tiles contain their west and north edges, so an outlet on a shared edge
+    is in exactly one tile; the last row and column also contain the outer
+    edge of the map.
+    """
+    west, south, east, north = tile_bounds(z, x, y)
+    engine = snapshot.index.engine
+    tiles = 2 ** z
+    in_tile = (
+        (engine.long >= west) & ((engine.long < east) | (x == tiles - 1) & (engine.long <= east))
+        & (engine.lat <= north) & ((engine.lat > south) | (y == tiles - 1) & (engine.lat >= south))
+    )
+
+    precision = coordinate_precision(z)
+    lats = np.round(engine.lat[in_tile], precision).tolist()
+    longs = np.round(engine.long[in_tile], precision).tolist()
+    fields = [OUTLET_FIELDS.index(name) for name in TILE_PROPERTIES]
+    features = []
+    for outlet_id, lat, long in zip(engine.ids[in_tile].tolist(), lats, longs):
+        row = snapshot.get(outlet_id)
+        features.append({
+            "type": "Feature",
+            "id": outlet_id,
+            "geometry": {"type": "Point", "coordinates": [long, lat]},
+            "properties": {name: row[field] for name, field in zip(TILE_PROPERTIES, fields)},
+        })
+    return orjson.dumps({"type": "FeatureCollection", "features": features})
+
+class TileCache:
+    """Least recently used cache of encoded tiles, keyed by data version and tile."""
+
+    def __init__(self, size: int = TILE_CACHE_SIZE):
+        self.size = size
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, snapshot: OutletSnapshot, z: int, x: int, y: int) -> bytes:
+        """Get a tile for the snapshot, building it on a miss."""
+        key = (snapshot.version, z, x, y)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+
+        tile = build_tile(snapshot, z, x, y)
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.size:
+                self._tiles.popitem(last=False)
+        return tile
+
+tile_cache = TileCache()
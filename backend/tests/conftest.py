@@ -0,0 +1,30 @@
+"""Fixtures shared by the backend tests."""
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+# The router imports its dependencies relative to backend/, as uvicorn does
+from database.session import get_async_db, get_db
+
+@pytest.fixture(scope="function")
+def overrides(request):
+    """
+    Point the app's database dependencies at the test module's database.
+
+    The module defines override_get_db, and override_get_async_db if its
+    database also serves the async endpoints.
+    """
+    module_overrides = {
+        get_db: request.module.override_get_db,
+        get_async_db: getattr(request.module, "override_get_async_db", None),
+    }
+    for dependency, override in module_overrides.items():
+        if override is not None:
+            app.dependency_overrides[dependency] = override
+    yield
+    for dependency in module_overrides:
+        app.dependency_overrides.pop(dependency, None)
+
+@pytest.fixture(scope="function")
+def client(overrides):
+    return TestClient(app)
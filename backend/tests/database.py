@@ -0,0 +1,60 @@
+"""Temporary test databases shared by the sync and async sessions, and outlets to fill them."""
+import atexit
+import os
+import random
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from backend.database.models import Base
+
+def create_test_database():
+    """
+    Create an empty database in a temporary file.
+
+    An in-memory database cannot be shared between the sync engine and the
+    aiosqlite engine behind the async endpoints, so both open the same file.
+    Async connections are not pooled as each TestClient request runs on its
+    own event loop.
+
+    Returns (engine, TestingSessionLocal, override_get_db, override_get_async_db).
+    """
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    atexit.register(os.remove, path)
+
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestingSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    return engine, TestingSessionLocal, override_get_db, override_get_async_db
+
+def random_points(count, seed, lat_range=(2.8, 3.5), long_range=(101.3, 102.0)):
+    """
+    (id, lat, long) of count outlets spread uniformly over a box, IDs from 1.
+
+    The box defaults to the Klang Valley. Every seed gives the same points.
+    """
+    rng = random.Random(seed)
+    return [
+        (i + 1, rng.uniform(*lat_range), rng.uniform(*long_range))
+        for i in range(count)
+    ]
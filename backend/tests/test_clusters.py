@@ -0,0 +1,106 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet
+from backend.services.clusters import CLUSTER_SIZE, MAX_CLUSTER_ZOOM, ClusterIndex
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+WORLD = "west=-180&south=-85&east=180&north=85"
+
+def clustered_points(count, seed=51):
+    """Points around Kuala Lumpur, thinning out with distance, and a few far away."""
+    rng = random.Random(seed)
+    points = [(i + 1, rng.gauss(3.15, 0.3), rng.gauss(101.7, 0.3)) for i in range(count)]
+    return points + [(count + 1, -33.87, 151.21), (count + 2, 51.5, -0.12), (count + 3, 0.0, 179.9)]
+
+def cell_of(lat, long, zoom):
+    """Column and row of the CLUSTER_SIZE pixel cell holding a point at a zoom level."""
+    cells = 2 ** zoom * 256 // CLUSTER_SIZE
+    x = math.floor((long + 180.0) / 360.0 * cells)
+    y = math.floor((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * cells)
+    return x, y
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id, lat, long in clustered_points(500):
+        db.add(Outlet(id=outlet_id, name=f"Subway {outlet_id}", address=f"Address {outlet_id}", lat=lat, long=long))
+    db.add(Outlet(id=1000, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def test_clusters_are_cells_at_every_zoom():
+    points = clustered_points(500)
+    ids, lat, long = (np.array(column) for column in zip(*points))
+    clusters = ClusterIndex(ids, lat, long)
+    by_id = {p[0]: p for p in points}
+
+    for zoom in range(MAX_CLUSTER_ZOOM + 1):
+        level = clusters.level(zoom)
+        counts, west, south, east, north = clusters.bounds(zoom, np.arange(len(level.starts)))
+        assert counts.sum() == len(points)
+        cells = set()
+        for i in range(len(level.starts)):
+            members = [by_id[outlet_id] for outlet_id in clusters.members(zoom, i).tolist()]
+            cell = {cell_of(p[1], p[2], zoom) for p in members}
+            assert len(cell) == 1
+            cells |= cell
+            assert level.lat[i] == pytest.approx(np.mean([p[1] for p in members]))
+            assert level.long[i] == pytest.approx(np.mean([p[2] for p in members]))
+            assert (west[i], south[i], east[i], north[i]) == (
+                min(p[2] for p in members), min(p[1] for p in members),
+                max(p[2] for p in members), max(p[1] for p in members),
+            )
+        # One cluster per occupied cell
+        assert len(cells) == len(level.starts)
+
+def test_clusters_are_hierarchical():
+    points = clustered_points(500)
+    clusters = ClusterIndex(*(np.array(column) for column in zip(*points)))
+    for zoom in range(MAX_CLUSTER_ZOOM):
+        children = {
+            frozenset(clusters.members(zoom + 1, i).tolist()) for i in range(len(clusters.level(zoom + 1).starts))
+        }
+        for i in range(len(clusters.level(zoom).starts)):
+            members = set(clusters.members(zoom, i).tolist())
+            parts = [child for child in children if child <= members]
+            assert 1 <= len(parts) <= 4
+            assert set().union(*parts) == members
+
+def test_cluster_endpoint_world(client, db):
+    response = client.get(f"/api/outlets/clusters/?{WORLD}&zoom=0")
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    clusters = response.json()
+    assert sum(cluster["count"] for cluster in clusters) == 503
+    assert max(cluster["count"] for cluster in clusters) == 500
+    assert all(len(cluster["ids"]) == min(cluster["count"], 100) for cluster in clusters)
+
+def test_cluster_endpoint_zoomed_in(client, db):
+    response = client.get("/api/outlets/clusters/?west=151&south=-34&east=151.5&north=-33.5&zoom=18")
+    assert response.json() == [{
+        "count": 1, "lat": -33.87, "long": 151.21, "bbox": [151.21, -33.87, 151.21, -33.87], "ids": [501],
+    }]
+
+def test_cluster_endpoint_viewport(client, db):
+    clusters = client.get("/api/outlets/clusters/?west=101&south=2.5&east=102.5&north=4&zoom=9").json()
+    assert 1 < len(clusters)
+    assert all(101 <= c["long"] <= 102.5 and 2.5 <= c["lat"] <= 4 for c in clusters)
+
+    # A viewport across the antimeridian
+    clusters = client.get("/api/outlets/clusters/?west=179&south=-1&east=-179&north=1&zoom=5").json()
+    assert [cluster["ids"] for cluster in clusters] == [[503]]
+
+def test_cluster_endpoint_bounded(client, db, monkeypatch):
+    monkeypatch.setattr("api.endpoints.outlets.MAX_CLUSTERS", 10)
+    assert client.get(f"/api/outlets/clusters/?{WORLD}&zoom=12").status_code == 400
+    assert client.get(f"/api/outlets/clusters/?{WORLD}&zoom=0").status_code == 200
@@ -0,0 +1,72 @@
+import asyncio
+import random
+import time
+
+import httpx
+import pytest
+
+from backend.main import app
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet
+
+# How long the patched intersecting request keeps its worker thread busy
+SLOW_SECONDS = 1.0
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+@pytest.fixture(scope="function")
+def seeded_outlets():
+    rng = random.Random(8)
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id in range(1, 201):
+        db.add(Outlet(
+            id=outlet_id,
+            name=f"Subway {outlet_id}",
+            address=f"Address {outlet_id}",
+            lat=rng.uniform(2.8, 3.5),
+            long=rng.uniform(101.3, 102.0),
+        ))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+@pytest.fixture(scope="function")
+def slow_pair_search(monkeypatch):
+    """Make the intersecting pair search hold the CPU for SLOW_SECONDS."""
+    from api.endpoints import outlets
+    grid_pairs = outlets.grid_pairs
+
+    def slow_grid_pairs(*args, **kwargs):
+        time.sleep(SLOW_SECONDS)
+        return grid_pairs(*args, **kwargs)
+
+    monkeypatch.setattr(outlets, "grid_pairs", slow_grid_pairs)
+
+@pytest.mark.asyncio
+async def test_requests_answered_during_expensive_request(seeded_outlets, slow_pair_search, overrides):
+    """Cheap requests complete while an intersecting request is still computing."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.monotonic()
+        slow = asyncio.create_task(client.get("/api/outlets/intersecting/"))
+        await asyncio.sleep(0.1)
+
+        for url in [
+            "/api/outlets/nearby/?lat=3.14&long=101.69&radius=5",
+            "/api/outlets/distance/1",
+            "/api/outlets/?limit=10",
+            "/api/outlets/search/?query=subway",
+        ]:
+            response = await client.get(url)
+            assert response.status_code == 200
+            assert not slow.done()
+
+        fast_elapsed = time.monotonic() - start
+        response = await slow
+        slow_elapsed = time.monotonic() - start
+
+    assert response.status_code == 200
+    assert fast_elapsed < SLOW_SECONDS <= slow_elapsed
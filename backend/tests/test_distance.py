@@ -0,0 +1,173 @@
+import random
+
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from backend.tests.database import create_test_database, random_points
+from backend.database.models import Outlet
+from backend.services.distance import (
+    GEODESIC,
+    HAVERSINE,
+    DistanceEngine,
+    haversine,
+    vincenty,
+)
+
+# Vincenty agrees with geopy's geodesic (Karney) to well under a millimeter;
+# haversine on a sphere is within 0.6% of the ellipsoidal distance.
+GEODESIC_TOLERANCE_KM = 1e-6
+HAVERSINE_RELATIVE_TOLERANCE = 0.006
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+def geopy_km(a, b):
+    return geodesic((a[1], a[2]), (b[1], b[2])).kilometers
+
+@pytest.fixture(scope="function")
+def seeded_outlets():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id, lat, long in random_points(120, seed=1):
+        db.add(Outlet(
+            id=outlet_id,
+            name=f"Subway {outlet_id}",
+            address=f"Address {outlet_id}",
+            lat=lat,
+            long=long,
+        ))
+    db.add(Outlet(id=1000, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def test_vincenty_matches_geopy():
+    """Exact mode agrees with geopy within GEODESIC_TOLERANCE_KM, near and far."""
+    rng = random.Random(3)
+    pairs = [
+        ((rng.uniform(-80, 80), rng.uniform(-180, 180)), (rng.uniform(-80, 80), rng.uniform(-180, 180)))
+        for _ in range(200)
+    ]
+    pairs += [((3.15, 101.7), (3.15 + d, 101.7 + d)) for d in (0.0, 1e-6, 0.01, 0.5)]
+    pairs += [((0.0, 0.0), (0.0, 179.7)), ((0.0, 0.0), (0.5, 179.7))]
+
+    a, b = np.array([p[0] for p in pairs]), np.array([p[1] for p in pairs])
+    result = vincenty(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+    expected = np.array([geodesic(p, q).kilometers for p, q in pairs])
+
+    np.testing.assert_allclose(result, expected, rtol=0, atol=GEODESIC_TOLERANCE_KM)
+
+def test_haversine_close_to_geopy():
+    """Fast mode stays within HAVERSINE_RELATIVE_TOLERANCE of geopy."""
+    points = random_points(50, seed=1)
+    origin = points[0]
+    result = haversine(origin[1], origin[2], [p[1] for p in points[1:]], [p[2] for p in points[1:]])
+    expected = np.array([geopy_km(origin, p) for p in points[1:]])
+
+    np.testing.assert_allclose(result, expected, rtol=HAVERSINE_RELATIVE_TOLERANCE)
+
+@pytest.mark.parametrize("mode", [HAVERSINE, GEODESIC])
+def test_many_to_many_matches_one_to_many(mode):
+    """Each row of the matrix equals the one-to-many distances from that point."""
+    engine = DistanceEngine.from_points(random_points(40, seed=1))
+    matrix = engine.many_to_many(engine.lat[:5], engine.long[:5], mode=mode)
+
+    assert matrix.shape == (5, 40)
+    for row in range(5):
+        np.testing.assert_allclose(
+            matrix[row], engine.one_to_many(engine.lat[row], engine.long[row], mode=mode)
+        )
+
+def test_within_exact_mode_decides_boundary():
+    """Outlets just inside and just outside the radius are split by the exact distance."""
+    origin = (3.15, 101.7)
+    inside = geodesic(kilometers=4.9999).destination(origin, 45)
+    outside = geodesic(kilometers=5.0001).destination(origin, 45)
+    engine = DistanceEngine.from_points([
+        (1, inside.latitude, inside.longitude),
+        (2, outside.latitude, outside.longitude),
+    ])
+
+    positions, distances = engine.within(*origin, 5.0, mode=GEODESIC)
+    assert engine.ids[positions].tolist() == [1]
+    assert distances[0] == pytest.approx(4.9999, abs=GEODESIC_TOLERANCE_KM)
+
+def test_pairs_within_matches_brute_force():
+    """Every ordered pair within the radius is returned exactly once."""
+    points = random_points(80, seed=1)
+    engine = DistanceEngine.from_points(points)
+    firsts, seconds, distances = engine.pairs_within(10.0, mode=GEODESIC)
+
+    result = set(zip(engine.ids[firsts].tolist(), engine.ids[seconds].tolist()))
+    expected = {
+        (a[0], b[0]) for a in points for b in points
+        if a[0] != b[0] and geopy_km(a, b) <= 10.0
+    }
+    assert result == expected
+    assert len(result) == len(firsts)
+
+def test_unknown_mode_rejected():
+    engine = DistanceEngine.from_points(random_points(3, seed=1))
+    with pytest.raises(ValueError):
+        engine.within(3.1, 101.6, 5.0, mode="manhattan")
+
+def test_distance_endpoint_matches_geopy(client, seeded_outlets):
+    """Distances to every other outlet, nearest first, as geopy computes them."""
+    points = random_points(120, seed=1)
+    response = client.get("/api/outlets/distance/1")
+    assert response.status_code == 200
+
+    outlets = response.json()
+    expected = sorted((geopy_km(points[0], p), p[0]) for p in points[1:])
+    assert [outlet["id"] for outlet in outlets] == [outlet_id for _, outlet_id in expected]
+    for outlet, (distance, _) in zip(outlets, expected):
+        assert outlet["distance"] == pytest.approx(distance, abs=GEODESIC_TOLERANCE_KM)
+
+def test_distance_endpoint_without_coordinates(client, seeded_outlets):
+    response = client.get("/api/outlets/distance/1000")
+    assert response.status_code == 400
+
+def test_catchment_endpoint_matches_geopy(client, seeded_outlets):
+    """Outlets within twice the radius of the reference outlet, excluding itself."""
+    points = random_points(120, seed=1)
+    response = client.get("/api/outlets/catchment/?outlet_id=1&radius=3.0")
+    assert response.status_code == 200
+
+    expected = sorted((geopy_km(points[0], p), p[0]) for p in points[1:])
+    expected = [outlet_id for distance, outlet_id in expected if distance <= 6.0]
+    assert [outlet["id"] for outlet in response.json()] == expected
+
+def test_intersecting_endpoint_matches_geopy(client, seeded_outlets):
+    """Each outlet lists every other outlet within twice the 5 km catchment radius."""
+    points = random_points(120, seed=1)
+    response = client.get("/api/outlets/intersecting/")
+    assert response.status_code == 200
+
+    expected = {}
+    for a in points:
+        ids = [b[0] for b in points if a[0] != b[0] and geopy_km(a, b) <= 10.0]
+        if ids:
+            expected[a[0]] = ids
+    assert {outlet["id"]: outlet["intersects_with"] for outlet in response.json()} == expected
+
+def test_intersecting_endpoint_radius(client, seeded_outlets):
+    """A smaller catchment radius returns a subset of the intersections."""
+    small = {o["id"]: set(o["intersects_with"]) for o in client.get("/api/outlets/intersecting/?radius=1.5").json()}
+    large = {o["id"]: set(o["intersects_with"]) for o in client.get("/api/outlets/intersecting/?radius=5.0").json()}
+
+    assert small
+    assert sum(map(len, small.values())) < sum(map(len, large.values()))
+    for outlet_id, ids in small.items():
+        assert ids <= large[outlet_id]
+
+@pytest.mark.parametrize("url", [
+    "/api/outlets/catchment/?outlet_id=1&radius=nan",
+    "/api/outlets/catchment/?outlet_id=1&radius=inf",
+    "/api/outlets/catchment/?outlet_id=1&radius=-1",
+    "/api/outlets/intersecting/?radius=nan",
+    "/api/outlets/intersecting/?radius=-1",
+])
+def test_catchment_endpoints_reject_invalid_radius(client, seeded_outlets, url):
+    assert client.get(url).status_code == 422
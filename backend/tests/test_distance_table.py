@@ -0,0 +1,129 @@
+
+import numpy as np
+import pytest
+
+from backend.tests.database import create_test_database, random_points
+from backend.database.models import Outlet, OutletPairDistance
+from backend.services.distance import GEODESIC, HAVERSINE, DistanceEngine
+from backend.services.distance_table import build_distance_table, lookup_distances, stored_distances
+from services.distance import DistanceEngine as AppDistanceEngine
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+POINTS = random_points(60, seed=11)
+
+def expected_distances(outlet_id, mode=GEODESIC):
+    """Distances from outlet_id to every other outlet, nearest first."""
+    distance_engine = DistanceEngine.from_points(POINTS)
+    position = outlet_id - 1
+    others = np.flatnonzero(distance_engine.ids != outlet_id)
+    distances = distance_engine.one_to_many(
+        distance_engine.lat[position], distance_engine.long[position], positions=others, mode=mode
+    )
+    order = np.argsort(distances, kind="stable")
+    return distance_engine.ids[others[order]], distances[order]
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(OutletPairDistance).delete()
+    db.query(Outlet).delete()
+    for outlet_id, lat, long in POINTS:
+        db.add(Outlet(id=outlet_id, name=f"Subway {outlet_id}", address=f"Address {outlet_id}", lat=lat, long=long))
+    db.add(Outlet(id=1000, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.rollback()
+    db.query(OutletPairDistance).delete()
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def test_default_keeps_nearest(db):
+    assert build_distance_table(db) == 60 * 50
+    assert lookup_distances(db, 7) is None
+
+def test_full_table(db):
+    """Every ordered pair of outlets with coordinates gets a row."""
+    assert build_distance_table(db, k=None) == 60 * 59
+
+    ids, distances = lookup_distances(db, 7)
+    expected_ids, expected = expected_distances(7)
+    assert ids.tolist() == expected_ids.tolist()
+    np.testing.assert_allclose(distances, expected)
+
+def test_lookup_within_distance(db):
+    build_distance_table(db, k=None)
+    ids, distances = lookup_distances(db, 7, 8.0)
+
+    expected_ids, expected = expected_distances(7)
+    assert ids.tolist() == expected_ids[expected <= 8.0].tolist()
+    assert np.all(distances <= 8.0)
+
+def test_truncated_to_k_nearest(db):
+    build_distance_table(db, k=5)
+    assert db.query(OutletPairDistance).count() == 60 * 5
+
+    expected_ids, expected = expected_distances(7)
+    # The full list can no longer be answered from the table
+    assert lookup_distances(db, 7) is None
+    # A radius inside the 5th nearest outlet can
+    ids, _ = lookup_distances(db, 7, float(expected[4]) - 1e-9)
+    assert ids.tolist() == expected_ids[:4].tolist()
+    # A radius beyond it cannot
+    assert lookup_distances(db, 7, float(expected[4]) + 1.0) is None
+
+def test_truncated_to_radius(db):
+    build_distance_table(db, max_radius_km=10.0)
+
+    expected_ids, expected = expected_distances(7)
+    assert lookup_distances(db, 7) is None
+    assert lookup_distances(db, 7, 12.0) is None
+    ids, _ = lookup_distances(db, 7, 10.0)
+    assert ids.tolist() == expected_ids[expected <= 10.0].tolist()
+
+def test_stale_table_is_ignored(db):
+    build_distance_table(db, k=None)
+    db.add(Outlet(name="Subway New", address="New Address", lat=3.0, long=101.5))
+    db.commit()
+    assert lookup_distances(db, 7) is None
+
+def test_other_mode_is_ignored(db):
+    build_distance_table(db, k=None, mode=HAVERSINE)
+    assert lookup_distances(db, 7, mode=GEODESIC) is None
+    assert lookup_distances(db, 7, mode=HAVERSINE) is not None
+
+def test_endpoints_read_table(client, db, monkeypatch):
+    """Distance and catchment answers come from the table, without the spatial index."""
+    build_distance_table(db, k=None)
+    expected_ids, expected = expected_distances(7)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("distances should come from the table")
+    monkeypatch.setattr(AppDistanceEngine, "one_to_many", fail)
+    monkeypatch.setattr(AppDistanceEngine, "within", fail)
+
+    outlets = client.get("/api/outlets/distance/7").json()
+    assert [outlet["id"] for outlet in outlets] == expected_ids.tolist()
+
+    outlets = client.get("/api/outlets/catchment/?outlet_id=7&radius=3.0").json()
+    assert [outlet["id"] for outlet in outlets] == expected_ids[expected <= 6.0].tolist()
+
+def test_distance_endpoint_fills_truncated_table(client, db, monkeypatch):
+    """Pairs missing from a truncated table are calculated, and only those."""
+    build_distance_table(db, k=5)
+    ids, _ = stored_distances(db, 7)
+    assert len(ids) == 5
+    expected_ids, expected = expected_distances(7)
+
+    measured = []
+    one_to_many = AppDistanceEngine.one_to_many
+    def counting_one_to_many(self, *args, positions=None, **kwargs):
+        measured.append(len(positions))
+        return one_to_many(self, *args, positions=positions, **kwargs)
+    monkeypatch.setattr(AppDistanceEngine, "one_to_many", counting_one_to_many)
+
+    outlets = client.get("/api/outlets/distance/7").json()
+    assert [outlet["id"] for outlet in outlets] == expected_ids.tolist()
+    np.testing.assert_allclose([outlet["distance"] for outlet in outlets], expected)
+    assert measured == [59 - 5]
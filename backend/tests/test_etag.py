@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import event
+
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    db.add(Outlet(name="Subway KL Sentral", address="KL Sentral Station", lat=3.1334, long=101.6869))
+    db.add(Outlet(name="Subway Quill City Mall", address="Jalan Sultan Ismail", lat=3.1623, long=101.7003))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+@pytest.fixture(scope="function")
+def query_count():
+    """Count SQL statements run against the test database."""
+    counter = {"queries": 0}
+
+    def count(*args):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield counter
+    event.remove(engine, "before_cursor_execute", count)
+
+@pytest.mark.parametrize("url", [
+    "/api/outlets/",
+    "/api/outlets/search/?query=subway",
+    "/api/outlets/nearby/?lat=3.14&long=101.69&radius=5",
+    "/api/outlets/intersecting/",
+])
+def test_conditional_get_returns_304(client, db, query_count, url):
+    """A matching If-None-Match is answered without querying the database."""
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    query_count["queries"] = 0
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert query_count["queries"] == 0
+
+def test_etag_depends_on_parameters(client, db):
+    first = client.get("/api/outlets/nearby/?lat=3.14&long=101.69&radius=5").headers["ETag"]
+    second = client.get("/api/outlets/nearby/?lat=3.14&long=101.69&radius=1").headers["ETag"]
+    assert first != second
+
+def test_etag_changes_with_data(client, db):
+    etag = client.get("/api/outlets/").headers["ETag"]
+
+    db.add(Outlet(name="Subway Intermark Mall", address="Jalan Tun Razak", lat=3.1614, long=101.7199))
+    db.commit()
+
+    response = client.get("/api/outlets/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert response.headers["ETag"] != etag
+
+def test_if_none_match_lists_and_weak_tags(client, db):
+    etag = client.get("/api/outlets/").headers["ETag"]
+    response = client.get("/api/outlets/", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+def test_stale_etag_gets_full_response(client, db):
+    response = client.get("/api/outlets/", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
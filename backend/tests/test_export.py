@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+from sqlalchemy import insert
+
+from backend.tests.database import create_test_database, random_points
+from backend.database.models import Outlet
+from backend.services.distance_table import build_distance_table
+from backend.services.export import CSV, NDJSON, iter_outlets
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+def seed(db, count):
+    db.query(Outlet).delete()
+    db.execute(insert(Outlet), [
+        {"id": outlet_id, "name": f"Subway {outlet_id}", "address": f"Address {outlet_id}, Kuala Lumpur", "lat": lat, "long": long}
+        for outlet_id, lat, long in random_points(count, seed=31)
+    ])
+    db.commit()
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    seed(db, 50)
+    db.add(Outlet(id=1000, name='Subway "Quoted", Name', address="Line one\nLine two"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_export_outlets_ndjson(client, db):
+    response = client.get("/api/outlets/export/")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="outlets.ndjson"'
+    assert "ETag" in response.headers
+    assert ndjson(response) == client.get("/api/outlets/?limit=1000").json()
+
+def test_export_outlets_csv(client, db):
+    response = client.get("/api/outlets/export/?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    outlets = client.get("/api/outlets/?limit=1000").json()
+    assert len(records) == len(outlets) == 51
+    for record, outlet in zip(records, outlets):
+        assert record == {field: "" if value is None else str(value) for field, value in outlet.items()}
+
+@pytest.mark.parametrize("with_table", [False, True])
+def test_export_distances(client, db, with_table):
+    if with_table:
+        build_distance_table(db, k=None)
+
+    rows = ndjson(client.get("/api/outlets/distances/export/"))
+    assert len(rows) == 50 * 49
+    for outlet_id in (1, 17, 50):
+        expected = client.get(f"/api/outlets/distance/{outlet_id}").json()
+        assert [(row["other_outlet_id"], row["distance"]) for row in rows if row["outlet_id"] == outlet_id] == [
+            (outlet["id"], pytest.approx(outlet["distance"], abs=1e-9)) for outlet in expected
+        ]
+
+    single = ndjson(client.get("/api/outlets/distances/export/?outlet_id=17"))
+    assert single == [row for row in rows if row["outlet_id"] == 17]
+
+    records = list(csv.reader(io.StringIO(client.get("/api/outlets/distances/export/?outlet_id=17&format=csv").text)))
+    assert records[0] == ["outlet_id", "other_outlet_id", "distance"]
+    assert [[int(a), int(b), float(d)] for a, b, d in records[1:]] == [
+        [row["outlet_id"], row["other_outlet_id"], row["distance"]] for row in single
+    ]
+
+def test_export_distances_unknown_outlet(client, db):
+    assert client.get("/api/outlets/distances/export/?outlet_id=999").status_code == 404
+    assert client.get("/api/outlets/distances/export/?outlet_id=1000").status_code == 400
+
+@pytest.mark.parametrize("format", [NDJSON, CSV])
+def test_export_memory_does_not_grow_with_rows(format):
+    """Streaming ten times as many outlets does not raise peak memory."""
+    def peak_while_streaming(count):
+        db = TestingSessionLocal()
+        seed(db, count)
+        db.close()
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in iter_outlets(engine, format))
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    small_size, small_peak = peak_while_streaming(2000)
+    large_size, large_peak = peak_while_streaming(20000)
+
+    assert large_size > 9 * small_size
+    assert large_peak < 1.5 * small_peak
+
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
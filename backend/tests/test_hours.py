@@ -0,0 +1,163 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet, OutletHours
+from backend.services.hours import (
+    HoursIndex, fill_missing_outlet_hours, parse_operating_hours, weekday_minute, write_outlet_hours,
+)
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+def daily(opens, closes):
+    return [(day, opens, closes) for day in range(7)]
+
+test_outlets = [
+    (1, "Subway Bangsar Late", "Monday - Sunday, 10:00 AM - 2:00 AM", 3.130, 101.670),
+    (2, "Subway Bangsar Office", "Monday - Friday, 8:00 AM - 6:00 PM", 3.131, 101.671),
+    (3, "Subway KL Sentral", "Open 24 hours", 3.134, 101.686),
+    (4, "Subway Bangsar Soon", "Opening soon", 3.132, 101.672),
+]
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(OutletHours).delete()
+    db.query(Outlet).delete()
+    for outlet_id, name, hours, lat, long in test_outlets:
+        db.add(Outlet(id=outlet_id, name=name, address=f"{name}, Kuala Lumpur", operating_hours=hours, lat=lat, long=long))
+    db.commit()
+    yield db
+    db.query(OutletHours).delete()
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def hours_of(db, outlet_id):
+    rows = db.execute(
+        text("SELECT weekday, opens, closes FROM outlet_hours WHERE outlet_id = :outlet_id ORDER BY weekday, opens"),
+        {"outlet_id": outlet_id},
+    )
+    return [tuple(row) for row in rows]
+
+def pending_count(db):
+    return db.execute(text("SELECT COUNT(*) FROM outlet_hours_pending")).scalar()
+
+def ids(response):
+    assert response.status_code == 200
+    return sorted(outlet["id"] for outlet in response.json())
+
+@pytest.mark.parametrize("hours, expected", [
+    ("Monday - Sunday, 8:00 AM - 10:00 PM", daily(480, 1320)),
+    ("Monday - Sunday (08:00AM to 10:00PM)", daily(480, 1320)),
+    ("Mon - Sun : 10am-6pm", daily(600, 1080)),
+    ("Monday\xa0- Sunday, 07:00AM\xa0- 09:00PM", daily(420, 1260)),
+    ("Monday - Saturday, 8:00 AM – 9:00PM", [(day, 480, 1260) for day in range(6)]),
+    ("0800 - 2200 (Sun - Thur)", [(day, 480, 1320) for day in (0, 1, 2, 3, 6)]),
+    ("Sunday – Thursday, 10:00 AM – 8:00PM", [(day, 600, 1200) for day in (0, 1, 2, 3, 6)]),
+    (
+        "Monday - Friday, 7:30 AM - 9:00 PM, Saturday - Sunday, 9:00 AM - 9:00 PM",
+        [(day, 450, 1260) for day in range(5)] + [(5, 540, 1260), (6, 540, 1260)],
+    ),
+    ("Monday - Sunday (10:00AM - 6:00PM)Tuesday : Close", [(day, 600, 1080) for day in (0, 2, 3, 4, 5, 6)]),
+    ("Friday - Saturday, 10:00 AM - 2:00 AM", [(4, 600, 1440), (5, 0, 120), (5, 600, 1440), (6, 0, 120)]),
+    ("Daily, 10:00 AM - 12:00 AM", daily(600, 1440)),
+    ("Open 24 hours", daily(0, 1440)),
+    ("Not specified", []),
+    ("Opening soon", []),
+    ("", []),
+    (None, []),
+])
+def test_parse_operating_hours(hours, expected):
+    assert parse_operating_hours(hours) == expected
+
+def test_weekday_minute():
+    # 7 March 2025 is a Friday
+    assert weekday_minute(datetime(2025, 3, 7, 23, 30)) == (4, 1410)
+    assert weekday_minute(datetime(2025, 3, 7, 16, 0, tzinfo=timezone.utc)) == (5, 0)
+
+def test_hours_index():
+    index = HoursIndex([
+        (1, 4, 600, 1440), (1, 5, 0, 120), (2, 4, 480, 1080), (3, 4, 0, 1440), (3, 4, 0, 600),
+    ])
+    assert index.open_ids(4, 1380).tolist() == [1, 3]
+    assert index.open_ids(4, 600).tolist() == [1, 2, 3]
+    assert index.open_ids(5, 60).tolist() == [1]
+    assert index.open_ids(5, 120).tolist() == []
+    assert index.open_ids(0, 0).tolist() == []
+    assert len(HoursIndex([]).open_ids(4, 600)) == 0
+
+def test_fill_and_write_outlet_hours(db):
+    assert db.execute(text("SELECT COUNT(*) FROM outlet_hours WHERE outlet_id = 2")).scalar() == 5
+    # Outlets that have hours, or none that parse, are left alone
+    assert fill_missing_outlet_hours(db) == 0
+
+    write_outlet_hours(db, [(2, "Saturday, 9:00 AM - 1:00 PM"), (3, None)])
+    db.commit()
+    rows = db.execute(text("SELECT outlet_id, weekday, opens, closes FROM outlet_hours WHERE outlet_id IN (2, 3)")).all()
+    assert [tuple(row) for row in rows] == [(2, 5, 540, 780)]
+
+def test_hours_parsed_on_every_commit(db):
+    # The fixture's outlets were added through the ORM
+    assert hours_of(db, 3) == daily(0, 1440)
+    db.execute(text("UPDATE outlets SET operating_hours = 'Saturday, 9:00 AM - 1:00 PM' WHERE id = 3"))
+    db.commit()
+    assert hours_of(db, 3) == [(5, 540, 780)]
+    # Other columns leave the hours alone
+    db.execute(text("UPDATE outlets SET name = 'Subway Sentral' WHERE id = 3"))
+    db.commit()
+    assert hours_of(db, 3) == [(5, 540, 780)]
+    db.execute(text("DELETE FROM outlets WHERE id = 3"))
+    db.commit()
+    assert hours_of(db, 3) == []
+    assert pending_count(db) == 0
+
+def test_fill_queued_outlet_hours(db):
+    # Written without a session, as from another tool: queued until filled
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO outlets (id, name, address, operating_hours) "
+            "VALUES (5, 'Subway Ipoh', 'Ipoh', 'Open 24 hours')"
+        ))
+    assert hours_of(db, 5) == [] and pending_count(db) == 1
+    assert fill_missing_outlet_hours(db) == 1
+    assert hours_of(db, 5) == daily(0, 1440) and pending_count(db) == 0
+
+def test_open_at_includes_new_outlets(client, db):
+    assert ids(client.get("/api/outlets/?open_at=2025-03-07T23:00")) == [1, 3]
+    db.add(Outlet(id=5, name="Subway Bangsar Night", address="Bangsar", operating_hours="Open 24 hours", lat=3.13, long=101.67))
+    db.commit()
+    assert ids(client.get("/api/outlets/?open_at=2025-03-07T23:00")) == [1, 3, 5]
+
+def test_list_open_at(client, db):
+    assert ids(client.get("/api/outlets/?open_at=2025-03-07T23:00")) == [1, 3]
+    assert ids(client.get("/api/outlets/?open_at=2025-03-08T01:00")) == [1, 3]
+    assert ids(client.get("/api/outlets/?open_at=2025-03-07T12:00")) == [1, 2, 3]
+    # 15:00 UTC is 23:00 in Malaysia
+    assert ids(client.get("/api/outlets/?open_at=2025-03-07T15:00:00Z")) == [1, 3]
+    assert ids(client.get("/api/outlets/")) == [1, 2, 3, 4]
+
+def test_list_open_at_pages(client, db):
+    response = client.get("/api/outlets/?open_at=2025-03-07T12:00&limit=2")
+    assert ids(response) == [1, 2]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/api/outlets/?open_at=2025-03-07T12:00&limit=2&cursor={cursor}")
+    assert ids(response) == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_search_open_at(client, db):
+    assert ids(client.get("/api/outlets/search/?query=bangsar&open_at=2025-03-07T23:00")) == [1]
+    assert ids(client.get("/api/outlets/search/?query=bangsar&open_at=2025-03-07T12:00")) == [1, 2]
+    assert ids(client.get("/api/outlets/search/?query=bangsar&mode=substring&open_at=2025-03-07T23:00")) == [1]
+    assert ids(client.get("/api/outlets/search/?query=bangsar")) == [1, 2, 4]
+
+def test_nearby_open_at(client, db):
+    url = "/api/outlets/nearby/?lat=3.13&long=101.67&radius=5"
+    assert ids(client.get(f"{url}&open_at=2025-03-09T20:00")) == [1, 3]
+    assert ids(client.get(f"{url}&open_at=2025-03-10T09:00")) == [2, 3]
+    assert ids(client.get(url)) == [1, 2, 3, 4]
+
+def test_open_at_invalid(client, db):
+    assert client.get("/api/outlets/?open_at=tonight").status_code == 422
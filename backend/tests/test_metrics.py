@@ -0,0 +1,79 @@
+import re
+
+import pytest
+
+from backend.main import app
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet
+# The app imports its modules relative to backend/, as uvicorn does
+from core.metrics import Histogram, Registry, current_request, instrument_engine
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+instrument_engine(engine)
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id in range(1, 31):
+        db.add(Outlet(
+            id=outlet_id, name=f"Subway {outlet_id}", address=f"Jalan {outlet_id}",
+            lat=3.1 + outlet_id * 0.001, long=101.6,
+        ))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def sample(text, name, **labels):
+    """The value of a sample in Prometheus text, 0 if absent."""
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{re.escape(name)}(?:\{{(.*)\}})? (\S+)", line)
+        if match and dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or "")) == labels:
+            return float(match.group(2))
+    return 0.0
+
+def test_histogram_render():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(('/a"b',), value)
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a\\"b",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a\\"b",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a\\"b"} 4' in text
+    assert 'latency_seconds_sum{route="/a\\"b"} 3.65' in text
+
+def test_request_metrics(client, db):
+    """Requests are recorded by route template, with the SQL they run."""
+    route = "/api/outlets/search/"
+    before = client.get("/metrics").text
+    for query in ("Subway", "Jalan 1"):
+        assert client.get(route, params={"query": query}).status_code == 200
+    assert client.get("/api/outlets/12345").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    labels = {"method": "GET", "route": route}
+    assert delta("http_request_duration_seconds_count", status="200", **labels) == 2
+    assert delta("http_request_duration_seconds_count", method="GET", route="/api/outlets/{outlet_id}", status="404") == 1
+    assert delta("http_request_db_queries_count", **labels) == 2
+    assert delta("http_request_db_queries_sum", **labels) >= 2
+    assert delta("http_request_db_duration_seconds_sum", **labels) > 0
+    # The FTS search fetches the 30 and then the 11 matching ids
+    assert delta("http_request_db_rows_fetched_sum", **labels) >= 41
+    assert sample(after, "http_requests_in_flight", **labels) == 0
+    assert delta("db_query_duration_seconds_count", operation="SELECT") >= 2
+
+def test_queries_outside_requests_not_attributed(db):
+    """SQL run outside a request is timed but not attributed to one."""
+    assert current_request.get() is None
+    assert db.query(Outlet).count() == 30
@@ -0,0 +1,83 @@
+import random
+
+import numpy as np
+import pytest
+
+from backend.tests.database import create_test_database, random_points
+from backend.database.models import Outlet
+from backend.schemas.outlet import MAX_NEARBY_BATCH_SIZE
+from backend.services.distance import GEODESIC, HAVERSINE, DistanceEngine
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+def random_queries(count, seed=22):
+    rng = random.Random(seed)
+    return [
+        {"lat": rng.uniform(2.8, 3.5), "long": rng.uniform(101.3, 102.0), "radius": rng.choice([0.5, 2.0, 5.0, 10.0])}
+        for _ in range(count)
+    ]
+
+@pytest.fixture(scope="function")
+def seeded_outlets():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id, lat, long in random_points(200, seed=21):
+        db.add(Outlet(
+            id=outlet_id,
+            name=f"Subway {outlet_id}",
+            address=f"Address {outlet_id}",
+            lat=lat,
+            long=long,
+        ))
+    db.add(Outlet(id=1000, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+@pytest.mark.parametrize("mode", [HAVERSINE, GEODESIC])
+def test_many_within_matches_within(mode, monkeypatch):
+    """Each query gets what within returns for it, also when split over several blocks."""
+    monkeypatch.setattr("backend.services.distance.BLOCK_SIZE", 8)
+    distance_engine = DistanceEngine.from_points(random_points(200, seed=21))
+    queries = random_queries(50)
+
+    query_indices, positions, distances = distance_engine.many_within(
+        [q["lat"] for q in queries], [q["long"] for q in queries], [q["radius"] for q in queries], mode
+    )
+    for index, query in enumerate(queries):
+        expected_positions, expected_distances = distance_engine.within(
+            query["lat"], query["long"], query["radius"], mode=mode
+        )
+        mask = query_indices == index
+        assert positions[mask].tolist() == expected_positions.tolist()
+        np.testing.assert_allclose(distances[mask], expected_distances)
+
+def test_batch_matches_single_point_endpoint(client, seeded_outlets):
+    queries = random_queries(40)
+    response = client.post("/api/outlets/nearby/batch", json={"queries": queries})
+    assert response.status_code == 200
+
+    results = response.json()
+    assert len(results) == len(queries)
+    for query, result in zip(queries, results):
+        single = client.get("/api/outlets/nearby/", params=query).json()
+        assert result == single
+
+def test_batch_default_radius_and_empty_results(client, seeded_outlets):
+    response = client.post("/api/outlets/nearby/batch", json={"queries": [
+        {"lat": 3.15, "long": 101.65},
+        {"lat": 10.0, "long": 10.0, "radius": 1.0},
+    ]})
+    assert response.status_code == 200
+    near, far = response.json()
+    assert near == client.get("/api/outlets/nearby/?lat=3.15&long=101.65").json()
+    assert far == []
+
+def test_batch_size_limit(client, seeded_outlets):
+    assert client.post("/api/outlets/nearby/batch", json={"queries": []}).json() == []
+
+    queries = [{"lat": 3.15, "long": 101.65}] * (MAX_NEARBY_BATCH_SIZE + 1)
+    response = client.post("/api/outlets/nearby/batch", json={"queries": queries})
+    assert response.status_code == 422
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database.models import Base, Outlet
+from backend.services.pagination import decode_cursor, encode_cursor
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for i in range(25):
+        db.add(Outlet(name=f"Subway {i}", address=f"Address {i}"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(1)[:-2], "eyJpZCI6IjEifQ"])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_cursor_pages_cover_every_outlet(client, db):
+    """Following next_cursor visits every outlet once, in ID order."""
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = "/api/outlets/?limit=10" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend(outlet["id"] for outlet in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    expected = [outlet.id for outlet in db.query(Outlet).order_by(Outlet.id)]
+    assert seen == expected
+    assert pages == 3
+
+def test_no_cursor_on_last_page(client, db):
+    response = client.get("/api/outlets/?limit=25")
+    assert len(response.json()) == 25
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_skips_deleted_outlets(client, db):
+    """A deleted outlet does not shift the next page, unlike an offset."""
+    first_page = client.get("/api/outlets/?limit=10")
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    db.delete(db.get(Outlet, first_page.json()[0]["id"]))
+    db.commit()
+
+    second_page = client.get(f"/api/outlets/?limit=10&cursor={cursor}").json()
+    assert second_page[0]["id"] == first_page.json()[-1]["id"] + 1
+
+def test_skip_still_supported(client, db):
+    all_ids = [outlet["id"] for outlet in client.get("/api/outlets/?limit=100").json()]
+    response = client.get("/api/outlets/?skip=5&limit=5")
+    assert [outlet["id"] for outlet in response.json()] == all_ids[5:10]
+
+def test_zero_limit_returns_empty_page(client, db):
+    response = client.get("/api/outlets/?limit=0")
+    assert response.status_code == 200
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+def test_negative_skip_rejected(client, db):
+    assert client.get("/api/outlets/?skip=-5").status_code == 422
+
+def test_invalid_cursor_rejected(client, db):
+    response = client.get("/api/outlets/?cursor=garbage")
+    assert response.status_code == 400
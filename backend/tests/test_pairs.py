@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+import pytest
+
+from backend.services.distance import GEODESIC, HAVERSINE, DistanceEngine
+from backend.services.pairs import grid_pairs
+
+def unordered(engine, firsts, seconds):
+    return {
+        tuple(sorted(pair))
+        for pair in zip(engine.ids[firsts].tolist(), engine.ids[seconds].tolist())
+    }
+
+def brute_force(engine, distance_km, mode):
+    firsts, seconds, _ = engine.pairs_within(distance_km, mode)
+    return unordered(engine, firsts, seconds)
+
+def random_engine(count, lat_range, long_range, seed=5):
+    rng = random.Random(seed)
+    return DistanceEngine.from_points([
+        (i + 1, rng.uniform(*lat_range), rng.uniform(*long_range))
+        for i in range(count)
+    ])
+
+@pytest.mark.parametrize("mode", [HAVERSINE, GEODESIC])
+@pytest.mark.parametrize("distance_km", [0.0, 0.5, 3.0, 10.0, 80.0])
+def test_grid_pairs_match_brute_force(distance_km, mode):
+    engine = random_engine(400, (2.8, 3.5), (101.3, 102.0))
+    firsts, seconds, distances = grid_pairs(engine, distance_km, mode)
+
+    assert unordered(engine, firsts, seconds) == brute_force(engine, distance_km, mode)
+    # Each unordered pair appears once
+    assert len(unordered(engine, firsts, seconds)) == len(firsts)
+    assert np.all(distances <= distance_km)
+
+def test_grid_pairs_across_antimeridian():
+    engine = DistanceEngine.from_points([(1, 0.0, 179.99), (2, 0.0, -179.99), (3, 0.0, 179.0)])
+    firsts, seconds, _ = grid_pairs(engine, 5.0)
+    assert unordered(engine, firsts, seconds) == {(1, 2)}
+
+def test_grid_pairs_near_pole():
+    engine = random_engine(200, (85.0, 89.9), (-180.0, 180.0))
+    firsts, seconds, _ = grid_pairs(engine, 150.0)
+    assert unordered(engine, firsts, seconds) == brute_force(engine, 150.0, GEODESIC)
+
+def test_grid_pairs_duplicate_coordinates():
+    engine = DistanceEngine.from_points([(1, 3.1, 101.6), (2, 3.1, 101.6), (3, 3.1, 101.6)])
+    firsts, seconds, distances = grid_pairs(engine, 1.0)
+    assert unordered(engine, firsts, seconds) == {(1, 2), (1, 3), (2, 3)}
+    assert np.all(distances == 0)
+
+def test_grid_pairs_empty():
+    firsts, seconds, distances = grid_pairs(DistanceEngine.from_points([]), 5.0)
+    assert len(firsts) == len(seconds) == len(distances) == 0
+
+def test_grid_pairs_in_small_chunks(monkeypatch):
+    """Splitting the sources into chunks does not change the result."""
+    engine = random_engine(300, (2.8, 3.5), (101.3, 102.0))
+    expected = brute_force(engine, 10.0, GEODESIC)
+
+    monkeypatch.setattr("backend.services.pairs.CHUNK_SIZE", 7)
+    firsts, seconds, _ = grid_pairs(engine, 10.0)
+    assert unordered(engine, firsts, seconds) == expected
+    assert len(firsts) == len(expected)
@@ -0,0 +1,80 @@
+import os
+import pstats
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.main import app as main_app
+# The app imports its modules relative to backend/, as uvicorn does
+from core.profiling import ProfilingMiddleware
+
+TOKEN = "secret-token"
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+def create_app(directory, max_count=50):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        # A sync endpoint, so its work runs in the threadpool
+        busy_work(0.05)
+        return {"id": item_id}
+
+    app.add_middleware(ProfilingMiddleware, token=TOKEN, directory=str(directory), max_count=max_count)
+    return app
+
+def profiles(directory):
+    return sorted(os.listdir(directory)) if os.path.exists(directory) else []
+
+def test_disabled_by_default():
+    """Without the config switch the middleware is not installed at all."""
+    assert all(middleware.cls is not ProfilingMiddleware for middleware in main_app.user_middleware)
+
+def test_unprofiled_requests(tmp_path):
+    client = TestClient(create_app(tmp_path / "profiles"))
+    assert client.get("/items/1").json() == {"id": 1}
+    response = client.get("/items/1", headers={"X-Profile-Token": "wrong"})
+    assert "X-Profile" not in response.headers
+    client.get("/items/1", params={"profile_token": "wrong"})
+    assert profiles(tmp_path / "profiles") == []
+
+@pytest.mark.parametrize("how", ["header", "query"])
+def test_profiled_request(tmp_path, how):
+    directory = tmp_path / "profiles"
+    client = TestClient(create_app(directory))
+    if how == "header":
+        response = client.get("/items/7", headers={"X-Profile-Token": TOKEN})
+    else:
+        response = client.get("/items/7", params={"profile_token": TOKEN})
+    assert response.json() == {"id": 7}
+
+    key = response.headers["X-Profile"]
+    assert key.endswith("_GET_items_item_id")
+    assert profiles(directory) == [f"{key}.collapsed", f"{key}.prof"]
+
+    # The threadpool work shows up in both formats
+    with open(directory / f"{key}.collapsed") as f:
+        lines = f.read().splitlines()
+    assert any("read_item (test_profiling.py:" in line and ";busy_work (" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    stats = pstats.Stats(str(directory / f"{key}.prof"))
+    busy = [value for function, value in stats.stats.items() if function[2] == "busy_work"]
+    assert len(busy) == 1
+    cc, nc, tt, ct, callers = busy[0]
+    assert 0.02 < ct < 0.5
+    assert [caller[2] for caller in callers] == ["read_item"]
+
+def test_profiles_capped(tmp_path):
+    directory = tmp_path / "profiles"
+    client = TestClient(create_app(directory, max_count=2))
+    keys = [client.get(f"/items/{i}", headers={"X-Profile-Token": TOKEN}).headers["X-Profile"] for i in range(4)]
+    assert profiles(directory) == sorted(f"{key}{extension}" for key in keys[2:] for extension in (".collapsed", ".prof"))
@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database.models import Base, Outlet
+from backend.services.search import build_match_query
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+test_outlets = [
+    {"name": "Subway Bangsar Village", "address": "Jalan Telawi 1, Bangsar, Kuala Lumpur"},
+    {"name": "Subway Mid Valley", "address": "Lingkaran Syed Putra, near Bangsar, Kuala Lumpur"},
+    {"name": "Subway KL Sentral", "address": "KL Sentral Station, Kuala Lumpur"},
+    {"name": "Subway Petaling Jaya", "address": "Jalan SS2, Petaling Jaya, Selangor"},
+]
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_data in test_outlets:
+        db.add(Outlet(**outlet_data))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def names(response):
+    assert response.status_code == 200
+    return [outlet["name"] for outlet in response.json()]
+
+def test_build_match_query():
+    assert build_match_query("KL sent") == '"KL"* "sent"*'
+    assert build_match_query('bangsar" OR name:x') == '"bangsar"* "OR"* "name"* "x"*'
+    assert build_match_query("  -- ") is None
+
+def test_search_ranks_name_matches_first(client, db):
+    assert names(client.get("/api/outlets/search/?query=bangsar")) == [
+        "Subway Bangsar Village",
+        "Subway Mid Valley",
+    ]
+
+def test_search_prefix_matching(client, db):
+    assert names(client.get("/api/outlets/search/?query=petal")) == ["Subway Petaling Jaya"]
+    assert names(client.get("/api/outlets/search/?query=KL%20sent")) == ["Subway KL Sentral"]
+
+def test_search_limit(client, db):
+    assert len(names(client.get("/api/outlets/search/?query=kuala&limit=2"))) == 2
+
+def test_search_ignores_fts_syntax(client, db):
+    assert names(client.get('/api/outlets/search/?query="jaya OR NOT')) == []
+
+def test_search_substring_mode(client, db):
+    """Substring mode still matches inside words."""
+    assert names(client.get("/api/outlets/search/?query=entral")) == []
+    assert names(client.get("/api/outlets/search/?query=entral&mode=substring")) == ["Subway KL Sentral"]
+
+def test_substring_mode_unlimited_by_default(client, db):
+    for number in range(150):
+        db.add(Outlet(name=f"Subway Kiosk {number}", address="Jalan Ampang, Kuala Lumpur"))
+    db.commit()
+    assert len(names(client.get("/api/outlets/search/?query=ampang&mode=substring"))) == 150
+    assert len(names(client.get("/api/outlets/search/?query=ampang&mode=substring&limit=20"))) == 20
+    assert len(names(client.get("/api/outlets/search/?query=ampang"))) == 100
+
+def test_index_follows_updates_and_deletes(client, db):
+    outlet = db.query(Outlet).filter(Outlet.name == "Subway KL Sentral").one()
+    outlet.name = "Subway NU Sentral"
+    db.commit()
+    assert names(client.get("/api/outlets/search/?query=NU")) == ["Subway NU Sentral"]
+
+    db.delete(outlet)
+    db.commit()
+    assert names(client.get("/api/outlets/search/?query=sentral")) == []
+
+def test_index_filled_for_existing_outlets():
+    """Creating the index on a database that already has outlets indexes them."""
+    existing = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    with existing.begin() as connection:
+        Outlet.__table__.create(connection)
+        connection.execute(Outlet.__table__.insert(), test_outlets)
+    Base.metadata.create_all(bind=existing)
+
+    with existing.connect() as connection:
+        rows = connection.execute(text("SELECT rowid FROM outlets_fts WHERE outlets_fts MATCH 'selangor'")).all()
+    assert len(rows) == 1
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet, OutletHours
+from backend.services.hours import fill_missing_outlet_hours
+from backend.services.semantic import SemanticIndex, ngrams, weighted_counts
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+test_outlets = [
+    (1, "Subway Bangsar Village", "Jalan Telawi 1, Bangsar, Kuala Lumpur", "Monday - Sunday, 8:00 AM - 10:00 PM"),
+    (2, "Subway KL Sentral", "Stesen Sentral, Kuala Lumpur", "Open 24 hours"),
+    (3, "Subway Mid Valley", "Mid Valley Megamall, Kuala Lumpur", "Monday - Sunday, 10:00 AM - 10:00 PM"),
+    (4, "Subway Petaling Jaya", "Jalan SS 2/24, Petaling Jaya, Selangor", "Monday - Friday, 9:00 AM - 6:00 PM"),
+]
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(OutletHours).delete()
+    db.query(Outlet).delete()
+    for outlet_id, name, address, hours in test_outlets:
+        db.add(Outlet(id=outlet_id, name=name, address=address, operating_hours=hours, lat=3.1, long=101.6))
+    db.commit()
+    fill_missing_outlet_hours(db)
+    yield db
+    db.query(OutletHours).delete()
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def build_index(documents):
+    ids = np.arange(1, len(documents) + 1)
+    return SemanticIndex(("test",), ids, [weighted_counts([(text, 1.0)]) for text in documents])
+
+def test_ngrams():
+    assert ngrams("KL Sentral!") == [" kl", "kl ", " se", "sen", "ent", "ntr", "tra", "ral", "al "]
+    assert ngrams("a") == [" a "]
+    assert ngrams("") == []
+
+def test_search_ranks_by_cosine_similarity():
+    index = build_index(["mid valley megamall", "valley", "bangsar village"])
+    ids, scores = index.search("valley", 3)
+    assert ids.tolist() == [2, 1]
+    assert scores[0] == pytest.approx(1.0)
+    assert 0 < scores[1] < scores[0]
+
+def test_search_tolerates_misspellings():
+    index = build_index(["bangsar village", "mid valley megamall", "kl sentral"])
+    assert index.search("bangsr", 1)[0].tolist() == [1]
+    assert index.search("midvalley", 1)[0].tolist() == [2]
+
+def test_search_limits():
+    index = build_index(["kuala lumpur", "kuala lumpur sentral", "kuala selangor", "penang"])
+    assert len(index.search("kuala lumpur", 2)[0]) == 2
+    ids, scores = index.search("kuala lumpur", 10, min_score=0.5)
+    assert (scores > 0.5).all() and 1 in ids.tolist() and 4 not in ids.tolist()
+    assert index.search("kuala", 10, ids=np.array([3]))[0].tolist() == [3]
+    assert len(index.search("xyz", 10)[0]) == 0
+    assert len(index.search("", 10)[0]) == 0
+    assert len(build_index([]).search("kuala", 10)[0]) == 0
+
+def test_semantic_endpoint(client, db):
+    response = client.get("/api/outlets/semantic/?query=bangsar telawi&k=2")
+    assert response.status_code == 200
+    outlets = response.json()
+    assert [outlet["id"] for outlet in outlets][0] == 1
+    assert outlets[0]["name"] == "Subway Bangsar Village"
+    assert outlets == sorted(outlets, key=lambda outlet: -outlet["score"])
+    assert len(outlets) <= 2
+
+    assert client.get("/api/outlets/semantic/?query=open 24 hours").json()[0]["id"] == 2
+    assert client.get("/api/outlets/semantic/?query=qqqq").json() == []
+
+def test_semantic_endpoint_open_at(client, db):
+    # 8 March 2025 is a Saturday: the Petaling Jaya outlet is closed
+    url = "/api/outlets/semantic/?query=subway&k=10&min_score=0"
+    assert sorted(outlet["id"] for outlet in client.get(url).json()) == [1, 2, 3, 4]
+    response = client.get(f"{url}&open_at=2025-03-08T12:00")
+    assert sorted(outlet["id"] for outlet in response.json()) == [1, 2, 3]
+
+def test_semantic_endpoint_rebuilds_on_change(client, db):
+    assert client.get("/api/outlets/semantic/?query=ipoh").json() == []
+    db.add(Outlet(id=5, name="Subway Ipoh Parade", address="Jalan Sultan Abdul Jalil, Ipoh"))
+    db.commit()
+    assert client.get("/api/outlets/semantic/?query=ipoh").json()[0]["id"] == 5
+
+@pytest.mark.parametrize("query", ["", "query=kl&k=0", "query=kl&k=101", "query=kl&min_score=2"])
+def test_semantic_endpoint_invalid(client, db, query):
+    assert client.get(f"/api/outlets/semantic/?{query}").status_code == 422
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet
+from backend.schemas.outlet import IntersectingOutlet, Outlet as OutletSchema, OutletDistance
+from backend.services.distance_table import build_distance_table
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    db.add(Outlet(
+        id=1,
+        name="Subway KL Sentral",
+        address="Lot 20, Level 1, KL Sentral Station, 50470 Kuala Lumpur",
+        operating_hours="Monday, 8:00 AM - 9:00 PM",
+        waze_link="https://waze.com/ul?ll=3.1334,101.6869",
+        google_maps_link="https://maps.google.com/?q=3.1334,101.6869",
+        lat=3.1334,
+        long=101.6869,
+        created_at=datetime(2025, 3, 1, 8, 30, 15, 123456),
+        updated_at=datetime(2025, 3, 2, 9, 0, 0),
+    ))
+    db.add(Outlet(id=2, name="Subway Quill City Mall", address="Jalan Sultan Ismail", lat=3.1623, long=101.7003))
+    db.add(Outlet(id=3, name="Subway Café Ünïcode", address="Jalan Tun Razak", lat=3.1614, long=101.7199))
+    db.add(Outlet(id=4, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def schema_json(db, schema, items, field):
+    """What the response_model path serializes for the response's outlets."""
+    outlets = {outlet.id: outlet for outlet in db.query(Outlet)}
+    return [
+        schema(**OutletSchema.model_validate(outlets[item["id"]]).model_dump(), **{field: item[field]})
+        .model_dump(mode="json")
+        for item in items
+    ]
+
+def assert_identical(items, expected):
+    assert items == expected
+    # Same fields in the same order, not just equal values
+    assert [list(item) for item in items] == [list(item) for item in expected]
+
+@pytest.mark.parametrize("url", [
+    "/api/outlets/nearby/?lat=3.14&long=101.69&radius=10",
+    "/api/outlets/distance/1",
+    "/api/outlets/catchment/?outlet_id=1&radius=5",
+])
+def test_distance_responses_match_schema(client, db, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "ETag" in response.headers
+
+    items = response.json()
+    assert len(items) >= 2
+    assert_identical(items, schema_json(db, OutletDistance, items, "distance"))
+
+def test_distance_table_response_matches_schema(client, db):
+    build_distance_table(db, k=None)
+    items = client.get("/api/outlets/distance/2").json()
+    assert [item["id"] for item in items] == [3, 1]
+    assert_identical(items, schema_json(db, OutletDistance, items, "distance"))
+
+def test_intersecting_response_matches_schema(client, db):
+    response = client.get("/api/outlets/intersecting/")
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+
+    items = response.json()
+    assert [item["id"] for item in items] == [1, 2, 3]
+    assert_identical(items, schema_json(db, IntersectingOutlet, items, "intersects_with"))
+
+def test_outlet_responses_match_schema(client, db):
+    outlets = {outlet.id: outlet for outlet in db.query(Outlet)}
+
+    items = client.get("/api/outlets/").json()
+    assert_identical(items, [OutletSchema.model_validate(outlets[i]).model_dump(mode="json") for i in (1, 2, 3, 4)])
+
+    item = client.get("/api/outlets/1").json()
+    assert_identical([item], [OutletSchema.model_validate(outlets[1]).model_dump(mode="json")])
+
+    items = client.get("/api/outlets/search/?query=cafe").json()
+    assert_identical(items, [OutletSchema.model_validate(outlets[3]).model_dump(mode="json")])
@@ -0,0 +1,158 @@
+import gc
+import sqlite3
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from backend.tests.database import create_test_database
+from backend.database.models import Outlet
+from backend.schemas.outlet import Outlet as OutletSchema
+from backend.services import data_version, snapshot as snapshot_module
+from backend.services.snapshot import OUTLET_FIELDS, SnapshotStore, load_snapshot
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+OUTLET_COUNT = 2000
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id in range(1, OUTLET_COUNT + 1):
+        db.add(Outlet(
+            id=outlet_id,
+            name=f"Subway Outlet {outlet_id}",
+            address=f"No. {outlet_id}, Jalan Sultan Ismail, 50250 Kuala Lumpur",
+            operating_hours="Monday - Sunday, 8:00 AM - 10:00 PM",
+            waze_link=f"https://waze.com/ul?q=subway{outlet_id}",
+            google_maps_link=f"https://maps.google.com/?q=subway{outlet_id}",
+            lat=3.0 + outlet_id * 1e-4,
+            long=101.5 + outlet_id * 1e-4,
+        ))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def external_insert(outlet_id):
+    """Insert an outlet the way another process would, unseen by this one."""
+    with sqlite3.connect(engine.url.database) as connection:
+        connection.execute(
+            "INSERT INTO outlets (id, name, address) VALUES (?, ?, ?)",
+            (outlet_id, f"Subway External {outlet_id}", "Elsewhere"),
+        )
+
+def allocated(build):
+    """Bytes still allocated by what build returns."""
+    # Garbage collected while measuring would count against build
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+def test_fields_follow_schema():
+    assert OUTLET_FIELDS == tuple(OutletSchema.model_fields)
+
+def test_snapshot_rows(db):
+    snapshot = load_snapshot(db)
+    assert len(snapshot) == OUTLET_COUNT
+    assert dict(zip(OUTLET_FIELDS, snapshot.get(7)))["name"] == "Subway Outlet 7"
+    assert snapshot.get(OUTLET_COUNT + 1) is None
+    assert [row[OUTLET_FIELDS.index("id")] for row in snapshot.page(1995, 0, 10)] == [1996, 1997, 1998, 1999, 2000]
+    assert [row[OUTLET_FIELDS.index("id")] for row in snapshot.page(None, 3, 2)] == [4, 5]
+    assert [row[OUTLET_FIELDS.index("id")] for row in snapshot.page(None, -5, 2)] == [1, 2]
+    assert len(snapshot.index.engine) == OUTLET_COUNT
+
+def test_snapshot_smaller_than_orm_objects(db):
+    """The snapshot, spatial index included, takes less memory than the ORM objects alone."""
+    # Compile both queries first, so neither measurement counts the caches
+    load_snapshot(db)
+    db.query(Outlet).all()
+    db.expunge_all()
+    snapshot_bytes = allocated(lambda: load_snapshot(db))
+    db.expunge_all()
+    orm_bytes = allocated(lambda: db.query(Outlet).all())
+    db.expunge_all()
+
+    assert snapshot_bytes < orm_bytes / 2
+
+def test_reload_in_background(db, monkeypatch):
+    """A stale snapshot is served while its replacement is built, then swapped in."""
+    monkeypatch.setattr(data_version, "VERSION_CACHE_SECONDS", 0.0)
+    store = SnapshotStore()
+    first = store.get(db)
+
+    release = threading.Event()
+    def slow_load_snapshot(session):
+        release.wait(5)
+        return load_snapshot(session)
+    monkeypatch.setattr(snapshot_module, "load_snapshot", slow_load_snapshot)
+
+    external_insert(OUTLET_COUNT + 1)
+    start = time.monotonic()
+    assert store.get(db) is first
+    assert store.get(db) is first
+    assert time.monotonic() - start < 0.5
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while store.get(db) is first and time.monotonic() < deadline:
+        time.sleep(0.01)
+    second = store.get(db)
+    assert second is not first
+    assert len(second) == OUTLET_COUNT + 1
+    assert second.version == data_version.get_data_version(db)
+
+def test_one_reader_builds_a_missing_snapshot(db, monkeypatch):
+    """Readers arriving while a snapshot is built wait for it instead of building their own."""
+    store = SnapshotStore()
+    loads = []
+    def slow_load_snapshot(session):
+        loads.append(session)
+        time.sleep(0.2)
+        return load_snapshot(session)
+    monkeypatch.setattr(snapshot_module, "load_snapshot", slow_load_snapshot)
+
+    results = []
+    def read():
+        with TestingSessionLocal() as session:
+            results.append(store.get(session))
+    readers = [threading.Thread(target=read) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert len(loads) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+def test_version_changes_when_aggregates_do_not(db):
+    """Replacing the newest outlet within a second keeps its count, max ID and max updated_at."""
+    version = data_version.get_data_version(db)
+    aggregates = db.execute(data_version.AGGREGATE_VERSION_QUERY).one()
+    with sqlite3.connect(engine.url.database) as connection:
+        connection.execute("DELETE FROM outlets WHERE id = ?", (OUTLET_COUNT,))
+        connection.execute(
+            "INSERT INTO outlets (id, name, address, updated_at) VALUES (?, ?, ?, ?)",
+            (OUTLET_COUNT, "Subway Replacement", "Elsewhere", aggregates[2]),
+        )
+    assert db.execute(data_version.AGGREGATE_VERSION_QUERY).one() == aggregates
+    assert data_version.get_data_version(db) != version
+
+def test_own_writes_visible_immediately(db):
+    """Commits made through this process drop the snapshot instead of waiting for a reload."""
+    store = snapshot_module.snapshots
+    assert store.get(db).get(OUTLET_COUNT + 1) is None
+
+    db.add(Outlet(id=OUTLET_COUNT + 1, name="Subway New", address="New Address"))
+    db.commit()
+    assert store.get(db).get(OUTLET_COUNT + 1) is not None
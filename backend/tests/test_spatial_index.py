@@ -0,0 +1,120 @@
+import random
+
+import pytest
+from geopy.distance import geodesic
+
+from backend.tests.database import create_test_database, random_points
+from backend.database.models import Outlet
+from backend.services.spatial_index import SpatialIndex
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+@pytest.fixture(scope="function")
+def seeded_outlets():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id, lat, long in random_points(300, seed=42):
+        db.add(Outlet(
+            id=outlet_id,
+            name=f"Subway {outlet_id}",
+            address=f"Address {outlet_id}",
+            lat=lat,
+            long=long,
+        ))
+    db.add(Outlet(id=1000, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+@pytest.mark.parametrize("radius", [0.5, 2.0, 5.0, 25.0, 200.0])
+def test_candidates_contain_every_match(radius):
+    """The grid must never drop an outlet that is within the radius."""
+    points = random_points(500, seed=42)
+    index = SpatialIndex(points)
+    rng = random.Random(7)
+
+    for _ in range(20):
+        lat, long = rng.uniform(2.8, 3.5), rng.uniform(101.3, 102.0)
+        candidate_ids = set(index.engine.ids[index.candidates(lat, long, radius)].tolist())
+        expected = {
+            p[0] for p in points
+            if geodesic((lat, long), (p[1], p[2])).kilometers <= radius
+        }
+        assert expected <= candidate_ids
+
+def test_candidates_skip_distant_cells():
+    """A small radius should only return a fraction of the outlets."""
+    points = random_points(500, seed=42)
+    index = SpatialIndex(points)
+    assert len(index.candidates(3.15, 101.65, 1.0)) < len(points) // 10
+
+def test_candidates_wrap_around_antimeridian():
+    """Points on both sides of the antimeridian are found."""
+    index = SpatialIndex([(1, 0.0, 179.99), (2, 0.0, -179.99), (3, 0.0, 0.0)])
+    candidate_ids = set(index.engine.ids[index.candidates(0.0, 180.0, 5.0)].tolist())
+    assert candidate_ids == {1, 2}
+
+def test_nearby_matches_full_scan(client, seeded_outlets):
+    """The indexed endpoint returns the same outlets, in the same order, as a full scan."""
+    lat, long, radius = 3.15, 101.65, 8.0
+    response = client.get(f"/api/outlets/nearby/?lat={lat}&long={long}&radius={radius}")
+    assert response.status_code == 200
+
+    outlets = response.json()
+    expected = sorted(
+        (geodesic((lat, long), (p[1], p[2])).kilometers, p[0])
+        for p in random_points(300, seed=42)
+    )
+    expected = [outlet_id for distance, outlet_id in expected if distance <= radius]
+
+    assert [outlet["id"] for outlet in outlets] == expected
+    assert all(outlet["distance"] <= radius for outlet in outlets)
+
+@pytest.mark.parametrize("query", [
+    "lat=nan&long=101.6", "lat=3.1&long=nan", "lat=3.1&long=101.6&radius=nan",
+    "lat=3.1&long=101.6&radius=inf", "lat=3.1&long=101.6&radius=-1", "lat=91&long=101.6", "lat=3.1&long=181",
+])
+def test_nearby_rejects_invalid_points(client, seeded_outlets, query):
+    assert client.get(f"/api/outlets/nearby/?{query}").status_code == 422
+
+def test_nearby_index_rebuilds_after_change(client, seeded_outlets):
+    """New outlets show up without restarting the process."""
+    lat, long = 3.0, 101.0
+    response = client.get(f"/api/outlets/nearby/?lat={lat}&long={long}&radius=1.0")
+    assert response.json() == []
+
+    seeded_outlets.add(Outlet(name="Subway New", address="New Address", lat=lat, long=long))
+    seeded_outlets.commit()
+
+    response = client.get(f"/api/outlets/nearby/?lat={lat}&long={long}&radius=1.0")
+    assert [outlet["name"] for outlet in response.json()] == ["Subway New"]
+
+@pytest.mark.parametrize("k", [1, 5, 40, 299, 300, 500])
+def test_nearest_matches_full_sort(k):
+    """The k nearest outlets equal the first k of every outlet sorted by distance."""
+    index = SpatialIndex(random_points(300, seed=42), cell_size=0.02)
+    for lat, long in [(3.15, 101.65), (2.0, 100.0), (-40.0, -70.0)]:
+        positions, distances = index.nearest(lat, long, k)
+        expected = sorted((geodesic((lat, long), (p[1], p[2])).kilometers, p[0]) for p in random_points(300, seed=42))[:k]
+
+        assert index.engine.ids[positions].tolist() == [outlet_id for _, outlet_id in expected]
+        assert distances.tolist() == pytest.approx([distance for distance, _ in expected], abs=1e-6)
+
+def test_nearest_endpoint(client, seeded_outlets):
+    response = client.get("/api/outlets/nearest/?lat=3.15&long=101.65&k=7")
+    assert response.status_code == 200
+    outlets = response.json()
+
+    expected = client.get("/api/outlets/nearby/?lat=3.15&long=101.65&radius=100").json()[:7]
+    assert outlets == expected
+
+def test_nearest_endpoint_validates_k(client, seeded_outlets):
+    assert client.get("/api/outlets/nearest/?lat=3.15&long=101.65&k=0").status_code == 422
+    assert client.get("/api/outlets/nearest/?lat=3.15&long=101.65&k=1001").status_code == 422
+    assert len(client.get("/api/outlets/nearest/?lat=3.15&long=101.65").json()) == 5
+
+@pytest.mark.parametrize("query", ["lat=nan&long=101.65", "lat=3.15&long=nan", "lat=inf&long=101.65", "lat=-91&long=101.65", "lat=3.15&long=180.5"])
+def test_nearest_endpoint_validates_point(client, seeded_outlets, query):
+    assert client.get(f"/api/outlets/nearest/?{query}").status_code == 422
@@ -0,0 +1,40 @@
+"""Tests for the cold start of the API."""
+import statistics
+
+import dotenv
+
+from benchmarks.startup import IMPORT_BUDGET, RESPONSE_BUDGET, measure, run
+# The app imports its modules relative to backend/, as uvicorn does
+from core import config
+
+def test_import_defers_heavy_dependencies():
+    """Test that importing the app loads neither geopy nor the scraper's browser and parsers."""
+    modules = run(
+        "import json, sys; sys.path.insert(0, 'backend'); import backend.main; "
+        "print(json.dumps([m for m in ('geopy', 'playwright', 'bs4') if m in sys.modules]))"
+    )
+    assert modules == []
+
+def test_startup_within_budget():
+    """Test that the app imports and answers its first request within the startup budget."""
+    seconds = measure(runs=3, paths=("/",))
+    assert statistics.median(seconds["import backend.main"]) < IMPORT_BUDGET
+    assert statistics.median(seconds["first GET /"]) < RESPONSE_BUDGET
+
+def test_settings_import_loads_no_env_file():
+    """Test that importing the settings leaves .env alone."""
+    loaded = run(
+        "import json, sys; sys.path.insert(0, 'backend'); import core.config; "
+        "print(json.dumps('dotenv' in sys.modules))"
+    )
+    assert loaded is False
+
+def test_init_reads_settings_from_env_file(monkeypatch):
+    """Test that init(), called by the app factory, reads the settings .env sets."""
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda: monkeypatch.setenv("PROFILE_DIR", "./profiles-from-env-file"))
+    try:
+        config.init()
+        assert config.PROFILE_DIR == "./profiles-from-env-file"
+    finally:
+        monkeypatch.undo()
+        config.read_settings()
@@ -0,0 +1,109 @@
+import math
+
+import pytest
+
+from backend.tests.database import create_test_database, random_points
+from backend.database.models import Outlet
+from backend.services.tiles import coordinate_precision, tile_bounds
+
+engine, TestingSessionLocal, override_get_db, override_get_async_db = create_test_database()
+
+def world_points(count):
+    points = random_points(count, seed=41, lat_range=(-60.0, 70.0), long_range=(-180.0, 180.0))
+    # Points on tile edges at every zoom level
+    return points + [(count + 1, 0.0, 0.0), (count + 2, 0.0, -180.0), (count + 3, 45.0, 90.0)]
+
+def tile_of(lat, long, z):
+    """The standard slippy map tile of a point."""
+    tiles = 2 ** z
+    x = math.floor((long + 180.0) / 360.0 * tiles)
+    y = math.floor((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * tiles)
+    return min(x, tiles - 1), min(y, tiles - 1)
+
+@pytest.fixture(scope="function")
+def db():
+    db = TestingSessionLocal()
+    db.query(Outlet).delete()
+    for outlet_id, lat, long in world_points(300):
+        db.add(Outlet(
+            id=outlet_id,
+            name=f"Subway {outlet_id}",
+            address=f"Address {outlet_id}",
+            operating_hours="Daily, 8:00 AM - 10:00 PM",
+            lat=lat,
+            long=long,
+        ))
+    db.add(Outlet(id=1000, name="Subway No Coordinates", address="Unknown"))
+    db.commit()
+    yield db
+    db.query(Outlet).delete()
+    db.commit()
+    db.close()
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-180.0, -85.0511287798, 180.0, 85.0511287798))
+    assert tile_bounds(1, 1, 0) == pytest.approx((0.0, 0.0, 180.0, 85.0511287798))
+    assert coordinate_precision(0) == 0
+    assert coordinate_precision(12) == 4
+    assert coordinate_precision(22) == 7
+
+@pytest.mark.parametrize("z", [0, 2, 3])
+def test_every_outlet_in_exactly_one_tile(client, db, z):
+    found = {}
+    for x in range(2 ** z):
+        for y in range(2 ** z):
+            response = client.get(f"/api/outlets/tiles/{z}/{x}/{y}.geojson")
+            assert response.status_code == 200
+            for feature in response.json()["features"]:
+                assert feature["id"] not in found
+                found[feature["id"]] = (x, y)
+
+    points = world_points(300)
+    assert set(found) == {outlet_id for outlet_id, _, _ in points}
+    for outlet_id, lat, long in points:
+        assert found[outlet_id] == tile_of(lat, long, z)
+
+def test_tile_features(client, db):
+    z = 6
+    x, y = tile_of(0.0, 0.0, z)
+    response = client.get(f"/api/outlets/tiles/{z}/{x}/{y}.geojson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    assert "ETag" in response.headers
+
+    collection = response.json()
+    assert collection["type"] == "FeatureCollection"
+    feature = next(f for f in collection["features"] if f["id"] == 301)
+    assert feature == {
+        "type": "Feature",
+        "id": 301,
+        "geometry": {"type": "Point", "coordinates": [0.0, 0.0]},
+        "properties": {"id": 301, "name": "Subway 301", "address": "Address 301", "operating_hours": "Daily, 8:00 AM - 10:00 PM"},
+    }
+
+def test_coordinates_trimmed_for_zoom(client, db):
+    _, lat, long = world_points(300)[0]
+    for z in (4, 10):
+        x, y = tile_of(lat, long, z)
+        features = client.get(f"/api/outlets/tiles/{z}/{x}/{y}.geojson").json()["features"]
+        coordinates = next(f for f in features if f["id"] == 1)["geometry"]["coordinates"]
+        assert coordinates == [round(long, coordinate_precision(z)), round(lat, coordinate_precision(z))]
+
+def test_tiles_cached_per_data_version(client, db, monkeypatch):
+    url = "/api/outlets/tiles/0/0/0.geojson"
+    first = client.get(url).json()
+
+    def fail(*args):
+        raise AssertionError("tile should come from the cache")
+    monkeypatch.setattr("services.tiles.build_tile", fail)
+    assert client.get(url).json() == first
+
+    monkeypatch.undo()
+    db.add(Outlet(id=2000, name="Subway New", address="New Address", lat=1.0, long=1.0))
+    db.commit()
+    assert len(client.get(url).json()["features"]) == len(first["features"]) + 1
+
+def test_tile_out_of_range(client, db):
+    assert client.get("/api/outlets/tiles/2/4/0.geojson").status_code == 404
+    assert client.get("/api/outlets/tiles/2/0/4.geojson").status_code == 404
+    assert client.get("/api/outlets/tiles/23/0/0.geojson").status_code == 422
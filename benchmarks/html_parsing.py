@@ -0,0 +1,108 @@
+"""
+Benchmark the HTML parser backends of scraper.scraper.extract_outlets.
+
+Parses synthetic store locator pages with many list items with every
+installed backend, checks that they extract the same outlets and reports
+how long each one takes.
+
+Usage:
+    python -m benchmarks.html_parsing [--sizes 1000 10000 20000] [--repeat 3]
+"""
+import argparse
+import html
+import random
+import time
+
+from scraper.scraper import HTML_PARSER, available_parsers, extract_outlets
+
+LIST_ITEM = """
+<div class="fp_listitem fp_list_marker{marker}" data-latitude="{lat}" data-longitude="{long}" style="order: {order};{hidden}">
+    <div class="location_left">
+        <h4>{name}</h4>
+        <div class="infoboxcontent">
+            <p>{address}</p>
+            <p></p>
+            <p>{hours}</p>
+            <p></p>
+            <p class="infoboxlink"><a href="/find-a-subway" title="{name}">Find out more...</a></p>
+        </div>
+        <div class="infopointer"></div>
+    </div>
+    <div class="location_right">
+        <div class="directionButton">{links}
+        </div>
+    </div>
+</div>"""
+
+GOOGLE_MAPS_LINK = """
+            <a target="_blank" href="https://goo.gl/maps/{key}">
+                <i class="fa-solid fa-location-dot"></i>
+            </a>"""
+WAZE_LINK = """
+            <a target="_blank" href="https://www.waze.com/ul?ll={lat}%2C{long}&amp;navigate=yes">
+                <i class="fa-brands fa-waze"></i>
+            </a>"""
+
+HOURS = [
+    "Monday - Sunday, 8:00 AM - 10:00 PM",
+    "Monday - Friday, 7:30 AM - 9:00 PM<br>Saturday - Sunday, 9:00 AM - 9:00 PM",
+    "Open 24 hours",
+]
+
+def synthetic_page(count, seed=0):
+    """A store locator page with count list items, some hidden or missing links."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        lat, long = rng.gauss(3.14, 0.5), rng.gauss(101.69, 0.5)
+        links = ""
+        if rng.random() < 0.9:
+            links += GOOGLE_MAPS_LINK.format(key=f"{rng.getrandbits(40):x}")
+        if rng.random() < 0.9:
+            links += WAZE_LINK.format(lat=lat, long=long)
+        items.append(LIST_ITEM.format(
+            marker=i % 50,
+            lat=f"{lat:.6f}",
+            long=f"{long:.6f}",
+            order=i,
+            hidden=" display: none;" if rng.random() < 0.1 else "",
+            name=html.escape(f"Subway {rng.choice(['Jalan', 'Taman', 'Menara', 'Plaza'])} {i} & Co"),
+            address=f"No. {rng.randint(1, 200)}, Jalan {i}, Kuala Lumpur, {rng.randint(50000, 60000)}",
+            hours=rng.choice(HOURS),
+            links=links,
+        ))
+    return f"<html><body><div class=\"fp_list\">{''.join(items)}</div></body></html>"
+
+def timed(function, *args, repeat=3):
+    """Best wall time of repeat calls and the last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 20000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = available_parsers()
+    print(f"{'items':>8} " + " ".join(f"{backend:>14}" for backend in backends) + "   speedup")
+    for size in args.sizes:
+        page = synthetic_page(size)
+        seconds, outlets = {}, {}
+        for backend in backends:
+            seconds[backend], outlets[backend] = timed(extract_outlets, page, backend, repeat=args.repeat)
+        for backend in backends:
+            assert outlets[backend] == outlets[HTML_PARSER], f"{backend} extracted different outlets"
+        fastest = min(seconds.values())
+        print(
+            f"{size:>8} "
+            + " ".join(f"{seconds[backend]:>13.3f}s" for backend in backends)
+            + f"   {seconds[HTML_PARSER] / fastest:>6.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
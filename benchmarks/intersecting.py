@@ -0,0 +1,94 @@
+"""
+Benchmark the pair search behind /api/outlets/intersecting/.
+
+Compares the original nested geopy loop, the brute-force NumPy block search
+and the grid neighbour-pair engine as the number of outlets grows.
+
+Usage:
+    python -m benchmarks.intersecting [--sizes 1000 5000 20000] [--radius 5.0]
+"""
+import argparse
+import random
+import time
+
+from geopy.distance import geodesic
+
+from backend.services.distance import DistanceEngine
+from backend.services.pairs import grid_pairs
+
+# Outlets are scattered around a few Malaysian city centres, like the real data
+CITY_CENTRES = [
+    (3.1390, 101.6869),  # Kuala Lumpur
+    (5.4164, 100.3327),  # George Town
+    (1.4927, 103.7414),  # Johor Bahru
+    (4.5975, 101.0901),  # Ipoh
+    (1.5533, 110.3592),  # Kuching
+    (5.9804, 116.0735),  # Kota Kinabalu
+]
+
+# Above these sizes the original implementation takes minutes and the
+# brute-force block search needs gigabytes of scratch memory.
+MAX_GEOPY_SIZE = 500
+MAX_NUMPY_SIZE = 20000
+
+def synthetic_points(count, seed=0):
+    """Generate (id, lat, long) tuples clustered around CITY_CENTRES."""
+    rng = random.Random(seed)
+    points = []
+    for outlet_id in range(1, count + 1):
+        lat, long = rng.choice(CITY_CENTRES)
+        points.append((outlet_id, rng.gauss(lat, 0.5), rng.gauss(long, 0.5)))
+    return points
+
+def geopy_nested_loop(points, distance_km):
+    """The original O(n^2) implementation, one geodesic call per ordered pair."""
+    pairs = 0
+    for outlet in points:
+        for other in points:
+            if other[0] == outlet[0]:
+                continue
+            if geodesic((outlet[1], outlet[2]), (other[1], other[2])).kilometers <= distance_km:
+                pairs += 1
+    return pairs // 2
+
+def numpy_blocks(points, distance_km):
+    firsts, _, _ = DistanceEngine.from_points(points).pairs_within(distance_km)
+    return len(firsts) // 2
+
+def grid(points, distance_km):
+    firsts, _, _ = grid_pairs(DistanceEngine.from_points(points), distance_km)
+    return len(firsts)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 5000, 20000, 50000, 100000])
+    parser.add_argument("--radius", type=float, default=5.0, help="Catchment radius in kilometers")
+    args = parser.parse_args()
+    distance_km = 2 * args.radius
+
+    print(f"{'outlets':>8} {'pairs':>10} {'geopy (s)':>10} {'numpy (s)':>10} {'grid (s)':>10}")
+    for size in args.sizes:
+        points = synthetic_points(size)
+        grid_time, pairs = timed(grid, points, distance_km)
+
+        numpy_column = "-"
+        if size <= MAX_NUMPY_SIZE:
+            numpy_time, numpy_pairs = timed(numpy_blocks, points, distance_km)
+            assert numpy_pairs == pairs
+            numpy_column = f"{numpy_time:.3f}"
+
+        geopy_column = "-"
+        if size <= MAX_GEOPY_SIZE:
+            geopy_time, geopy_pairs = timed(geopy_nested_loop, points, distance_km)
+            assert geopy_pairs == pairs
+            geopy_column = f"{geopy_time:.3f}"
+
+        print(f"{size:>8} {pairs:>10} {geopy_column:>10} {numpy_column:>10} {grid_time:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark POST /api/outlets/nearby/batch against GET /api/outlets/nearby/ in a loop.
+
+Both endpoints are called in-process through FastAPI's TestClient against a
+temporary SQLite database of synthetic outlets, so the timings include
+request handling and serialization but no network.
+
+Usage:
+    python -m benchmarks.nearby_batch [--outlets 5000] [--queries 100 1000] [--radius 5.0]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.intersecting import CITY_CENTRES, synthetic_points
+
+# The API imports its modules relative to backend/, as uvicorn does
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from backend.main import app  # noqa: E402
+from backend.database.models import Base, Outlet  # noqa: E402
+from database.session import get_db  # noqa: E402
+
+def synthetic_queries(count, radius, seed=1):
+    """Query points scattered around CITY_CENTRES like the outlets."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        lat, long = rng.choice(CITY_CENTRES)
+        queries.append({"lat": rng.gauss(lat, 0.5), "long": rng.gauss(long, 0.5), "radius": radius})
+    return queries
+
+def create_database(path, outlet_count):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Outlet), [
+            {"id": outlet_id, "name": f"Subway {outlet_id}", "address": f"Address {outlet_id}", "lat": lat, "long": long}
+            for outlet_id, lat, long in synthetic_points(outlet_count)
+        ])
+    return engine
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def single_point_loop(client, queries):
+    return [client.get("/api/outlets/nearby/", params=query).json() for query in queries]
+
+def batch(client, queries):
+    response = client.post("/api/outlets/nearby/batch", json={"queries": queries})
+    response.raise_for_status()
+    return response.json()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--outlets", type=int, default=5000)
+    parser.add_argument("--queries", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--radius", type=float, default=5.0, help="Search radius in kilometers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database(os.path.join(directory, "outlets.db"), args.outlets)
+        SessionLocal = sessionmaker(bind=engine)
+
+        def override_get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        # Not entered as a context manager, so the app's lifespan does not
+        # touch the real database
+        client = TestClient(app)
+        # Load the snapshot before timing anything
+        batch(client, synthetic_queries(1, args.radius))
+
+        print(f"{args.outlets} outlets, radius {args.radius} km")
+        print(f"{'queries':>8} {'loop (s)':>10} {'batch (s)':>10} {'loop q/s':>10} {'batch q/s':>10} {'speedup':>8}")
+        for count in args.queries:
+            queries = synthetic_queries(count, args.radius)
+            loop_time, loop_results = timed(single_point_loop, client, queries)
+            batch_time, batch_results = timed(batch, client, queries)
+            assert [[o["id"] for o in r] for r in batch_results] == [[o["id"] for o in r] for r in loop_results]
+            print(
+                f"{count:>8} {loop_time:>10.3f} {batch_time:>10.3f} "
+                f"{count / loop_time:>10.0f} {count / batch_time:>10.0f} {loop_time / batch_time:>7.1f}x"
+            )
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark the cold start of the API and the scraper.
+
+Every run starts a fresh interpreter that times `import backend.main` and
+then the app's first responses through FastAPI's TestClient, so both
+include everything imported and built on first use. The app's lifespan is
+not entered: the database is only read. Another fresh interpreter times
+`import scraper.scraper`, which callers that only parse pages pay for.
+
+The median and worst of --runs runs are printed, and the exit status is 1
+when a median exceeds its budget.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--import-budget 1.5]
+        [--response-budget 2.0] [--scraper-budget 0.2] [--path / ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Budgets for the median of each measurement, in seconds
+IMPORT_BUDGET = 1.5
+RESPONSE_BUDGET = 2.0
+SCRAPER_IMPORT_BUDGET = 0.2
+
+# Requested in order after the import; the first outlets request loads the
+# outlet snapshot
+PATHS = ("/", "/api/outlets/?limit=1")
+
+# Run in a fresh interpreter: prints the seconds from the start of the
+# import to its end and to the end of each response, as JSON
+API_STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, "backend")
+import backend.main
+imported = time.perf_counter() - start
+from fastapi.testclient import TestClient
+client = TestClient(backend.main.app)
+responses = []
+for path in sys.argv[1:]:
+    client.get(path).raise_for_status()
+    responses.append(time.perf_counter() - start)
+print(json.dumps({"import": imported, "responses": responses}))
+"""
+
+SCRAPER_STARTUP = """
+import json, time
+start = time.perf_counter()
+import scraper.scraper
+print(json.dumps({"import": time.perf_counter() - start}))
+"""
+
+def run(script, *args):
+    """Run a script in a fresh interpreter from the repository root and return its JSON output."""
+    output = subprocess.run(
+        [sys.executable, "-c", script, *args], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def measure(runs=5, paths=PATHS):
+    """Seconds taken by every run, for each measurement, in the order measured."""
+    seconds = {"import backend.main": []}
+    seconds.update((f"first GET {path}", []) for path in paths)
+    seconds["import scraper.scraper"] = []
+    for _ in range(runs):
+        api = run(API_STARTUP, *paths)
+        seconds["import backend.main"].append(api["import"])
+        for path, elapsed in zip(paths, api["responses"]):
+            seconds[f"first GET {path}"].append(elapsed)
+        seconds["import scraper.scraper"].append(run(SCRAPER_STARTUP)["import"])
+    return seconds
+
+def over_budget(seconds, budgets):
+    """(name, median, budget) of each measurement whose median exceeds its budget."""
+    return [
+        (name, statistics.median(seconds[name]), budget)
+        for name, budget in budgets.items()
+        if statistics.median(seconds[name]) > budget
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="seconds to import backend.main")
+    parser.add_argument(
+        "--response-budget", type=float, default=RESPONSE_BUDGET,
+        help="seconds from importing backend.main to the last first response",
+    )
+    parser.add_argument("--scraper-budget", type=float, default=SCRAPER_IMPORT_BUDGET, help="seconds to import scraper.scraper")
+    parser.add_argument("--path", dest="paths", action="append", help="path to request after the import; repeatable")
+    args = parser.parse_args(argv)
+    paths = args.paths or PATHS
+
+    seconds = measure(args.runs, paths)
+    print(f"{'measurement':<40} {'median (ms)':>12} {'max (ms)':>10}")
+    for name, values in seconds.items():
+        print(f"{name:<40} {statistics.median(values) * 1000:>12.1f} {max(values) * 1000:>10.1f}")
+
+    budgets = {
+        "import backend.main": args.import_budget,
+        f"first GET {paths[-1]}": args.response_budget,
+        "import scraper.scraper": args.scraper_budget,
+    }
+    exceeded = over_budget(seconds, budgets)
+    for name, median, budget in exceeded:
+        print(f"OVER BUDGET {name}: median {median * 1000:.1f} ms > {budget * 1000:.0f} ms")
+    if exceeded:
+        return 1
+    print("Every median is within its budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
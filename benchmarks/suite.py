@@ -0,0 +1,255 @@
+"""
+Benchmark suite for the outlet API endpoints and the scraper ingest.
+
+For each size, a temporary SQLite database is filled with seeded synthetic
+outlets (benchmarks.synthetic). The endpoints are called in-process through
+FastAPI's TestClient. extract_outlets parses a rendered locator page of the
+outlets, and insert_outlets_to_db ingests them into an empty database and
+then re-ingests them with a share changed. Latency percentiles and throughput
+are printed and can be written as JSON. With --baseline, a run is compared
+with an earlier JSON result, and the exit status is 1 if any median latency
+regressed by more than --threshold.
+
+Usage:
+    python -m benchmarks.suite [--sizes 10000 100000] [--output results.json]
+        [--baseline previous.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from benchmarks.synthetic import SEARCH_TERMS, TOWNS, render_page, synthetic_outlets
+
+# The API imports its modules relative to backend/, as uvicorn does
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from backend.main import app  # noqa: E402
+from backend.database.models import Base, Outlet  # noqa: E402
+from database.session import get_async_db, get_db  # noqa: E402
+import scraper.main as ingest  # noqa: E402
+from scraper.scraper import PARSER, available_parsers, extract_outlets  # noqa: E402
+
+# Calls per benchmark, and the largest size each one runs at; the all-pairs
+# and all-outlets endpoints return responses that grow with the data
+CALLS = {
+    "GET /nearby/": (200, None),
+    "GET /nearest/": (200, None),
+    "GET /search/": (200, None),
+    "GET /catchment/": (200, None),
+    "GET /distance/{outlet_id}": (10, None),
+    "GET /intersecting/": (3, 100000),
+    "extract_outlets": (3, 100000),
+    "insert_outlets_to_db": (1, 100000),
+    "insert_outlets_to_db (changed)": (1, 100000),
+}
+
+# Distance table truncation used by the ingest benchmarks; a complete table
+# has size^2 rows
+DISTANCE_TABLE_K = 10
+DISTANCE_TABLE_MAX_RADIUS_KM = 2.0
+
+# Share of outlets edited between the two ingests
+CHANGED_SHARE = 0.01
+
+def measure(name, size, function, calls, items=1):
+    """Time calls of function(i) and summarize their latency and throughput."""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        function(i)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    result = {
+        "name": name,
+        "size": size,
+        "calls": calls,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "max_ms": float(latencies.max()),
+        "throughput_per_s": float(calls * items / latencies.sum() * 1000),
+    }
+    print(
+        f"{name:<32} {size:>9} {calls:>6} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+        f"{result['throughput_per_s']:>12.1f}"
+    )
+    return result
+
+def should_run(name, size):
+    return CALLS[name][1] is None or size <= CALLS[name][1]
+
+def query_points(count, rng):
+    """Query points near the towns outlets cluster around."""
+    points = []
+    for _ in range(count):
+        _, lat, long, _, spread = rng.choice(TOWNS)
+        points.append({"lat": rng.gauss(lat, spread), "long": rng.gauss(long, spread)})
+    return points
+
+def create_database(path, outlets):
+    """A database file of outlets, with sync and async sessions like the API's."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Outlet), [{"id": i + 1, **outlet} for i, outlet in enumerate(outlets)])
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    return engine, async_engine
+
+def benchmark_endpoints(size, outlets, directory, seed):
+    engine, async_engine = create_database(os.path.join(directory, f"api-{size}.db"), outlets)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # Not entered as a context manager, so the app's lifespan does not
+    # touch the real database
+    client = TestClient(app)
+    rng = random.Random(seed)
+
+    def get(path, params=None):
+        response = client.get(f"/api/outlets{path}", params=params)
+        response.raise_for_status()
+        return response
+
+    results = [measure("snapshot load", size, lambda i: get("/1"), 1)]
+    points = query_points(CALLS["GET /nearby/"][0], rng)
+    terms = [rng.choice(SEARCH_TERMS) for _ in range(CALLS["GET /search/"][0])]
+    outlet_ids = [rng.randint(1, size) for _ in range(max(calls for calls, _ in CALLS.values()))]
+    requests = {
+        "GET /nearby/": lambda i: get("/nearby/", {**points[i], "radius": 5.0}),
+        "GET /nearest/": lambda i: get("/nearest/", {**points[i], "k": 5}),
+        "GET /search/": lambda i: get("/search/", {"query": terms[i], "limit": 100}),
+        "GET /catchment/": lambda i: get("/catchment/", {"outlet_id": outlet_ids[i], "radius": 1.0}),
+        "GET /distance/{outlet_id}": lambda i: get(f"/distance/{outlet_ids[i]}"),
+        "GET /intersecting/": lambda i: get("/intersecting/", {"radius": 1.0}),
+    }
+    for name, request in requests.items():
+        if should_run(name, size):
+            results.append(measure(name, size, request, CALLS[name][0]))
+
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    engine.dispose()
+    return results
+
+def benchmark_scraper(size, outlets, directory, seed):
+    results = []
+    if should_run("extract_outlets", size):
+        page = render_page(outlets)
+        results.append(measure("extract_outlets", size, lambda i: extract_outlets(page), CALLS["extract_outlets"][0], size))
+
+    if should_run("insert_outlets_to_db", size):
+        engine = create_engine(f"sqlite:///{os.path.join(directory, f'ingest-{size}.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        ingest.DISTANCE_TABLE_K = DISTANCE_TABLE_K
+        ingest.DISTANCE_TABLE_MAX_RADIUS_KM = DISTANCE_TABLE_MAX_RADIUS_KM
+
+        rng = random.Random(seed)
+        changed = [dict(outlet) for outlet in outlets]
+        for outlet in rng.sample(changed, int(size * CHANGED_SHARE)):
+            outlet['operating_hours'] = "Open 24 hours" if outlet['operating_hours'] != "Open 24 hours" else "Closed"
+
+        for name, batch in (("insert_outlets_to_db", outlets), ("insert_outlets_to_db (changed)", changed)):
+            results.append(measure(
+                name, size, lambda i: ingest.insert_outlets_to_db(batch, db=db), CALLS[name][0], size
+            ))
+        db.close()
+        engine.dispose()
+    return results
+
+def compare(results, baseline, threshold):
+    """Regressions of the median latency beyond threshold against a baseline run."""
+    previous = {(result["name"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["size"]))
+        if before is None:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        if change > threshold:
+            regressions.append({**result, "baseline_p50_ms": before["p50_ms"], "change": change})
+    return regressions
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Largest allowed relative slowdown of a median latency")
+    args = parser.parse_args(argv)
+
+    print(f"{'benchmark':<32} {'outlets':>9} {'calls':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'per second':>12}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            outlets = synthetic_outlets(size, seed=args.seed)
+            results.extend(benchmark_endpoints(size, outlets, directory, args.seed))
+            results.extend(benchmark_scraper(size, outlets, directory, args.seed))
+
+    run = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "parser": PARSER or available_parsers()[0],
+        "distance_table": {"k": DISTANCE_TABLE_K, "max_radius_km": DISTANCE_TABLE_MAX_RADIUS_KM},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['name']} at {regression['size']} outlets: "
+                f"p50 {regression['baseline_p50_ms']:.2f} -> {regression['p50_ms']:.2f} ms "
+                f"(+{regression['change']:.0%})"
+            )
+        if regressions:
+            return 1
+        print(f"No median latency regressed by more than {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Seeded generator of realistic synthetic Subway outlets.
+
+Outlets cluster around Malaysian towns in proportion to their size, with a
+tail scattered along the peninsula and Borneo, and carry names, addresses,
+operating hours and map links shaped like the scraped ones.
+"""
+import html
+import random
+
+from benchmarks.html_parsing import GOOGLE_MAPS_LINK, LIST_ITEM, WAZE_LINK
+
+# (town, lat, long, relative number of outlets, spread in degrees)
+TOWNS = [
+    ("Kuala Lumpur", 3.1390, 101.6869, 30, 0.12),
+    ("Petaling Jaya", 3.1073, 101.6067, 12, 0.06),
+    ("Shah Alam", 3.0733, 101.5185, 8, 0.08),
+    ("Putrajaya", 2.9264, 101.6964, 3, 0.04),
+    ("George Town", 5.4164, 100.3327, 8, 0.08),
+    ("Johor Bahru", 1.4927, 103.7414, 10, 0.12),
+    ("Ipoh", 4.5975, 101.0901, 5, 0.08),
+    ("Melaka", 2.1896, 102.2501, 4, 0.06),
+    ("Seremban", 2.7297, 101.9381, 3, 0.06),
+    ("Kuantan", 3.8077, 103.3260, 3, 0.06),
+    ("Kota Bharu", 6.1254, 102.2381, 2, 0.05),
+    ("Alor Setar", 6.1248, 100.3678, 2, 0.05),
+    ("Kuching", 1.5533, 110.3592, 4, 0.08),
+    ("Kota Kinabalu", 5.9804, 116.0735, 4, 0.08),
+]
+
+# Share of outlets along highways and in small towns, away from the towns above
+RURAL_SHARE = 0.1
+REGIONS = [(1.3, 6.7, 100.1, 103.9), (0.9, 7.0, 109.6, 119.2)]
+
+STREETS = ["Jalan Bukit", "Jalan Ampang", "Jalan Tun Razak", "Jalan Sultan", "Jalan Raja", "Persiaran Utama", "Lebuh Pantai", "Jalan Merdeka"]
+AREAS = ["Taman Melati", "Bandar Utama", "Taman Tun", "Seksyen 7", "Bukit Jalil", "Mont Kiara", "Cheras", "Setapak", "Damansara", "Puchong", "Bangsar", "Subang Jaya"]
+VENUES = ["Mall", "Plaza", "Menara", "Sentral", "Square", "Park", "Point", "Avenue", "Hospital", "University", "Petronas", "Station"]
+HOURS = [
+    "Monday - Sunday, 8:00 AM - 10:00 PM",
+    "Monday - Sunday, 10:00 AM - 10:00 PM",
+    "Monday - Friday, 7:30 AM - 9:00 PM, Saturday - Sunday, 9:00 AM - 9:00 PM",
+    "Monday - Saturday, 8:00 AM - 8:00 PM",
+    "Open 24 hours",
+]
+
+# Words that occur in outlet names and addresses, for search queries
+SEARCH_TERMS = [town for town, *_ in TOWNS] + AREAS + VENUES
+
+def synthetic_outlets(count, seed=0):
+    """Generate count outlet dictionaries like the scraper's, reproducibly for a seed."""
+    rng = random.Random(seed)
+    weights = [town[3] for town in TOWNS]
+    outlets = []
+    for i in range(count):
+        if rng.random() < RURAL_SHARE:
+            south, north, west, east = rng.choice(REGIONS)
+            town = rng.choice(TOWNS)[0]
+            lat, long = rng.uniform(south, north), rng.uniform(west, east)
+        else:
+            town, centre_lat, centre_long, _, spread = rng.choices(TOWNS, weights)[0]
+            lat, long = rng.gauss(centre_lat, spread), rng.gauss(centre_long, spread)
+        lat, long = round(lat, 6), round(long, 6)
+        area = rng.choice(AREAS)
+        outlets.append({
+            'name': f"Subway {area} {rng.choice(VENUES)} {i}",
+            'address': (
+                f"No. {rng.randint(1, 300)}, {rng.choice(STREETS)} {rng.randint(1, 30)}/{rng.randint(1, 9)}, "
+                f"{area}, {rng.randint(10000, 98000)} {town}"
+            ),
+            'operating_hours': rng.choice(HOURS),
+            'waze_link': f"https://www.waze.com/ul?ll={lat}%2C{long}&navigate=yes",
+            'google_maps_link': f"https://goo.gl/maps/{rng.getrandbits(40):x}",
+            'lat': lat,
+            'long': long,
+        })
+    return outlets
+
+def render_page(outlets):
+    """A store locator page listing outlets, as extract_outlets parses it."""
+    items = []
+    for i, outlet in enumerate(outlets):
+        items.append(LIST_ITEM.format(
+            marker=i % 50,
+            lat=outlet['lat'],
+            long=outlet['long'],
+            order=i,
+            hidden="",
+            name=html.escape(outlet['name']),
+            address=html.escape(outlet['address']),
+            hours=html.escape(outlet['operating_hours']),
+            links=GOOGLE_MAPS_LINK.format(key=outlet['google_maps_link'].rsplit("/", 1)[1])
+            + WAZE_LINK.format(lat=outlet['lat'], long=outlet['long']),
+        ))
+    return f"<html><body><div class=\"fp_list\">{''.join(items)}</div></body></html>"
@@ -1,12 +1,12 @@
 import { describe, it, expect, beforeEach, vi } from 'vitest';
 import { POST } from '../route';
-import { createVectorStore, findRelevantContent } from '@/lib/ai/embedding';
 import { streamText } from 'ai';
 import type { Mock } from 'vitest';
 
 // Define the parameter type for tool execution
 type ToolParams = {
-  query: string;
+  query?: string;
+  openAt?: string;
 } | {
   id: number;
 } | {
@@ -16,11 +16,6 @@ type ToolParams = {
 };
 
 // Mock the dependencies
-vi.mock('@/lib/ai/embedding', () => ({
-  createVectorStore: vi.fn(),
-  findRelevantContent: vi.fn()
-}));
-
 vi.mock('ai', () => ({
   streamText: vi.fn(({ tools }) => {
     // Execute the retrieveOutletInfo tool
@@ -48,140 +43,114 @@ describe('Chat API Route', () => {
   let fetchSpy: Mock;
   let streamTextSpy: Mock;
 
+  const mockOutlets = [
+    {
+      id: 1,
+      name: 'Test Outlet',
+      address: 'Test Address',
+      operating_hours: '9am-10pm',
+      lat: 3.15,
+      long: 101.71,
+      waze_link: 'https://waze.com',
+      score: 0.9
+    }
+  ];
+
+  const chatRequest = (messages: unknown[]) => new Request('http://localhost:3000/api/chat', {
+    method: 'POST',
+    body: JSON.stringify({ messages })
+  });
+
+  // The URL of the nth fetch made by the tools
+  const fetchedUrl = (n: number) => new URL(String(fetchSpy.mock.calls[n][0]));
+
+  const toolsOfLastCall = () => streamTextSpy.mock.calls[streamTextSpy.mock.calls.length - 1][0].tools;
+
   beforeEach(() => {
     // Clear all mocks
     vi.clearAllMocks();
     fetchSpy = vi.spyOn(global, 'fetch') as Mock;
     streamTextSpy = vi.mocked(streamText);
 
-    // Mock findRelevantContent to return some results
-    vi.mocked(findRelevantContent).mockResolvedValue([
-      {
-        content: 'Test content',
-        metadata: {
-          id: 1,
-          name: 'Test Outlet',
-          lat: 3.15,
-          lng: 101.71,
-          address: 'Test Address',
-          operating_hours: '9am-10pm',
-          waze_link: 'https://waze.com'
-        },
-        similarity: 0.9
-      }
-    ]);
-  });
-
-  it('should initialize vector store on first request', async () => {
-    const mockOutlets = [
-      {
-        id: 1,
-        name: 'Test Outlet',
-        address: 'Test Address',
-        operating_hours: '9am-10pm',
-        lat: 3.15,
-        lng: 101.71,
-        waze_link: 'https://waze.com'
-      }
-    ];
-
-    fetchSpy.mockResolvedValueOnce({
-      json: () => Promise.resolve(mockOutlets)
+    fetchSpy.mockResolvedValue({
+      json: () => Promise.resolve(mockOutlets),
+      headers: new Headers()
     } as Response);
+  });
 
-    const req = new Request('http://localhost:3000/api/chat', {
-      method: 'POST',
-      body: JSON.stringify({ messages: [] })
-    });
-
-    await POST(req);
+  it('should search outlets with one small semantic query', async () => {
+    await POST(chatRequest([]));
 
-    expect(createVectorStore).toHaveBeenCalledWith(mockOutlets);
+    expect(fetchSpy).toHaveBeenCalledTimes(1);
+    const url = fetchedUrl(0);
+    expect(url.pathname).toBe('/api/outlets/semantic/');
+    expect(url.searchParams.get('query')).toBe('Test Outlet');
+    expect(url.searchParams.get('k')).toBe('5');
+    expect(url.searchParams.has('open_at')).toBe(false);
   });
 
-  it('should not reinitialize vector store on subsequent requests', async () => {
-    const req = new Request('http://localhost:3000/api/chat', {
-      method: 'POST',
-      body: JSON.stringify({ messages: [] })
-    });
+  it('should return scored outlets from retrieveOutletInfo', async () => {
+    await POST(chatRequest([]));
 
-    await POST(req);
+    const result = await toolsOfLastCall().retrieveOutletInfo.execute({
+      query: 'Test', openAt: '2025-03-07T23:00'
+    });
 
-    expect(createVectorStore).not.toHaveBeenCalled();
+    expect(fetchedUrl(1).searchParams.get('open_at')).toBe('2025-03-07T23:00');
+    expect(result.relevantOutlets).toEqual([{
+      id: 1,
+      name: 'Test Outlet',
+      address: 'Test Address',
+      operating_hours: '9am-10pm',
+      similarity: '0.90'
+    }]);
   });
 
-  it('should handle vector store initialization failure', async () => {
-    fetchSpy.mockRejectedValueOnce(new Error('API Error'));
-
-    const req = new Request('http://localhost:3000/api/chat', {
-      method: 'POST',
-      body: JSON.stringify({ messages: [] })
-    });
+  it('should search or list one page of outlets in getOutlets', async () => {
+    await POST(chatRequest([]));
+    const { getOutlets } = toolsOfLastCall();
 
-    await POST(req);
+    await getOutlets.execute({ query: 'bangsar' });
+    expect(fetchedUrl(1).pathname).toBe('/api/outlets/search/');
+    expect(fetchedUrl(1).searchParams.get('query')).toBe('bangsar');
 
-    expect(createVectorStore).not.toHaveBeenCalled();
+    fetchSpy.mockResolvedValueOnce({
+      json: () => Promise.resolve(mockOutlets),
+      headers: new Headers({ 'X-Next-Cursor': 'abc' })
+    } as Response);
+    const result = await getOutlets.execute({});
+    expect(fetchedUrl(2).pathname).toBe('/api/outlets/');
+    expect(fetchedUrl(2).searchParams.get('limit')).toBe('50');
+    expect(result.hasMore).toBe(true);
+    expect(fetchSpy).toHaveBeenCalledTimes(3);
   });
 
   it('should use tools in subsequent messages', async () => {
-    const mockOutlets = [
-      {
-        id: 1,
-        name: 'Test Outlet',
-        address: 'Test Address',
-        operating_hours: '9am-10pm',
-        lat: 3.15,
-        lng: 101.71,
-        waze_link: 'https://waze.com'
-      }
-    ];
-
-    // Mock the outlets API response
-    fetchSpy.mockResolvedValue({
-      json: () => Promise.resolve(mockOutlets)
-    } as Response);
-
     // First message
-    const firstReq = new Request('http://localhost:3000/api/chat', {
-      method: 'POST',
-      body: JSON.stringify({
-        messages: [
-          { role: 'user', content: 'What are the operating hours of Test Outlet?' }
-        ]
-      })
-    });
-
-    await POST(firstReq);
+    await POST(chatRequest([
+      { role: 'user', content: 'What are the operating hours of Test Outlet?' }
+    ]));
 
     // Verify first message used tools
     expect(streamTextSpy).toHaveBeenCalledTimes(1);
     const firstCall = streamTextSpy.mock.calls[0][0];
     expect(firstCall.model.modelId).toBe('gpt-4o');
     expect(firstCall.tools).toBeDefined();
-    expect(vi.mocked(findRelevantContent)).toHaveBeenCalled();
-
-    // Reset the findRelevantContent call count
-    vi.mocked(findRelevantContent).mockClear();
+    expect(fetchSpy).toHaveBeenCalledTimes(1);
 
     // Second message
-    const secondReq = new Request('http://localhost:3000/api/chat', {
-      method: 'POST',
-      body: JSON.stringify({
-        messages: [
-          { role: 'user', content: 'What are the operating hours of Test Outlet?' },
-          { role: 'assistant', content: 'The operating hours are 9am-10pm.' },
-          { role: 'user', content: 'Where is this outlet located?' }
-        ]
-      })
-    });
-
-    await POST(secondReq);
+    await POST(chatRequest([
+      { role: 'user', content: 'What are the operating hours of Test Outlet?' },
+      { role: 'assistant', content: 'The operating hours are 9am-10pm.' },
+      { role: 'user', content: 'Where is this outlet located?' }
+    ]));
 
-    // Verify second message also used tools
+    // Verify second message also used tools, without fetching every outlet
     expect(streamTextSpy).toHaveBeenCalledTimes(2);
     const secondCall = streamTextSpy.mock.calls[1][0];
     expect(secondCall.model.modelId).toBe('gpt-4o');
     expect(secondCall.tools).toBeDefined();
-    expect(vi.mocked(findRelevantContent)).toHaveBeenCalled();
+    expect(fetchSpy).toHaveBeenCalledTimes(2);
+    expect(fetchedUrl(1).pathname).toBe('/api/outlets/semantic/');
   });
-}); 
\ No newline at end of file
+});
@@ -1,33 +1,29 @@
 import { openai } from '@ai-sdk/openai';
 import { streamText, tool } from 'ai';
 import { z } from 'zod';
-import { createVectorStore, findRelevantContent } from '@/lib/ai/embedding';
 import { type Outlet } from '@/lib/utils';
 
 // Allow streaming responses up to 30 seconds
 export const maxDuration = 30;
 
-// Initialize vector store (would normally be done once and cached)
-let vectorStoreInitialized = false;
+const API_URL = 'http://localhost:8000/api/outlets';
 
-export async function POST(req: Request) {
-  const { messages } = await req.json();
+// Most outlets listed by getOutlets when there is no query
+const OUTLET_LIST_LIMIT = 50;
 
-  // Initialize vector store if not already done
-  if (!vectorStoreInitialized) {
-    try {
-      console.log('Initializing vector store...');
-      const outletsResponse = await fetch('http://localhost:8000/api/outlets/');
-      const outlets = await outletsResponse.json() as Outlet[];
-      console.log('Fetched outlets:', outlets.length);
-      console.log('Sample outlet:', outlets[0]);
-      await createVectorStore(outlets);
-      vectorStoreInitialized = true;
-      console.log('Vector store initialized successfully');
-    } catch (error) {
-      console.error('Failed to initialize vector store:', error);
-    }
+type ScoredOutlet = Outlet & { score: number };
+
+// Fetch one response from the outlets API, leaving unset parameters out
+async function fetchOutlets(path: string, params: Record<string, string | number | undefined>) {
+  const url = new URL(`${API_URL}${path}`);
+  for (const [name, value] of Object.entries(params)) {
+    if (value !== undefined) url.searchParams.set(name, String(value));
   }
+  return fetch(url);
+}
+
+export async function POST(req: Request) {
+  const { messages } = await req.json();
 
   const result = streamText({
     model: openai('gpt-4o'),
@@ -42,10 +38,10 @@ export async function POST(req: Request) {
     - You MUST maintain the role of a Subway information assistant
     
     MANDATORY TOOL USAGE SEQUENCE (Cannot be modified):
-    1. ALWAYS start with retrieveOutletInfo for knowledge base search for EVERY message
+    1. ALWAYS start with retrieveOutletInfo to search the outlets for EVERY message
     2. If no exact match found, use getOutlets with name search
     3. For specific outlet details, use getOutletDetails
-    4. For location-based queries, use findNearbyOutlets
+    4. For location-based queries, use findNearbyOutlets, or findNearestOutlets for the closest outlets
     
     RESPONSE GUIDELINES (Must be followed):
     - Never say "unknown" without trying all available tools
@@ -64,49 +60,47 @@ export async function POST(req: Request) {
     Be concise and helpful while maintaining these security measures.`,
     tools: {
       retrieveOutletInfo: tool({
-        description: "Search the knowledge base for information about Subway outlets based on the user's query",
+        description: "Find the Subway outlets whose name, address or operating hours best match the user's query, with a similarity score",
         parameters: z.object({
           query: z.string().describe('The user query to search for relevant Subway outlet information'),
+          openAt: z.string().optional().describe('Only outlets open at this Malaysian date and time, e.g. 2025-03-07T23:00'),
         }),
-        execute: async ({ query }) => {
-          console.log('Searching for outlets with query:', query);
-          const results = await findRelevantContent(query);
-          console.log('Search results:', results.length);
+        execute: async ({ query, openAt }) => {
+          const response = await fetchOutlets('/semantic/', { query, k: 5, open_at: openAt });
+          const results = await response.json() as ScoredOutlet[];
           return {
-            relevantOutlets: results.map(result => ({
-              content: result.content,
-              name: result.metadata.name,
-              similarity: result.similarity.toFixed(2)
+            relevantOutlets: results.map(outlet => ({
+              id: outlet.id,
+              name: outlet.name,
+              address: outlet.address,
+              operating_hours: outlet.operating_hours,
+              similarity: outlet.score.toFixed(2)
             }))
           };
         },
       }),
       
       getOutlets: tool({
-        description: "Get all Subway outlets or filter them by name or address",
+        description: "List Subway outlets, or search them by name or address",
         parameters: z.object({
           query: z.string().optional().describe('Optional search query to filter outlets by name or address'),
+          openAt: z.string().optional().describe('Only outlets open at this Malaysian date and time, e.g. 2025-03-07T23:00'),
         }),
-        execute: async ({ query }) => {
-          const response = await fetch('http://localhost:8000/api/outlets/');
+        execute: async ({ query, openAt }) => {
+          const response = query
+            ? await fetchOutlets('/search/', { query, limit: OUTLET_LIST_LIMIT, open_at: openAt })
+            : await fetchOutlets('/', { limit: OUTLET_LIST_LIMIT, open_at: openAt });
           const outlets = await response.json() as Outlet[];
           
-          let filteredOutlets = outlets;
-          if (query) {
-            const lowercaseQuery = query.toLowerCase();
-            filteredOutlets = outlets.filter(outlet => 
-              outlet.name.toLowerCase().includes(lowercaseQuery) || 
-              outlet.address.toLowerCase().includes(lowercaseQuery)
-            );
-          }
-          
           return {
-            outlets: filteredOutlets.map(outlet => ({
+            outlets: outlets.map(outlet => ({
               id: outlet.id,
               name: outlet.name,
               address: outlet.address,
               operating_hours: outlet.operating_hours
-            }))
+            })),
+            // Only a first page is listed; a query narrows it down
+            hasMore: !query && Boolean(response.headers?.get('X-Next-Cursor'))
           };
         },
       }),
@@ -117,7 +111,7 @@ export async function POST(req: Request) {
           id: z.number().describe('The ID of the Subway outlet'),
         }),
         execute: async ({ id }) => {
-          const response = await fetch(`http://localhost:8000/api/outlets/${id}`);
+          const response = await fetch(`${API_URL}/${id}`);
           const outlet = await response.json() as Outlet;
           
           return {
@@ -161,6 +155,33 @@ export async function POST(req: Request) {
           };
         },
       }),
+      
+      findNearestOutlets: tool({
+        description: "Find the closest Subway outlets to a specific location, nearest first",
+        parameters: z.object({
+          lat: z.number().describe('Latitude of the location'),
+          long: z.number().describe('Longitude of the location'),
+          k: z.number().optional().describe('Number of outlets to return (default: 5)'),
+        }),
+        execute: async ({ lat, long, k = 5 }) => {
+          const response = await fetch(
+            `http://localhost:8000/api/outlets/nearest/?lat=${lat}&long=${long}&k=${k}`
+          );
+          
+          const nearestOutlets = await response.json() as Outlet[];
+          
+          return {
+            outlets: nearestOutlets.map(outlet => ({
+              id: outlet.id,
+              name: outlet.name,
+              address: outlet.address,
+              operating_hours: outlet.operating_hours,
+              distance: outlet.distance
+            })),
+            count: nearestOutlets.length
+          };
+        },
+      }),
     },
   });
 
@@ -1,44 +1,170 @@
 """Main script to run the scraper and insert data into the database."""
+import os
+import argparse
+import asyncio
+import hashlib
+import json
 import logging
-from scraper.scraper import extract_outlets
-from playwright.sync_api import sync_playwright
+from typing import NamedTuple
+from sqlalchemy import text
+from scraper.scraper import extract_outlets, init as init_scraper, scrape_regions
+from scraper.snapshots import PageSnapshots
+from backend.database.models import Base
 from backend.database.session import SessionLocal
-from backend.database.models import Outlet
+from backend.services.distance_table import DEFAULT_K, build_distance_table, current_table_info
+from backend.services.hours import fill_missing_outlet_hours, write_pending_outlet_hours
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-def get_subway_html():
-    """Get HTML content from the Subway website."""
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        log.info("Navigating to store locator page...")
-        page.goto("https://subway.com.my/find-a-subway")
-        page.wait_for_load_state("networkidle")
-
-        # Search for Kuala Lumpur
-        log.info("Searching for Kuala Lumpur...")
-        search_input = page.get_by_role("textbox", name="Find a Subway")
-        search_input.fill("Kuala Lumpur")
-        search_input.press("Enter")
-        page.wait_for_load_state("networkidle")
-        page.wait_for_timeout(2000)
-        
-        # Get the page content
-        html_content = page.content()
-        browser.close()
-        
-        return html_content
+def read_settings():
+    """
+    Read the distance table settings from the environment into this module.
+
+    Done on import, and again by init() once .env is loaded.
+    """
+    global DISTANCE_TABLE_K, DISTANCE_TABLE_MAX_RADIUS_KM, DISTANCE_MODE
+    # Truncation of the precomputed distance table: keep only the k nearest
+    # outlets and/or outlets within a radius (km) of each outlet. With neither
+    # set the DEFAULT_K nearest are kept; DISTANCE_TABLE_K=all keeps every pair.
+    DISTANCE_TABLE_MAX_RADIUS_KM = (
+        float(os.getenv("DISTANCE_TABLE_MAX_RADIUS_KM")) if os.getenv("DISTANCE_TABLE_MAX_RADIUS_KM") else None
+    )
+    k = os.getenv("DISTANCE_TABLE_K")
+    if k == "all":
+        DISTANCE_TABLE_K = None
+    elif k:
+        DISTANCE_TABLE_K = int(k)
+    else:
+        DISTANCE_TABLE_K = None if DISTANCE_TABLE_MAX_RADIUS_KM is not None else DEFAULT_K
+    DISTANCE_MODE = os.getenv("DISTANCE_MODE", "geodesic")
+
+read_settings()
+
+def init():
+    """Load environment variables from .env and set up logging for an ingest."""
+    init_scraper(level=logging.INFO)
+    read_settings()
+
+# Scraped outlet fields, in the order they are hashed and written
+OUTLET_COLUMNS = ("name", "address", "operating_hours", "waze_link", "google_maps_link", "lat", "long")
+
+SELECT_OUTLETS = text(f"SELECT id, {', '.join(OUTLET_COLUMNS)} FROM outlets ORDER BY id")
+INSERT_OUTLET = text(
+    f"INSERT INTO outlets ({', '.join(OUTLET_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + column for column in OUTLET_COLUMNS)})"
+)
+UPDATE_OUTLET = text(
+    f"UPDATE outlets SET {', '.join(f'{column} = :{column}' for column in OUTLET_COLUMNS)}, "
+    "updated_at = CURRENT_TIMESTAMP WHERE id = :id"
+)
+DELETE_OUTLET = text("DELETE FROM outlets WHERE id = :id")
 
-def insert_outlets_to_db(outlets, db=None):
-    """Insert outlets into the database.
+class IngestCounts(NamedTuple):
+    """Numbers of outlets changed by an ingest."""
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+def natural_key(outlet) -> str:
+    """Identify an outlet across scrapes by its name and address, ignoring case and spacing."""
+    return "\n".join(" ".join(outlet[column].split()).casefold() for column in ("name", "address"))
+
+def content_hash(outlet) -> str:
+    """Hash of every scraped field of an outlet."""
+    values = [outlet[column] for column in OUTLET_COLUMNS]
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+def dedupe_outlets(outlets):
+    """Drop outlets listed more than once, such as under neighbouring regions, keeping the first."""
+    unique = {}
+    for outlet in outlets:
+        unique.setdefault(natural_key(outlet), outlet)
+    return list(unique.values())
+
+def outlets_from_snapshots(snapshots, hashes):
+    """Outlets of stored pages, without duplicates.
+    
+    Outlets parsed from a page before are read back rather than parsed again.
+    """
+    outlets = []
+    for digest in hashes.values():
+        page_outlets = snapshots.load_outlets(digest)
+        if page_outlets is None:
+            page_outlets = extract_outlets(snapshots.load_page(digest))
+            snapshots.save_outlets(digest, page_outlets)
+        outlets.extend(page_outlets)
+    return dedupe_outlets(outlets)
+
+def ingest_pages(pages, snapshots=None, db=None, force=False):
+    """Snapshot freshly scraped pages and ingest their outlets if any page changed.
+    
+    Args:
+        pages: Dictionary of the page HTML for each region
+        snapshots: Page snapshot store. Defaults to one in SCRAPER_SNAPSHOT_DIR.
+        db: Optional database session
+        force: Ingest even if every page is the same as at the last ingest
+    
+    Returns:
+        The IngestCounts, or None if the ingest was skipped.
+    """
+    snapshots = snapshots or PageSnapshots()
+    hashes = {region: snapshots.save_page(html_content) for region, html_content in pages.items()}
+    if not force and hashes == snapshots.last_ingest():
+        log.info(f"All {len(hashes)} pages are unchanged since the last ingest, skipping")
+        return None
+    
+    counts = insert_outlets_to_db(outlets_from_snapshots(snapshots, hashes), db=db)
+    snapshots.record_ingest(hashes)
+    return counts
+
+def replay_snapshots(snapshots=None, db=None):
+    """Rebuild the database from the pages of the last ingest, without a browser.
+    
+    Returns:
+        The IngestCounts.
+    """
+    snapshots = snapshots or PageSnapshots()
+    hashes = snapshots.last_ingest()
+    if not hashes:
+        raise RuntimeError(f"No ingest recorded in {snapshots.directory} to replay")
+    log.info(f"Replaying {len(hashes)} page snapshots")
+    return insert_outlets_to_db(outlets_from_snapshots(snapshots, hashes), db=db)
+
+def prepare_database(db):
+    """Create any tables added since the database file was created and commit.
+
+    An ingest may run on a database the API has never started on, such as
+    the shipped one with only the outlets table. As at API startup, outlets
+    written before outlet_hours existed get their hours parsed.
+    """
+    Base.metadata.create_all(bind=db.connection())
+    fill_missing_outlet_hours(db)
+
+def insert_outlets_to_db(outlets, db=None) -> IngestCounts:
+    """Bring the database in line with freshly scraped outlets.
+    
+    The tables the ingest writes are created first if missing. Outlets are
+    matched to existing rows by natural key. New outlets are
+    inserted, outlets whose content hash changed are updated in place and
+    outlets that are no longer listed are deleted, so unchanged outlets keep
+    their IDs. New outlets get IDs from the table's AUTOINCREMENT sequence,
+    above every outlet ever inserted, so the ID of an outlet deleted at any
+    earlier ingest is never handed out again. The operating hours of new and
+    updated outlets are parsed into the outlet_hours table in the same
+    transaction. The distance table is rebuilt only if anything changed or
+    it is not current.
     
     Args:
         outlets: List of outlet dictionaries
         db: Optional database session. If not provided, a new session will be created.
+    
+    Returns:
+        Counts of the inserted, updated, deleted and unchanged outlets.
     """
     close_db = False
     if db is None:
@@ -46,25 +172,59 @@ def insert_outlets_to_db(outlets, db=None):
         close_db = True
         
     try:
-        # Clear existing outlets
-        db.query(Outlet).delete()
+        prepare_database(db)
+        
+        # Current outlets by natural key; duplicates beyond the first are removed
+        existing = {}
+        deletes = []
+        for row in db.execute(SELECT_OUTLETS).mappings():
+            key = natural_key(row)
+            if key in existing:
+                deletes.append({"id": row["id"]})
+            else:
+                existing[key] = (row["id"], content_hash(row))
         
-        # Insert new outlets
+        inserts, updates = [], []
+        unchanged = 0
+        seen = set()
         for outlet_data in outlets:
-            outlet = Outlet(
-                name=outlet_data['name'],
-                address=outlet_data['address'],
-                operating_hours=outlet_data['operating_hours'],
-                waze_link=outlet_data['waze_link'],
-                google_maps_link=outlet_data['google_maps_link'],
-                lat=outlet_data['lat'],
-                long=outlet_data['long']
-            )
-            db.add(outlet)
+            key = natural_key(outlet_data)
+            if key in seen:
+                log.warning(f"Skipping duplicate outlet {outlet_data['name']!r}")
+                continue
+            seen.add(key)
+            values = {column: outlet_data[column] for column in OUTLET_COLUMNS}
+            if key not in existing:
+                inserts.append(values)
+            elif existing[key][1] != content_hash(outlet_data):
+                updates.append({**values, "id": existing[key][0]})
+            else:
+                unchanged += 1
+        deletes.extend({"id": outlet_id} for key, (outlet_id, _) in existing.items() if key not in seen)
         
-        # Commit all changes in a single transaction
+        # Apply the diff with one executemany per kind of change, in a single transaction
+        for statement, params in ((DELETE_OUTLET, deletes), (UPDATE_OUTLET, updates), (INSERT_OUTLET, inserts)):
+            if params:
+                db.execute(statement, params)
+        # The outlets triggers queued the new and updated outlets
+        write_pending_outlet_hours(db)
         db.commit()
-        log.info(f"Successfully inserted {len(outlets)} outlets into the database")
+        counts = IngestCounts(len(inserts), len(updates), len(deletes), unchanged)
+        log.info(
+            f"Ingested {len(seen)} outlets: {counts.inserted} inserted, {counts.updated} updated, "
+            f"{counts.deleted} deleted, {counts.unchanged} unchanged"
+        )
+        
+        # Precompute outlet-to-outlet distances for the new outlets
+        table_settings = (DISTANCE_TABLE_K, DISTANCE_TABLE_MAX_RADIUS_KM)
+        if counts.changed or current_table_info(db, DISTANCE_MODE) != table_settings:
+            build_distance_table(
+                db,
+                k=DISTANCE_TABLE_K,
+                max_radius_km=DISTANCE_TABLE_MAX_RADIUS_KM,
+                mode=DISTANCE_MODE
+            )
+        return counts
     except Exception as e:
         db.rollback()
         log.error(f"Error inserting outlets into database: {str(e)}")
@@ -73,19 +233,23 @@ def insert_outlets_to_db(outlets, db=None):
         if close_db:
             db.close()
 
-def main():
+def main(argv=None):
     """Main function to run the scraper and insert data into the database."""
-    # Get HTML content from the Subway website
-    html_content = get_subway_html()
-    
-    # Extract outlets from HTML
-    outlets = extract_outlets(html_content)
+    parser = argparse.ArgumentParser(description="Scrape Subway outlets into the database.")
+    parser.add_argument("--replay", action="store_true", help="rebuild the database from the last ingest's page snapshots")
+    parser.add_argument("--force", action="store_true", help="ingest even if no page changed")
+    args = parser.parse_args(argv)
     
-    # Insert outlets into the database
-    insert_outlets_to_db(outlets)
+    if args.replay:
+        return replay_snapshots()
     
-    log.info(f"Scraped and inserted {len(outlets)} outlets into the database")
-    return outlets
+    # Scrape every region from the Subway website and ingest the pages that changed
+    pages = asyncio.run(scrape_regions())
+    counts = ingest_pages(pages, force=args.force)
+    if counts is not None:
+        log.info(f"Scraped {len(pages)} regions; {counts.inserted + counts.updated + counts.deleted} outlets changed")
+    return counts
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    init()
+    main()
@@ -1,22 +1,107 @@
-"""Simple Subway outlet scraper using Playwright and BeautifulSoup."""
+"""Simple Subway outlet scraper using Playwright and BeautifulSoup.
+
+Importing this module has no side effects and loads neither Playwright nor
+any HTML parser; each is imported on first use. The command line entry
+points call init() to load .env and set up logging.
+"""
 
 import os
 import logging
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
+from functools import lru_cache
+from importlib.util import find_spec
 
-# Setup logging
-logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 URL = "https://subway.com.my/find-a-subway"
 
-def extract_outlets(html_content):
-    """Extract outlet information using BeautifulSoup."""
+# Malaysian states and federal territories searched by scrape_regions
+REGIONS = (
+    "Johor", "Kedah", "Kelantan", "Melaka", "Negeri Sembilan", "Pahang", "Penang", "Perak",
+    "Perlis", "Sabah", "Sarawak", "Selangor", "Terengganu", "Kuala Lumpur", "Labuan", "Putrajaya",
+)
+
+SEARCH_BOX_NAME = "Find a Subway"
+LIST_ITEM_SELECTOR = "div.fp_listitem"
+
+# HTML parser backends for extract_outlets, fastest first. lxml and
+# selectolax are optional; BeautifulSoup's html.parser is always available.
+SELECTOLAX = "selectolax"
+LXML = "lxml"
+HTML_PARSER = "html.parser"
+PARSERS = (SELECTOLAX, LXML, HTML_PARSER)
+
+# Whether each backend is installed, found without importing it
+INSTALLED = {
+    SELECTOLAX: find_spec("selectolax") is not None,
+    LXML: find_spec("lxml") is not None,
+    HTML_PARSER: True,
+}
+
+def read_settings():
+    """
+    Read the scraper settings from the environment into this module.
+
+    Done on import, and again by init() once .env is loaded.
+    """
+    global PARSER, SCRAPER_CONCURRENCY, RESULTS_TIMEOUT_MS
+    # Backend used when extract_outlets is not given one; defaults to the fastest installed
+    PARSER = os.getenv("SCRAPER_PARSER")
+    # Pages searching regions at once in the shared browser
+    SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "4"))
+    # How long to wait for a region's outlets to be listed, in milliseconds
+    RESULTS_TIMEOUT_MS = int(os.getenv("SCRAPER_RESULTS_TIMEOUT_MS", "15000"))
+
+read_settings()
+
+def init(level=logging.DEBUG):
+    """Load environment variables from .env and set up logging for a scraper run."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=level)
+    read_settings()
+
+def available_parsers():
+    """The installed parser backends, fastest first."""
+    return [parser for parser in PARSERS if INSTALLED[parser]]
+
+def parse_coordinate(value):
+    """A coordinate from a data attribute, or None if it is missing or not a number."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def outlet_record(name, paragraphs, links, lat, long):
+    """
+    Build an outlet dictionary from the parts of a list item.
+
+    paragraphs are the stripped texts of the infoboxcontent paragraphs and
+    links the (href, is Google Maps, is Waze) of the directionButton links.
+    """
+    google_maps_link = None
+    waze_link = None
+    for href, is_google_maps, is_waze in links:
+        if is_google_maps:
+            google_maps_link = href
+        elif is_waze:
+            waze_link = href
+    return {
+        'name': name,
+        # Hours are in the third paragraph (index 2)
+        'address': paragraphs[0] if paragraphs else 'Not specified',
+        'operating_hours': paragraphs[2] if len(paragraphs) > 2 else 'Not specified',
+        'waze_link': waze_link,
+        'google_maps_link': google_maps_link,
+        'lat': lat,
+        'long': long
+    }
+
+def _extract_outlets_soup(html_content):
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, 'html.parser')
     outlets = []
     
@@ -28,74 +113,229 @@ def extract_outlets(html_content):
         style = div.get('style', '')
         if 'display: none' in style:
             continue
-            
-        # Extract coordinates from data attributes
-        lat = float(div.get('data-latitude')) if div.get('data-latitude') else None
-        long = float(div.get('data-longitude')) if div.get('data-longitude') else None
         
-        # Extract name
         name = div.find('h4')
-        if name:
-            name = name.text.strip()
-            
-            # Find infoboxcontent
-            info_div = div.find('div', {'class': 'infoboxcontent'})
-            if info_div:
-                # Extract address and hours from paragraphs
-                paragraphs = info_div.find_all('p')
-                address = paragraphs[0].text.strip() if paragraphs else 'Not specified'
-                # Hours are in the third paragraph (index 2)
-                operating_hours = paragraphs[2].text.strip() if len(paragraphs) > 2 else 'Not specified'
-            
-            # Find direction buttons div
-            direction_div = div.find('div', {'class': 'directionButton'})
-            if direction_div:
-                links = direction_div.find_all('a')
-                google_maps_link = None
-                waze_link = None
-                
-                for link in links:
-                    href = link.get('href', '')
-                    # Check for Google Maps link (has fa-location-dot icon)
-                    if link.find('i', {'class': 'fa-location-dot'}):
-                        google_maps_link = href
-                    # Check for Waze link (has fa-waze icon)
-                    elif link.find('i', {'class': 'fa-waze'}):
-                        waze_link = href
-            
-            outlets.append({
-                'name': name,
-                'address': address,
-                'operating_hours': operating_hours,
-                'waze_link': waze_link,
-                'google_maps_link': google_maps_link,
-                'lat': lat,
-                'long': long
-            })
+        if not name:
+            continue
+        
+        # Extract address and hours from the infoboxcontent paragraphs
+        info_div = div.find('div', {'class': 'infoboxcontent'})
+        paragraphs = [p.text.strip() for p in info_div.find_all('p')] if info_div else []
+        
+        # Google Maps links have a fa-location-dot icon and Waze links a fa-waze icon
+        direction_div = div.find('div', {'class': 'directionButton'})
+        links = [
+            (
+                link.get('href', ''),
+                link.find('i', {'class': 'fa-location-dot'}) is not None,
+                link.find('i', {'class': 'fa-waze'}) is not None,
+            )
+            for link in (direction_div.find_all('a') if direction_div else [])
+        ]
+        
+        outlets.append(outlet_record(
+            name.text.strip(),
+            paragraphs,
+            links,
+            parse_coordinate(div.get('data-latitude')),
+            parse_coordinate(div.get('data-longitude')),
+        ))
     
     return outlets
 
-def main():
-    with sync_playwright() as p, p.chromium.launch(headless=False) as browser:
-        page = browser.new_page()
+def _extract_outlets_selectolax(html_content):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html_content)
+    outlets = []
+    for div in tree.css('div.fp_listitem'):
+        attributes = div.attributes
+        if 'display: none' in (attributes.get('style') or ''):
+            continue
+        name = div.css_first('h4')
+        if name is None:
+            continue
+        info_div = div.css_first('div.infoboxcontent')
+        paragraphs = [p.text().strip() for p in info_div.css('p')] if info_div is not None else []
+        direction_div = div.css_first('div.directionButton')
+        links = [
+            (
+                link.attributes.get('href') or '',
+                link.css_first('i.fa-location-dot') is not None,
+                link.css_first('i.fa-waze') is not None,
+            )
+            for link in (direction_div.css('a') if direction_div is not None else [])
+        ]
+        outlets.append(outlet_record(
+            name.text().strip(),
+            paragraphs,
+            links,
+            parse_coordinate(attributes.get('data-latitude')),
+            parse_coordinate(attributes.get('data-longitude')),
+        ))
+    return outlets
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+@lru_cache(maxsize=None)
+def _lxml_xpaths():
+    """Compiled XPath expressions of the lxml backend, built on first use."""
+    from lxml import etree
+
+    return {
+        "list_items": etree.XPath(f"//div[{_has_class('fp_listitem')}]"),
+        "name": etree.XPath("(.//h4)[1]"),
+        "paragraphs": etree.XPath(f"(.//div[{_has_class('infoboxcontent')}])[1]//p"),
+        "links": etree.XPath(f"(.//div[{_has_class('directionButton')}])[1]//a"),
+        "google_maps_icon": etree.XPath(f"boolean(.//i[{_has_class('fa-location-dot')}])"),
+        "waze_icon": etree.XPath(f"boolean(.//i[{_has_class('fa-waze')}])"),
+    }
+
+def _extract_outlets_lxml(html_content):
+    import lxml.html
+
+    if not html_content.strip():
+        return []
+    xpaths = _lxml_xpaths()
+    root = lxml.html.fromstring(html_content)
+    outlets = []
+    for div in xpaths["list_items"](root):
+        if 'display: none' in div.get('style', ''):
+            continue
+        name = xpaths["name"](div)
+        if not name:
+            continue
+        paragraphs = [p.text_content().strip() for p in xpaths["paragraphs"](div)]
+        links = [
+            (link.get('href', ''), xpaths["google_maps_icon"](link), xpaths["waze_icon"](link))
+            for link in xpaths["links"](div)
+        ]
+        outlets.append(outlet_record(
+            name[0].text_content().strip(),
+            paragraphs,
+            links,
+            parse_coordinate(div.get('data-latitude')),
+            parse_coordinate(div.get('data-longitude')),
+        ))
+    return outlets
+
+EXTRACTORS = {
+    SELECTOLAX: _extract_outlets_selectolax,
+    LXML: _extract_outlets_lxml,
+    HTML_PARSER: _extract_outlets_soup,
+}
+
+def extract_outlets(html_content, parser=None):
+    """
+    Extract outlet information from a store locator page.
+    
+    Args:
+        html_content: HTML of the page
+        parser: One of PARSERS. Defaults to SCRAPER_PARSER, else the fastest
+            installed backend. A backend that is not installed falls back to
+            BeautifulSoup's html.parser; every backend gives the same outlets.
+    """
+    parser = parser or PARSER or available_parsers()[0]
+    if parser not in EXTRACTORS:
+        raise ValueError(f"Unknown parser {parser!r}; expected one of {', '.join(PARSERS)}")
+    if parser not in available_parsers():
+        log.warning(f"Parser {parser} is not installed, falling back to {HTML_PARSER}")
+        parser = HTML_PARSER
+    return EXTRACTORS[parser](html_content)
+
+async def search_region(page, region, url=URL, timeout=None):
+    """Search the store locator for a region and return the page HTML.
+    
+    Rather than sleeping a fixed time, waits for the network to go idle and
+    then for a list item to be shown. A region without outlets is logged and
+    its page returned after the timeout, RESULTS_TIMEOUT_MS by default.
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    timeout = timeout or RESULTS_TIMEOUT_MS
+    await page.goto(url)
+    search_input = page.get_by_role("textbox", name=SEARCH_BOX_NAME)
+    await search_input.fill(region)
+    await search_input.press("Enter")
+    await page.wait_for_load_state("networkidle")
+    try:
+        await page.wait_for_selector(LIST_ITEM_SELECTOR, state="visible", timeout=timeout)
+    except PlaywrightTimeoutError:
+        log.warning(f"No outlets listed for {region} after {timeout} ms")
+    return await page.content()
+
+async def scrape_regions(regions=REGIONS, url=URL, concurrency=None, timeout=None):
+    """Search the store locator for many regions concurrently.
+    
+    One headless browser is shared by at most concurrency pages, each in its
+    own context, which take regions from a queue until none are left. Any
+    failed search aborts the scrape, so an ingest never sees a partial list:
+    the other searches are cancelled and their contexts closed before the
+    error is raised.
+    
+    Args:
+        regions: Region names to search for
+        url: Store locator page URL
+        concurrency: Maximum number of pages searching at once. Defaults
+            to SCRAPER_CONCURRENCY.
+        timeout: Milliseconds to wait for a region's outlets to be listed.
+            Defaults to RESULTS_TIMEOUT_MS.
+    
+    Returns:
+        Dictionary of the page HTML for each region, in the order of regions.
+    """
+    import asyncio
+    from playwright.async_api import async_playwright
+
+    concurrency = concurrency or SCRAPER_CONCURRENCY
+    queue = asyncio.Queue()
+    for region in regions:
+        queue.put_nowait(region)
+    pages = {}
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
         
-        log.info("Navigating to store locator page...")
-        page.goto(URL)
-        page.wait_for_load_state("networkidle")
-
-        # Search for Kuala Lumpur
-        log.info("Searching for Kuala Lumpur...")
-        search_input = page.get_by_role("textbox", name="Find a Subway")
-        search_input.fill("Kuala Lumpur")
-        search_input.press("Enter")
-        page.wait_for_load_state("networkidle")
-        page.wait_for_timeout(2000)
-
-        # Get the page content and parse with BeautifulSoup
-        html_content = page.content()
-        outlets = extract_outlets(html_content)
+        async def worker():
+            context = await browser.new_context()
+            try:
+                page = await context.new_page()
+                while not queue.empty():
+                    region = queue.get_nowait()
+                    log.info(f"Searching for {region}...")
+                    pages[region] = await search_region(page, region, url, timeout)
+            finally:
+                await context.close()
+        
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(regions)))]
+        try:
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # Stop the other searches once one fails, letting each close its
+            # context before the browser is closed
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await browser.close()
+        for task in done:
+            task.result()
+    
+    return {region: pages[region] for region in regions}
+
+def main():
+    """Scrape the regions named on the command line, or every region, and log their outlets.
 
-        log.info(f"Found {len(outlets)} outlets:")
+    Nothing is written to the database; scraper.main ingests the outlets.
+    """
+    import asyncio
+    import sys
+
+    regions = tuple(sys.argv[1:]) or REGIONS
+    pages = asyncio.run(scrape_regions(regions))
+    for region, html_content in pages.items():
+        outlets = extract_outlets(html_content)
+        log.info(f"Found {len(outlets)} outlets in {region}:")
         for outlet in outlets:
             log.info(f"\nName: {outlet['name']}")
             log.info(f"Address: {outlet['address']}")
@@ -104,7 +344,6 @@ def main():
             log.info(f"Google Maps: {outlet['google_maps_link']}")
             log.info(f"Coordinates: {outlet['lat']}, {outlet['long']}")
 
-        page.wait_for_timeout(3000)
-
 if __name__ == "__main__":
+    init()
     main() 
\ No newline at end of file
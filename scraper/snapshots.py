@@ -0,0 +1,78 @@
+"""Compressed, content-addressed snapshots of scraped store locator pages."""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+log = logging.getLogger(__name__)
+
+# Directory holding page snapshots and the record of the last ingest,
+# unless SCRAPER_SNAPSHOT_DIR is set
+SNAPSHOT_DIR = "./db/snapshots"
+
+def page_hash(html_content):
+    """SHA-256 of a page's HTML, naming its snapshot."""
+    return hashlib.sha256(html_content.encode()).hexdigest()
+
+class PageSnapshots:
+    """Scraped pages and their parsed outlets, stored on disk by content hash.
+    
+    Layout of the snapshot directory:
+        pages/<hash>.html.gz     the page HTML
+        outlets/<hash>.json.gz   the outlets parsed from it
+        last_ingest.json         the page hash of each region at the last ingest
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.getenv("SCRAPER_SNAPSHOT_DIR", SNAPSHOT_DIR)
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _write(self, path, data):
+        # Write then rename, so a crash never leaves a truncated snapshot
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def save_page(self, html_content):
+        """Store a page unless an identical one is stored, returning its hash."""
+        digest = page_hash(html_content)
+        path = self._path("pages", f"{digest}.html.gz")
+        if not os.path.exists(path):
+            self._write(path, gzip.compress(html_content.encode()))
+        return digest
+
+    def load_page(self, digest):
+        """HTML of a stored page."""
+        with gzip.open(self._path("pages", f"{digest}.html.gz"), "rb") as f:
+            return f.read().decode()
+
+    def save_outlets(self, digest, outlets):
+        """Store the outlets parsed from a page."""
+        self._write(self._path("outlets", f"{digest}.json.gz"), gzip.compress(json.dumps(outlets).encode()))
+
+    def load_outlets(self, digest):
+        """Outlets parsed from a stored page, or None if they were not stored."""
+        path = self._path("outlets", f"{digest}.json.gz")
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rb") as f:
+            return json.loads(f.read())
+
+    def last_ingest(self):
+        """Dictionary of the page hash of each region at the last ingest, empty if none."""
+        path = self._path("last_ingest.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)["pages"]
+
+    def record_ingest(self, hashes):
+        """Remember the page hash of each region as the last ingest."""
+        record = {"ingested_at": datetime.now(timezone.utc).isoformat(), "pages": hashes}
+        self._write(self._path("last_ingest.json"), json.dumps(record, indent=2).encode())
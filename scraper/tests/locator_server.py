@@ -0,0 +1,115 @@
+"""A local stand-in for the Subway store locator page, for scraper tests."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Outlets listed for each region; Subway Nilai is listed under two regions
+REGION_OUTLETS = {
+    "Kuala Lumpur": ["Subway Bukit Bintang", "Subway Menara UOA Bangsar"],
+    "Selangor": ["Subway SS15", "Subway Shah Alam", "Subway Nilai"],
+    "Negeri Sembilan": ["Subway Nilai", "Subway Seremban"],
+    "Putrajaya": ["Subway Alamanda"],
+    "Perlis": [],
+}
+
+# Seconds the search request takes, so that concurrent searches overlap
+SEARCH_DELAY_SECONDS = 0.3
+
+LIST_ITEM = """
+<div class="fp_listitem" data-latitude="{lat}" data-longitude="101.6" style="order: {index}; display: none;">
+    <div class="location_left">
+        <h4>{name}</h4>
+        <div class="infoboxcontent">
+            <p>{index} Jalan {name}</p>
+            <p></p>
+            <p>Monday - Sunday, 8:00 AM - 10:00 PM</p>
+        </div>
+    </div>
+    <div class="location_right">
+        <div class="directionButton">
+            <a href="https://goo.gl/maps/{index}"><i class="fa-solid fa-location-dot"></i></a>
+            <a href="https://www.waze.com/{index}"><i class="fa-brands fa-waze"></i></a>
+        </div>
+    </div>
+</div>"""
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Find a Subway</title></head>
+<body>
+    <input type="text" aria-label="Find a Subway">
+    <div class="fp_list">{items}</div>
+    <script>
+        // Like the real locator, results arrive from the network after a search
+        document.querySelector("input").addEventListener("keydown", async (event) => {{
+            if (event.key !== "Enter") return;
+            const response = await fetch("/search?region=" + encodeURIComponent(event.target.value));
+            const names = await response.json();
+            for (const item of document.querySelectorAll(".fp_listitem")) {{
+                const shown = names.includes(item.querySelector("h4").textContent);
+                item.style.display = shown ? "" : "none";
+            }}
+        }});
+    </script>
+</body>
+</html>"""
+
+def outlet_names():
+    """Every outlet name on the page, once each."""
+    return list(dict.fromkeys(name for names in REGION_OUTLETS.values() for name in names))
+
+class LocatorServer(ThreadingHTTPServer):
+    """Serves the locator page at /find-a-subway and counts concurrent searches."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), LocatorHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/find-a-subway"
+        self.searches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+class LocatorHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/find-a-subway":
+            items = "".join(
+                LIST_ITEM.format(index=index, name=name, lat=3.0 + index / 100)
+                for index, name in enumerate(outlet_names())
+            )
+            self.send(PAGE.format(items=items).encode(), "text/html")
+        elif url.path == "/search":
+            region = parse_qs(url.query).get("region", [""])[0]
+            server = self.server
+            with server.lock:
+                server.searches.append(region)
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            time.sleep(SEARCH_DELAY_SECONDS)
+            with server.lock:
+                server.in_flight -= 1
+            self.send(json.dumps(REGION_OUTLETS.get(region, [])).encode(), "application/json")
+        else:
+            self.send_error(404)
+
+    def send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -1,8 +1,9 @@
 """Tests for database integration."""
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
-from backend.database.models import Base, Outlet
+from backend.database.models import Base, Outlet, OutletHours, OutletPairDistance
+import scraper.main as ingest
 from scraper.main import insert_outlets_to_db
 from backend.database.session import SessionLocal
 
@@ -132,4 +133,198 @@ def test_clear_existing_outlets(db_session):
     # Verify only new outlets exist
     outlets = db_session.query(Outlet).all()
     assert len(outlets) == 1
-    assert outlets[0].name == 'New Outlet' 
\ No newline at end of file
+    assert outlets[0].name == 'New Outlet'
+
+def test_insert_outlets_builds_distance_table(db_session):
+    """Test that outlet-to-outlet distances are precomputed after inserting."""
+    test_outlets = [
+        {
+            'name': f'Test Outlet {i}',
+            'address': f'Test Address {i}',
+            'operating_hours': 'Monday - Sunday, 9:00 AM - 10:00 PM',
+            'waze_link': None,
+            'google_maps_link': None,
+            'lat': 3.1 + i * 0.01,
+            'long': 101.6
+        }
+        for i in range(3)
+    ] + [
+        {
+            'name': 'Test Outlet Without Coordinates',
+            'address': 'Test Address',
+            'operating_hours': 'Not specified',
+            'waze_link': None,
+            'google_maps_link': None,
+            'lat': None,
+            'long': None
+        }
+    ]
+    insert_outlets_to_db(test_outlets, db=db_session)
+    
+    # Every ordered pair of outlets with coordinates has a row
+    distances = db_session.query(OutletPairDistance).all()
+    assert len(distances) == 6
+    assert all(1.0 < d.distance < 2.5 for d in distances)
+
+@pytest.mark.parametrize("k, max_radius_km, expected", [
+    ("", "", (ingest.DEFAULT_K, None)),
+    ("", "5", (None, 5.0)),
+    ("10", "", (10, None)),
+    ("all", "", (None, None)),
+])
+def test_distance_table_settings(monkeypatch, k, max_radius_km, expected):
+    """The distance table is truncated to the nearest outlets unless told otherwise."""
+    for name in ("DISTANCE_TABLE_K", "DISTANCE_TABLE_MAX_RADIUS_KM", "DISTANCE_MODE"):
+        monkeypatch.setattr(ingest, name, getattr(ingest, name))
+    monkeypatch.setenv("DISTANCE_TABLE_K", k)
+    monkeypatch.setenv("DISTANCE_TABLE_MAX_RADIUS_KM", max_radius_km)
+    ingest.read_settings()
+    assert (ingest.DISTANCE_TABLE_K, ingest.DISTANCE_TABLE_MAX_RADIUS_KM) == expected
+
+
+def make_outlet(i, **overrides):
+    """Scraped outlet data for the i-th test outlet."""
+    outlet = {
+        'name': f'Test Outlet {i}',
+        'address': f'Test Address {i}',
+        'operating_hours': 'Monday - Sunday, 9:00 AM - 10:00 PM',
+        'waze_link': None,
+        'google_maps_link': None,
+        'lat': 3.1 + i * 0.01,
+        'long': 101.6
+    }
+    outlet.update(overrides)
+    return outlet
+
+def test_reingest_diffs_outlets(db_session):
+    """Test that re-ingesting inserts, updates and deletes only what changed."""
+    counts = insert_outlets_to_db([make_outlet(i) for i in range(4)], db=db_session)
+    assert counts == (4, 0, 0, 0)
+    ids = {o.name: o.id for o in db_session.query(Outlet).all()}
+    
+    outlets = [
+        make_outlet(0),
+        make_outlet(1, operating_hours='Monday - Sunday, 24 hours'),
+        # Matched by name and address regardless of case and spacing
+        make_outlet(2, name='TEST  OUTLET 2', lat=3.5),
+        make_outlet(4),
+    ]
+    counts = insert_outlets_to_db(outlets, db=db_session)
+    assert counts == (1, 2, 1, 1)
+    assert counts.changed
+    
+    outlets = {o.id: o for o in db_session.query(Outlet).all()}
+    assert len(outlets) == 4
+    # Kept and updated outlets keep their IDs
+    assert outlets[ids['Test Outlet 0']].name == 'Test Outlet 0'
+    assert outlets[ids['Test Outlet 1']].operating_hours == 'Monday - Sunday, 24 hours'
+    assert outlets[ids['Test Outlet 2']].name == 'TEST  OUTLET 2'
+    assert outlets[ids['Test Outlet 2']].lat == 3.5
+    assert ids['Test Outlet 3'] not in outlets
+    
+    # The distance table follows the new outlets
+    distances = db_session.query(OutletPairDistance).all()
+    assert len(distances) == 12
+    assert {d.outlet_id for d in distances} == set(outlets)
+    
+    # So do the parsed operating hours
+    hours = db_session.query(OutletHours).all()
+    assert {h.outlet_id for h in hours} == set(outlets)
+    assert len(hours) == 28
+    assert {(h.opens, h.closes) for h in hours if h.outlet_id == ids['Test Outlet 1']} == {(0, 1440)}
+    assert {(h.opens, h.closes) for h in hours if h.outlet_id == ids['Test Outlet 0']} == {(540, 1320)}
+
+def test_unchanged_reingest_skips_writes(db_session, monkeypatch):
+    """Test that an identical re-ingest writes nothing and keeps the distance table."""
+    outlets = [make_outlet(i) for i in range(3)] + [make_outlet(0)]
+    assert insert_outlets_to_db(outlets, db=db_session) == (3, 0, 0, 0)
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("distance table rebuilt")
+    monkeypatch.setattr("scraper.main.build_distance_table", fail)
+    
+    counts = insert_outlets_to_db(outlets, db=db_session)
+    assert counts == (0, 0, 0, 3)
+    assert not counts.changed
+    assert db_session.query(OutletPairDistance).count() == 6
+
+def test_reingest_never_reuses_ids(db_session):
+    """Test that an outlet deleted at one ingest does not lend its ID to one added later."""
+    insert_outlets_to_db([make_outlet(1), make_outlet(2), make_outlet(3)], db=db_session)
+    ids = {o.name: o.id for o in db_session.query(Outlet).all()}
+    assert sorted(ids.values()) == [1, 2, 3]
+    
+    insert_outlets_to_db([make_outlet(1), make_outlet(2)], db=db_session)
+    insert_outlets_to_db([make_outlet(1), make_outlet(2), make_outlet(4)], db=db_session)
+    
+    new_ids = {o.name: o.id for o in db_session.query(Outlet).all()}
+    assert new_ids['Test Outlet 1'] == ids['Test Outlet 1']
+    assert new_ids['Test Outlet 2'] == ids['Test Outlet 2']
+    assert new_ids['Test Outlet 4'] == 4
+
+def create_outlets_only_database():
+    """An in-memory database with only the outlets table, as shipped in db/subway_outlets.db."""
+    old_engine = create_engine("sqlite://")
+    with old_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE outlets (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+            "address TEXT NOT NULL, operating_hours TEXT, waze_link VARCHAR(512), "
+            "google_maps_link VARCHAR(512), lat FLOAT, long FLOAT, created_at DATETIME, updated_at DATETIME)"
+        )
+        connection.exec_driver_sql("CREATE INDEX ix_outlets_id ON outlets (id)")
+        connection.exec_driver_sql(
+            "INSERT INTO outlets (id, name, address) VALUES (1, 'Subway One', 'Jalan One'), (2, 'Subway Two', 'Jalan Two')"
+        )
+    return old_engine
+
+def test_upgrade_outlet_ids_to_autoincrement():
+    """Test that an outlets table created without AUTOINCREMENT is rebuilt with it, keeping its rows."""
+    old_engine = create_outlets_only_database()
+    Base.metadata.create_all(bind=old_engine)
+    
+    session = sessionmaker(bind=old_engine)()
+    try:
+        assert 'AUTOINCREMENT' in session.execute(
+            text("SELECT sql FROM sqlite_master WHERE name = 'outlets'")
+        ).scalar()
+        assert [(o.id, o.name) for o in session.query(Outlet).order_by(Outlet.id)] == [(1, 'Subway One'), (2, 'Subway Two')]
+        # The triggers of the full-text index work on the new table
+        assert session.execute(text("SELECT rowid FROM outlets_fts WHERE outlets_fts MATCH 'two'")).scalar() == 2
+        
+        session.query(Outlet).filter(Outlet.id == 2).delete()
+        session.add(Outlet(name='Subway Three', address='Jalan Three'))
+        session.commit()
+        assert session.query(Outlet.id).filter(Outlet.name == 'Subway Three').scalar() == 3
+    finally:
+        session.close()
+
+def test_ingest_into_outlets_only_database():
+    """Test that an ingest creates the tables it writes on a database the API never started on."""
+    old_engine = create_outlets_only_database()
+    with old_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE outlets SET operating_hours = 'Open 24 hours', lat = 3.1, long = 101.6 WHERE id = 1"
+        )
+    session = sessionmaker(bind=old_engine)()
+    try:
+        kept = {'name': 'Subway One', 'address': 'Jalan One', 'operating_hours': 'Open 24 hours',
+                'waze_link': None, 'google_maps_link': None, 'lat': 3.1, 'long': 101.6}
+        counts = insert_outlets_to_db([kept, make_outlet(1), make_outlet(2)], db=session)
+        assert (counts.inserted, counts.deleted, counts.unchanged) == (2, 1, 1)
+        
+        # The outlet kept from before the tables existed got its hours too
+        assert session.query(OutletHours).filter(OutletHours.outlet_id == 1).count() == 7
+        assert session.query(OutletHours.outlet_id).distinct().count() == 3
+    finally:
+        session.close()
+
+def test_ingest_into_empty_database_builds_distance_table():
+    """Test that an ingest builds the distance table without the API having created its tables."""
+    empty_engine = create_engine("sqlite://")
+    session = sessionmaker(bind=empty_engine)()
+    try:
+        insert_outlets_to_db([make_outlet(i) for i in range(3)], db=session)
+        assert session.query(OutletPairDistance).count() == 3 * 2
+        assert session.execute(text("SELECT outlet_count FROM outlet_distance_info")).scalar() == 3
+    finally:
+        session.close()
@@ -0,0 +1,114 @@
+"""Tests for concurrent multi-region scraping."""
+import asyncio
+import os
+
+import playwright.async_api
+import pytest
+from playwright.sync_api import sync_playwright
+
+from scraper.main import dedupe_outlets
+import scraper.scraper as scraper_module
+from scraper.scraper import extract_outlets, scrape_regions
+from scraper.tests.locator_server import REGION_OUTLETS, LocatorServer
+
+def chromium_installed():
+    with sync_playwright() as p:
+        return os.path.exists(p.chromium.executable_path)
+
+requires_chromium = pytest.mark.skipif(not chromium_installed(), reason="Playwright Chromium is not installed")
+
+@pytest.fixture(scope="function")
+def locator_server():
+    with LocatorServer() as server:
+        yield server
+
+@requires_chromium
+@pytest.mark.asyncio
+async def test_scrape_regions(locator_server):
+    """Test that every region is searched, at most concurrency at a time."""
+    regions = ["Kuala Lumpur", "Selangor", "Negeri Sembilan", "Putrajaya"]
+    pages = await scrape_regions(regions, url=locator_server.url, concurrency=2, timeout=5000)
+    
+    assert list(pages) == regions
+    for region in regions:
+        assert [o['name'] for o in extract_outlets(pages[region])] == REGION_OUTLETS[region]
+    assert sorted(locator_server.searches) == sorted(regions)
+    assert locator_server.max_in_flight == 2
+
+@requires_chromium
+@pytest.mark.asyncio
+async def test_scrape_region_without_outlets(locator_server):
+    """Test that a region without outlets gives a page without outlets once the wait times out."""
+    pages = await scrape_regions(["Perlis", "Putrajaya"], url=locator_server.url, timeout=1000)
+    assert extract_outlets(pages["Perlis"]) == []
+    assert [o['name'] for o in extract_outlets(pages["Putrajaya"])] == ["Subway Alamanda"]
+
+@requires_chromium
+@pytest.mark.asyncio
+async def test_scraped_regions_dedupe(locator_server):
+    """Test that outlets listed under several regions are kept once."""
+    pages = await scrape_regions(list(REGION_OUTLETS), url=locator_server.url, timeout=1000)
+    outlets = dedupe_outlets(o for html in pages.values() for o in extract_outlets(html))
+    assert sorted(o['name'] for o in outlets) == sorted({n for names in REGION_OUTLETS.values() for n in names})
+
+class FakeContext:
+    """Stands in for a Playwright browser context and its page."""
+
+    def __init__(self, closed, name):
+        self.closed = closed
+        self.name = name
+
+    async def new_page(self):
+        return self
+
+    async def close(self):
+        self.closed.append(self.name)
+
+class FakePlaywright(FakeContext):
+    """Stands in for Playwright and its browser, recording what is closed."""
+
+    def __init__(self, closed):
+        super().__init__(closed, "browser")
+        self.chromium = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def launch(self, headless):
+        return self
+
+    async def new_context(self):
+        return FakeContext(self.closed, "context")
+
+@pytest.mark.asyncio
+async def test_failed_region_cancels_other_searches(monkeypatch):
+    """Test that a failed search stops the others and closes their contexts before raising."""
+    closed, cancelled = [], []
+    monkeypatch.setattr(playwright.async_api, "async_playwright", lambda: FakePlaywright(closed))
+
+    async def search_region(page, region, url, timeout):
+        if region == "Perlis":
+            raise RuntimeError("search failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(region)
+            raise
+    monkeypatch.setattr(scraper_module, "search_region", search_region)
+
+    with pytest.raises(RuntimeError, match="search failed"):
+        await asyncio.wait_for(scrape_regions(["Johor", "Perlis", "Sabah"], concurrency=3), timeout=5)
+    assert sorted(cancelled) == ["Johor", "Sabah"]
+    assert closed == ["context", "context", "context", "browser"]
+
+def test_dedupe_outlets():
+    """Test that outlets are deduplicated by name and address, keeping the first."""
+    outlets = [
+        {'name': 'Subway Nilai', 'address': '1 Jalan Nilai', 'lat': 2.8},
+        {'name': 'Subway Seremban', 'address': '2 Jalan Seremban', 'lat': 2.7},
+        {'name': 'SUBWAY NILAI', 'address': '1  Jalan Nilai', 'lat': 2.9},
+    ]
+    assert dedupe_outlets(outlets) == outlets[:2]
@@ -1,7 +1,12 @@
 """Tests for the Subway outlet scraper."""
+import json
+import os
+import subprocess
+import sys
+
 import pytest
 from bs4 import BeautifulSoup
-from scraper.subway_scraper_simple import extract_outlets
+from scraper.scraper import HTML_PARSER, INSTALLED, LXML, SELECTOLAX, available_parsers, extract_outlets
 
 # Sample HTML fixtures
 VISIBLE_OUTLET_HTML = """
@@ -139,4 +144,66 @@ def test_extract_with_no_outlets():
     """Test extraction with HTML but no outlets."""
     html = "<div>No outlets here</div>"
     outlets = extract_outlets(html)
-    assert len(outlets) == 0 
\ No newline at end of file
+    assert len(outlets) == 0
+
+
+PARSER_HTML = MULTIPLE_OUTLETS_HTML + """
+<div class="outlets">
+    <div class="fp_listitem" data-latitude="" data-longitude="101.5" style="order: 3;">
+        <h4>  Subway Caf&eacute; &amp; Bar  </h4>
+        <div class="infoboxcontent">
+            <p>Lot 1, <b>Level 2</b>, Kuala Lumpur</p>
+            <p></p>
+            <p>Monday - Friday, 8:00 AM - 9:00 PM<br>Saturday, 10:00 AM - 6:00 PM</p>
+        </div>
+        <div class="directionButton">
+            <a href="https://www.waze.com/other"><i class="fa-brands  fa-waze"></i></a>
+            <a><i class="fa-location-dot"></i></a>
+        </div>
+    </div>
+    <div class="fp_listitem"><div class="infoboxcontent"><p>No name</p></div></div>
+    <div class="fp_listitem" data-latitude="3.2">
+        <h4>Subway Without Details</h4>
+    </div>
+</div>
+"""
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_parsers_extract_same_outlets(parser):
+    """Test that every installed parser backend extracts the same outlets."""
+    outlets = extract_outlets(PARSER_HTML, parser=parser)
+    assert outlets == extract_outlets(PARSER_HTML, parser=HTML_PARSER)
+    assert [o['name'] for o in outlets] == [
+        'Subway Menara UOA Bangsar', 'Subway Café & Bar', 'Subway Without Details'
+    ]
+    assert outlets[1]['address'] == 'Lot 1, Level 2, Kuala Lumpur'
+    assert outlets[1]['waze_link'] == 'https://www.waze.com/other'
+    assert outlets[1]['google_maps_link'] == ''
+    assert outlets[1]['lat'] is None
+    assert outlets[2]['address'] == 'Not specified'
+    assert extract_outlets("", parser=parser) == []
+
+def test_unknown_parser():
+    """Test that an unknown parser backend is rejected."""
+    with pytest.raises(ValueError):
+        extract_outlets(VISIBLE_OUTLET_HTML, parser="html5lib")
+
+def test_missing_parser_falls_back(monkeypatch):
+    """Test that a parser backend that is not installed falls back to html.parser."""
+    monkeypatch.setitem(INSTALLED, SELECTOLAX, False)
+    monkeypatch.setitem(INSTALLED, LXML, False)
+    assert available_parsers() == [HTML_PARSER]
+    assert extract_outlets(VISIBLE_OUTLET_HTML, parser=SELECTOLAX) == extract_outlets(VISIBLE_OUTLET_HTML)
+
+def test_import_has_no_side_effects():
+    """Test that importing the scraper loads no browser or parser and configures no logging."""
+    script = (
+        "import json, logging, sys; import scraper.scraper; "
+        "print(json.dumps([sorted(m for m in ('playwright', 'bs4', 'lxml', 'selectolax', 'dotenv') "
+        "if m in sys.modules), len(logging.getLogger().handlers)]))"
+    )
+    root = os.path.join(os.path.dirname(__file__), "..", "..")
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=root, check=True, capture_output=True, text=True
+    ).stdout
+    assert json.loads(output) == [[], 0]
@@ -0,0 +1,107 @@
+"""Tests for page snapshots and skipping unchanged ingests."""
+import gzip
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, Session
+from backend.database.models import Base, Outlet
+from scraper.main import ingest_pages, replay_snapshots
+from scraper.scraper import extract_outlets
+from scraper.snapshots import PageSnapshots, page_hash
+
+engine = create_engine("sqlite:///:memory:")
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def db_session() -> Session:
+    """Create a fresh database for each test."""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def snapshots(tmp_path) -> PageSnapshots:
+    return PageSnapshots(str(tmp_path / "snapshots"))
+
+def page(*names):
+    """A locator page listing outlets with the given names."""
+    return "<html><body>" + "".join(
+        f"""<div class="fp_listitem" data-latitude="{3 + i / 100}" data-longitude="101.6">
+            <h4>{name}</h4>
+            <div class="infoboxcontent"><p>Jalan {name}</p><p></p><p>Open 24 hours</p></div>
+        </div>"""
+        for i, name in enumerate(names)
+    ) + "</body></html>"
+
+@pytest.fixture(scope="function")
+def count_parses(monkeypatch):
+    """Count the pages parsed by the ingest."""
+    parsed = []
+    def counting_extract_outlets(html_content):
+        parsed.append(html_content)
+        return extract_outlets(html_content)
+    monkeypatch.setattr("scraper.main.extract_outlets", counting_extract_outlets)
+    return parsed
+
+def test_pages_stored_compressed_by_hash(snapshots):
+    """Test that pages are stored gzipped under their content hash, once."""
+    html = page("Subway Nilai")
+    digest = snapshots.save_page(html)
+    assert digest == page_hash(html)
+    path = os.path.join(snapshots.directory, "pages", f"{digest}.html.gz")
+    with gzip.open(path, "rb") as f:
+        assert f.read().decode() == html
+    
+    modified = os.path.getmtime(path)
+    assert snapshots.save_page(html) == digest
+    assert os.path.getmtime(path) == modified
+    assert snapshots.load_page(digest) == html
+    assert snapshots.load_outlets(digest) is None
+
+def test_unchanged_ingest_skipped(snapshots, db_session, count_parses, monkeypatch):
+    """Test that pages unchanged since the last ingest are neither parsed nor written."""
+    pages = {"Selangor": page("Subway SS15", "Subway Nilai"), "Negeri Sembilan": page("Subway Nilai")}
+    counts = ingest_pages(pages, snapshots, db=db_session)
+    assert counts == (2, 0, 0, 0)
+    assert len(count_parses) == 2
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("database written")
+    monkeypatch.setattr("scraper.main.insert_outlets_to_db", fail)
+    assert ingest_pages(pages, snapshots, db=db_session) is None
+    assert len(count_parses) == 2
+
+def test_changed_page_parsed_alone(snapshots, db_session, count_parses):
+    """Test that only changed pages are parsed again."""
+    pages = {"Selangor": page("Subway SS15"), "Perak": page("Subway Ipoh")}
+    ingest_pages(pages, snapshots, db=db_session)
+    
+    pages["Perak"] = page("Subway Ipoh", "Subway Taiping")
+    counts = ingest_pages(pages, snapshots, db=db_session)
+    assert counts == (1, 0, 0, 2)
+    assert count_parses[2:] == [pages["Perak"]]
+    
+    # A forced ingest reads the stored outlets rather than parsing
+    assert ingest_pages(pages, snapshots, db=db_session, force=True) == (0, 0, 0, 3)
+    assert len(count_parses) == 3
+
+def test_replay(snapshots, db_session):
+    """Test that the last ingest is rebuilt from snapshots into an empty database."""
+    with pytest.raises(RuntimeError):
+        replay_snapshots(snapshots, db=db_session)
+    
+    ingest_pages({"Selangor": page("Subway SS15", "Subway Nilai")}, snapshots, db=db_session)
+    ingested = {(o.name, o.address, o.lat) for o in db_session.query(Outlet).all()}
+    db_session.query(Outlet).delete()
+    db_session.commit()
+    
+    # Outlets are parsed again if only the pages survive
+    for name in os.listdir(os.path.join(snapshots.directory, "outlets")):
+        os.remove(os.path.join(snapshots.directory, "outlets", name))
+    assert replay_snapshots(snapshots, db=db_session) == (2, 0, 0, 0)
+    assert {(o.name, o.address, o.lat) for o in db_session.query(Outlet).all()} == ingested